@@ -0,0 +1,273 @@
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import zipfile
+from io import BytesIO
+from typing import Literal, Optional
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+
+from services.quiz_gen import generate_quiz_from_text
+from services.summarizer import summarize_text
+from services.worksheet_generator import generate_worksheet
+from services.exporter import MIME_TYPES, export_bundle, export_document, use_streaming_export
+from services.streaming_export import bundle_to_file, export_to_file
+from services.chapter_splitter import main_split
+from services.lesson_pack import PACK_ARTIFACTS, generate_lesson_pack
+from services.section_index import focus_material
+from services.job_queue import PRIORITY_BULK, JobStore, ensure_worker_pool
+from models.llm_client import ERROR_PREFIX, is_error_result
+from models.metrics import get_metrics
+
+
+# Headless entry point for LMS integrations:
+#   uvicorn api:app --host 0.0.0.0 --port 8000   (run from backend/)
+# All requests share the process-wide LLM client, connection pools and rate limiter.
+
+API_CONCURRENCY = int(os.getenv("API_CONCURRENCY", "16"))
+BULK_MAX_ITEMS = int(os.getenv("API_BULK_MAX_ITEMS", "1000"))
+
+app = FastAPI(title="AI Teacher Assistant API")
+_service_slots = asyncio.Semaphore(API_CONCURRENCY)
+
+
+class QuizRequest(BaseModel):
+    text: str
+    num_questions: int = Field(5, ge=1, le=200)
+    quiz_type: str = "Mixed"
+    class_grade: Optional[str] = None
+    subject: Optional[str] = None
+    topic: Optional[str] = None             # narrows the material to the best-matching sections
+
+
+class SummaryRequest(BaseModel):
+    raw_text: str
+    prompt_type: Literal["Summary", "Class Notes", "Lesson Plan"] = "Summary"
+    class_grade: Optional[str] = None
+    subject: Optional[str] = None
+    topic: Optional[str] = None             # narrows the material to the best-matching sections
+
+
+class WorksheetRequest(BaseModel):
+    raw_text: str
+    num_questions: int = Field(5, ge=1, le=200)
+    worksheet_type: str = "Mixed"
+    class_grade: Optional[str] = None
+    subject: Optional[str] = None
+    topic: Optional[str] = None             # narrows the material to the best-matching sections
+
+
+class ExportRequest(BaseModel):
+    text: str
+    title: str = "Generated Document"
+    class_grade: Optional[str] = None
+    subject: Optional[str] = None
+
+
+class LessonPackRequest(BaseModel):
+    text: str
+    class_grade: Optional[str] = None
+    subject: Optional[str] = None
+    artifacts: list[Literal[tuple(PACK_ARTIFACTS)]] = list(PACK_ARTIFACTS)
+    num_questions: int = Field(10, ge=1, le=100)
+    question_format: str = "Mixed"
+
+
+class BulkRequest(BaseModel):
+    items: list[dict]
+    defaults: dict = {}                     # merged under every item
+    export: Optional[Literal["pdf", "docx"]] = None
+    title: Optional[str] = None
+    concurrency: int = Field(8, ge=1, le=64)
+
+
+FEATURES = {
+    "quiz": (QuizRequest, generate_quiz_from_text, "Quiz", "text"),
+    "summary": (SummaryRequest, summarize_text, "📝 Generated Notes", "raw_text"),
+    "worksheet": (WorksheetRequest, generate_worksheet, "📝 Generated Worksheet", "raw_text"),
+}
+
+
+def service_params(request, text_field):
+    # topic is not a service argument: it selects the material sent to the model
+    params = request.model_dump()
+    topic = params.pop("topic", None)
+    if topic:
+        params[text_field] = focus_material(params[text_field], topic)[0]
+    return params
+
+
+async def run_service(fn, *args, **kwargs):
+    # Services are blocking; run them off the event loop, bounded process-wide
+    async with _service_slots:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+def render_export(text, fmt, title, class_grade=None, subject=None):
+    # "zip" is the student + teacher bundle in every format
+    if fmt == "zip":
+        return export_bundle(text, title, "generated", class_grade, subject)
+    return export_document(text, fmt, title, class_grade, subject)
+
+
+def render_export_file(text, fmt, title, class_grade=None, subject=None):
+    if fmt == "zip":
+        return bundle_to_file(text, title, "generated", class_grade, subject)
+    return export_to_file(text, fmt, title, class_grade, subject)
+
+
+_job_store = None
+
+
+def get_job_store():
+    # Workers are started on first use, unless job_worker.py processes are already running
+    global _job_store
+    if _job_store is None:
+        ensure_worker_pool()
+        _job_store = JobStore()
+    return _job_store
+
+
+def iter_file(handle, chunk_size=1024 * 1024):
+    with handle:
+        while chunk := handle.read(chunk_size):
+            yield chunk
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus scrape target
+    return PlainTextResponse(get_metrics().to_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/quiz")
+async def quiz(request: QuizRequest):
+    return {"result": await run_service(lambda: generate_quiz_from_text(**service_params(request, "text")))}
+
+
+@app.post("/summary")
+async def summary(request: SummaryRequest):
+    return {"result": await run_service(lambda: summarize_text(**service_params(request, "raw_text")))}
+
+
+@app.post("/worksheet")
+async def worksheet(request: WorksheetRequest):
+    return {"result": await run_service(lambda: generate_worksheet(**service_params(request, "raw_text")))}
+
+
+@app.post("/lesson-pack")
+async def lesson_pack(request: LessonPackRequest):
+    return await run_service(generate_lesson_pack, **request.model_dump())
+
+
+@app.post("/export/{fmt}")
+async def export(fmt: Literal["pdf", "docx", "zip"], request: ExportRequest):
+    headers = {"Content-Disposition": f'attachment; filename="generated.{fmt}"'}
+    if use_streaming_export(request.text):
+        # Large outputs: rendered to a temp file and sent in chunks
+        handle = await run_service(render_export_file, request.text, fmt, request.title, request.class_grade, request.subject)
+        return StreamingResponse(iter_file(handle), media_type=MIME_TYPES[fmt], headers=headers)
+    data = await run_service(render_export, request.text, fmt, request.title, request.class_grade, request.subject)
+    return Response(content=data, media_type=MIME_TYPES[fmt], headers=headers)
+
+
+@app.post("/split")
+async def split(file: UploadFile = File(...)):
+    data = await file.read()
+
+    def split_to_zip():
+        with tempfile.TemporaryDirectory() as work_dir:
+            pdf_path = os.path.join(work_dir, "input.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(data)
+            output_dir = os.path.join(work_dir, "chapters")
+            main_split(pdf_path, output_dir)
+            if not os.path.isdir(output_dir) or not os.listdir(output_dir):
+                return None
+
+            buffer = BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                for name in sorted(os.listdir(output_dir)):
+                    archive.write(os.path.join(output_dir, name), arcname=name)
+            return buffer.getvalue()
+
+    archive = await run_service(split_to_zip)
+    if archive is None:
+        raise HTTPException(status_code=422, detail="No chapters detected in the uploaded PDF.")
+    stem = os.path.splitext(file.filename or "book")[0]
+    return Response(content=archive, media_type="application/zip", headers={"Content-Disposition": f'attachment; filename="{stem}_chapters.zip"'})
+
+
+@app.post("/bulk/{feature}")
+async def bulk(feature: Literal["quiz", "summary", "worksheet"], request: BulkRequest):
+    """Runs many parameter sets and streams one NDJSON line per item as it finishes."""
+    if len(request.items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per request.")
+
+    model_cls, service, default_title, text_field = FEATURES[feature]
+    semaphore = asyncio.Semaphore(request.concurrency)
+
+    async def run_item(index, item):
+        async with semaphore:
+            try:
+                item_request = model_cls(**{**request.defaults, **item})
+                params = await run_service(service_params, item_request, text_field)
+                result = await run_service(service, **params)
+                if is_error_result(result):
+                    return {"index": index, "status": "error", "error": result[len(ERROR_PREFIX):]}
+                line = {"index": index, "status": "ok", "result": result}
+                if request.export:
+                    data = await run_service(render_export, result, request.export, request.title or default_title, params.get("class_grade"), params.get("subject"))
+                    line["file_base64"] = base64.b64encode(data).decode("ascii")
+                    line["file_format"] = request.export
+                return line
+            except Exception as e:
+                return {"index": index, "status": "error", "error": f"{type(e).__name__}: {e}"}
+
+    async def ndjson():
+        tasks = [asyncio.create_task(run_item(i, item)) for i, item in enumerate(request.items)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished, ensure_ascii=False) + "\n"
+        finally:
+            # Client disconnected: don't keep generating for nobody
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@app.post("/jobs/{feature}")
+async def submit_job(feature: Literal["quiz", "summary", "worksheet"], payload: dict, user_id: str = "api"):
+    """Queues a generation at bulk priority, behind every job a teacher is waiting on in the app."""
+    model_cls, _, _, text_field = FEATURES[feature]
+    try:
+        item_request = model_cls(**payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+    params = await run_service(service_params, item_request, text_field)
+    job_id = await run_service(lambda: get_job_store().submit(feature, params, user_id=user_id, priority=PRIORITY_BULK))
+    return {"job_id": job_id}
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await run_service(lambda: get_job_store().get(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+    return {key: job[key] for key in ("id", "kind", "status", "progress", "message", "result", "error")}
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    await run_service(lambda: get_job_store().cancel(job_id))
+    return await job_status(job_id)
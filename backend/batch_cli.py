@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from services.pdf_extractor import extract_text_from_pdf_bytes
+from services.quiz_gen import generate_quiz_from_text
+from services.section_index import focus_material
+from services.summarizer import summarize_text
+from services.worksheet_generator import generate_worksheet
+from services.text_to_pdf_docx import convert_text_to_pdf, generate_pdf, generate_docx
+
+
+# Batch generation for a folder of PDFs, no Streamlit involved:
+#   python batch_cli.py ./chapters --feature quiz --grade "Grade 8" --subject Science \
+#       --format MCQs --num-questions 20 --export pdf docx --workers 4
+# or put the job options in a JSON file and pass --spec job.json (flags override it).
+# Progress is recorded in <output>/manifest.json; rerunning the same command skips finished files.
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_WORKERS = 4
+
+DEFAULT_SPEC = {
+    "feature": "quiz",
+    "grade": None,
+    "subject": None,
+    "format": "Mixed",
+    "num_questions": 10,
+    "topic": None,
+    "export": ["pdf", "docx"],
+}
+
+FEATURE_TITLES = {
+    "quiz": "Quiz",
+    "summary": "📝 Generated Notes",
+    "notes": "📝 Generated Notes",
+    "lesson_plan": "📝 Generated Notes",
+    "worksheet": "📝 Generated Worksheet",
+}
+
+RENDERERS = {"pdf": generate_pdf, "docx": generate_docx}
+
+
+def generate_for_feature(text, spec):
+    feature = spec["feature"]
+    if feature == "quiz":
+        return generate_quiz_from_text(text, spec["num_questions"], quiz_type=spec["format"], class_grade=spec["grade"], subject=spec["subject"])
+    if feature == "worksheet":
+        return generate_worksheet(text, spec["num_questions"], worksheet_type=spec["format"], class_grade=spec["grade"], subject=spec["subject"])
+    prompt_type = {"summary": "Summary", "notes": "Class Notes", "lesson_plan": "Lesson Plan"}[feature]
+    return summarize_text(text, prompt_type, class_grade=spec["grade"], subject=spec["subject"])
+
+
+def spec_hash(spec):
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class Manifest:
+    """Per-file status under the output folder, rewritten atomically after every file."""
+
+    def __init__(self, path, spec):
+        self.path = Path(path)
+        self.spec_key = spec_hash(spec)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.data = {}
+        if self.data.get("spec_hash") != self.spec_key:
+            # Different job options: earlier outputs don't count
+            self.data = {"spec": spec, "spec_hash": self.spec_key, "files": {}}
+
+    def is_done(self, name, file_hash):
+        entry = self.data["files"].get(name)
+        return bool(
+            entry
+            and entry["status"] == "done"
+            and entry.get("sha256") == file_hash
+            and all(os.path.exists(p) for p in entry.get("outputs", []))
+        )
+
+    def record(self, name, **entry):
+        with self._lock:
+            self.data["files"][name] = {**entry, "updated_at": time.time()}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+class ProgressBar:
+    def __init__(self, total, width=30, stream=sys.stderr):
+        self.total = max(total, 1)
+        self.done = 0
+        self.failed = 0
+        self.width = width
+        self.stream = stream
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, ok=True, label=""):
+        with self._lock:
+            self.done += 1
+            self.failed += 0 if ok else 1
+            filled = int(self.width * self.done / self.total)
+            elapsed = time.monotonic() - self.started
+            eta = elapsed / self.done * (self.total - self.done)
+            self.stream.write(
+                f"\r[{'#' * filled}{'.' * (self.width - filled)}] {self.done}/{self.total}"
+                f" ({self.failed} failed) {elapsed:.0f}s elapsed, ~{eta:.0f}s left {label[:40]:<40}"
+            )
+            self.stream.flush()
+
+    def close(self):
+        self.stream.write("\n")
+        self.stream.flush()
+
+
+def process_pdf(pdf_path, spec, output_dir):
+    """Extract → generate → export one PDF; returns the written file paths."""
+    data = Path(pdf_path).read_bytes()
+    text = extract_text_from_pdf_bytes(data)
+    if not text:
+        raise ValueError("No extractable text (scanned PDF?)")
+    if spec["topic"]:
+        text, _ = focus_material(text, spec["topic"])
+
+    result = generate_for_feature(text, spec)
+    if not result or result.startswith("❌"):
+        raise RuntimeError(result or "Empty generation result")
+
+    stem = f"{Path(pdf_path).stem}_{spec['feature']}"
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / f"{stem}.md").write_text(result, encoding="utf-8")
+
+    formatted = convert_text_to_pdf(result)
+    title = FEATURE_TITLES[spec["feature"]]
+    outputs = [str(output_dir / f"{stem}.md")]
+    for fmt in spec["export"]:
+        path = output_dir / f"{stem}.{fmt}"
+        path.write_bytes(RENDERERS[fmt](formatted_text=formatted, title=title, class_grade=spec["grade"], subject=spec["subject"]))
+        outputs.append(str(path))
+    return outputs
+
+
+def run_batch(input_dir, spec, output_dir, workers=DEFAULT_WORKERS, force=False):
+    pdf_paths = sorted(p for p in Path(input_dir).iterdir() if p.suffix.lower() == ".pdf")
+    if not pdf_paths:
+        raise ValueError(f"No PDF files found in folder: {input_dir}")
+
+    manifest = Manifest(Path(output_dir) / MANIFEST_NAME, spec)
+    hashes = {p.name: hashlib.sha256(p.read_bytes()).hexdigest() for p in pdf_paths}
+    pending = [p for p in pdf_paths if force or not manifest.is_done(p.name, hashes[p.name])]
+    print(f"📚 {len(pdf_paths)} PDFs, {len(pdf_paths) - len(pending)} already done, {len(pending)} to process", file=sys.stderr)
+
+    progress = ProgressBar(len(pending))
+    failures = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_pdf, p, spec, output_dir): p for p in pending}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                outputs = future.result()
+                manifest.record(path.name, status="done", sha256=hashes[path.name], outputs=outputs)
+                progress.update(True, path.name)
+            except Exception as e:
+                failures[path.name] = f"{type(e).__name__}: {e}"
+                manifest.record(path.name, status="failed", sha256=hashes[path.name], error=failures[path.name])
+                progress.update(False, path.name)
+    progress.close()
+    return failures
+
+
+def load_spec(args):
+    spec = dict(DEFAULT_SPEC)
+    if args.spec:
+        with open(args.spec, "r", encoding="utf-8") as f:
+            spec.update(json.load(f))
+    for key in DEFAULT_SPEC:
+        value = getattr(args, key)
+        if value is not None:
+            spec[key] = value
+
+    if spec["feature"] not in FEATURE_TITLES:
+        raise ValueError(f"Unknown feature: {spec['feature']}")
+    unknown = set(spec["export"]) - set(RENDERERS)
+    if unknown:
+        raise ValueError(f"Unknown export format(s): {', '.join(sorted(unknown))}")
+    return spec
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate quizzes, notes or worksheets for every PDF in a folder")
+    parser.add_argument("input_dir", help="Folder containing PDF files")
+    parser.add_argument("-o", "--output", default=None, help="Output folder (default: <input_dir>/generated)")
+    parser.add_argument("--spec", help="JSON job spec; command-line flags override its values")
+    parser.add_argument("--feature", choices=sorted(FEATURE_TITLES))
+    parser.add_argument("--grade")
+    parser.add_argument("--subject")
+    parser.add_argument("--format", help='Question format, e.g. "MCQs" or "Mixed"')
+    parser.add_argument("--num-questions", dest="num_questions", type=int)
+    parser.add_argument("--topic", help="Only send the sections of each PDF most relevant to this topic")
+    parser.add_argument("--export", nargs="+", choices=sorted(RENDERERS))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Files processed in parallel")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and redo every file")
+    args = parser.parse_args(argv)
+
+    try:
+        spec = load_spec(args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    output_dir = args.output or os.path.join(args.input_dir, "generated")
+    failures = run_batch(args.input_dir, spec, output_dir, workers=args.workers, force=args.force)
+    for name, error in failures.items():
+        print(f"⚠️ {name}: {error}", file=sys.stderr)
+    print(f"✅ Outputs in {output_dir}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+from pathlib import Path
+import fitz  # PyMuPDF
+
+
+FIXTURE_DIR = Path(__file__).resolve().parent / ".fixtures"
+DEFAULT_PAGE_COUNTS = (5, 50, 300, 1000)
+PAGES_PER_CHAPTER = 25
+
+PARAGRAPH = (
+    "Photosynthesis is the process by which green plants use sunlight, water and carbon dioxide "
+    "to make glucose and release oxygen. The reaction takes place in the chloroplasts, where the "
+    "pigment chlorophyll absorbs light energy. Respiration releases this stored energy so that "
+    "cells can grow, repair themselves and move substances across membranes."
+)
+
+
+def chapter_starts(page_count):
+    """Internal page index of each chapter's first page (page 0 is the contents page)."""
+    return list(range(1, page_count, PAGES_PER_CHAPTER)) or [0]
+
+
+def build_fixture_pdf(page_count, path):
+    """Textbook-like PDF: contents page, running header, footer page numbers and an outline."""
+    starts = chapter_starts(page_count)
+    doc = fitz.open()
+    for i in range(page_count):
+        page = doc.new_page(width=595, height=842)
+        if i == 0:
+            lines = ["Contents", ""] + [f"Chapter {n} Life Processes Part {n} .......... {start}" for n, start in enumerate(starts, start=1)]
+            page.insert_text((72, 90), "\n".join(lines), fontsize=11)
+            continue
+
+        chapter = next(n for n, start in reversed(list(enumerate(starts, start=1))) if start <= i)
+        page.insert_text((72, 40), f"Science Textbook - Chapter {chapter}", fontsize=8)
+        body = f"Chapter {chapter} Life Processes Part {chapter}\n\n" if i in starts else ""
+        body += "\n\n".join([PARAGRAPH] * 6)
+        page.insert_textbox(fitz.Rect(72, 72, 523, 780), body, fontsize=10)
+        page.insert_text((290, 815), str(i), fontsize=9)
+
+    doc.set_toc([[1, f"Chapter {n} Life Processes Part {n}", start + 1] for n, start in enumerate(starts, start=1)])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc.save(str(path), garbage=3, deflate=True)
+    doc.close()
+    return path
+
+
+def fixture_pdf(page_count):
+    """Path of the cached fixture with `page_count` pages, built on first use."""
+    path = FIXTURE_DIR / f"textbook_{page_count}p.pdf"
+    if not path.exists():
+        build_fixture_pdf(page_count, path)
+    return path
@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fixtures import DEFAULT_PAGE_COUNTS, fixture_pdf
+from benchmarks.stub_server import add_stub_arguments, config_from_args, start_stub_server
+
+
+# Cold-start and per-stage timings against the local stub server, saved as JSON:
+#   cd backend && python -m benchmarks.run --pages 5 50 1000 --repeat 3
+#   python -m benchmarks.run --compare benchmarks/results/<earlier>.json
+# No network or API key is needed; the stub answers every LLM call.
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+PROMPT_TOKEN_CAP = 8_000     # keep stub round-trips comparable across fixture sizes
+REGRESSION_THRESHOLD = 1.2   # --compare flags stages more than 20% slower
+
+
+def measure(fn, repeat):
+    """Runs fn `repeat` times; returns timing stats and the last result."""
+    runs = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - started)
+    return {"min": min(runs), "median": statistics.median(runs), "mean": statistics.fmean(runs), "runs": runs}, result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def point_app_at_stub(base_url):
+    # Must happen before the app modules are imported (OLLAMA_URL is read at import time)
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+    os.environ["OPENAI_API_KEY"] = os.environ.get("BENCH_OPENAI_API_KEY", "stub-key")
+    os.environ["OLLAMA_URL"] = base_url
+    os.environ["LLM_CACHE_DISABLED"] = "1"  # every call should reach the stub
+
+
+def bench_fixture(page_count, repeat, model):
+    from models.llm_client import ask_llama3_stream_false, ask_openai_stream, ask_openai_sync
+    from models.token_budget import count_tokens, truncate_to_tokens
+    from services.chapter_splitter import main_split
+    from services.pdf_extractor import clear_extraction_cache, extract_text_from_pdf_bytes
+    from services.quiz_gen import build_quiz_prompt
+    from services.text_to_pdf_docx import convert_text_to_pdf, generate_docx, generate_pdf
+
+    pdf_path = fixture_pdf(page_count)
+    data = pdf_path.read_bytes()
+    stages = {}
+
+    def extract():
+        clear_extraction_cache()
+        return extract_text_from_pdf_bytes(data)
+
+    stages["extract"], text = measure(extract, repeat)
+    stages["prompt_build"], prompt = measure(lambda: build_quiz_prompt(text, 10, "Mixed", "Grade 8", "Science"), repeat)
+    stages["token_count"], input_tokens = measure(lambda: count_tokens(prompt, model), repeat)
+
+    llm_prompt = truncate_to_tokens(prompt, PROMPT_TOKEN_CAP, model)
+    stages["ask_openai_sync"], output = measure(lambda: ask_openai_sync(llm_prompt, model=model, use_cache=False), repeat)
+
+    ttfts = []
+
+    def stream():
+        stats = {}
+        text = "".join(ask_openai_stream(llm_prompt, model=model, stats=stats, use_cache=False))
+        ttfts.append(stats["ttft"])
+        return text
+
+    stages["ask_openai_stream"], _ = measure(stream, repeat)
+    stages["ask_openai_stream"]["ttft_median"] = statistics.median(t for t in ttfts if t is not None) if any(ttfts) else None
+    stages["ollama_chat"], _ = measure(lambda: ask_llama3_stream_false(llm_prompt), repeat)
+
+    stages["convert_text_to_pdf"], formatted = measure(lambda: convert_text_to_pdf(output), repeat)
+    render_args = {"formatted_text": formatted, "title": "Quiz", "class_grade": "Grade 8", "subject": "Science"}
+    stages["generate_pdf"], _ = measure(lambda: generate_pdf(**render_args), repeat)
+    stages["generate_docx"], _ = measure(lambda: generate_docx(**render_args), repeat)
+
+    def stream_pdf_to_file():
+        from services.streaming_export import export_to_file
+        with export_to_file(output, "pdf", "Quiz", "Grade 8", "Science") as handle:
+            return handle.seek(0, os.SEEK_END)
+
+    stages["stream_pdf"], _ = measure(stream_pdf_to_file, repeat)
+
+    def split():
+        with tempfile.TemporaryDirectory() as output_dir:
+            return main_split(str(pdf_path), output_dir)
+
+    stages["main_split"], _ = measure(split, repeat)
+
+    return {"pages": page_count, "pdf_bytes": len(data), "text_chars": len(text), "input_tokens": input_tokens, "stages": stages}
+
+
+# Each snippet runs in a fresh interpreter and prints its own in-process seconds
+STARTUP_SNIPPETS = {
+    "interpreter": "print(0.0)",
+    "import_services": (
+        "import time; t = time.perf_counter()\n"
+        "import services.quiz_gen, services.summarizer, services.worksheet_generator, services.text_to_pdf_docx\n"
+        "print(time.perf_counter() - t)"
+    ),
+    "import_heavy_deps": (
+        "import time; t = time.perf_counter()\n"
+        "import fitz, openai, tiktoken, reportlab.platypus, docx\n"
+        "print(time.perf_counter() - t)"
+    ),
+    # Full script run of the Streamlit page, i.e. the server side of the first paint
+    "first_paint": (
+        "import time\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        "app = AppTest.from_file('main.py', default_timeout=120)\n"
+        "t = time.perf_counter(); app.run()\n"
+        "print(time.perf_counter() - t)"
+    ),
+}
+
+
+def bench_startup(repeat):
+    """Cold-start timings. median/min include interpreter start-up; in_process_median is the snippet alone."""
+    results = {}
+    for name, snippet in STARTUP_SNIPPETS.items():
+        process_runs, inner_runs = [], []
+        error = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-c", snippet], cwd=BACKEND_DIR, capture_output=True, text=True)
+            elapsed = time.perf_counter() - started
+            if completed.returncode != 0:
+                error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit {completed.returncode}"
+                break
+            process_runs.append(elapsed)
+            inner_runs.append(float(completed.stdout.strip().splitlines()[-1]))
+        if error:
+            results[name] = {"error": error}
+        else:
+            results[name] = {
+                "median": statistics.median(process_runs), "min": min(process_runs), "mean": statistics.fmean(process_runs),
+                "runs": process_runs, "in_process_median": statistics.median(inner_runs),
+            }
+    return results
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nComparison with {baseline_path} ({baseline['meta'].get('commit')}):")
+    regressions = 0
+    for stage, timing in current.get("startup", {}).items():
+        old = baseline.get("startup", {}).get(stage)
+        if not old or "median" not in old or "median" not in timing or not old["median"]:
+            continue
+        ratio = timing["median"] / old["median"]
+        flag = "  ⚠️ slower" if ratio > REGRESSION_THRESHOLD else ""
+        regressions += bool(flag)
+        print(f"  start {stage:<22} {old['median'] * 1000:9.1f}ms → {timing['median'] * 1000:9.1f}ms  x{ratio:.2f}{flag}")
+    for pages, fixture in current["fixtures"].items():
+        old_fixture = baseline["fixtures"].get(pages)
+        if not old_fixture:
+            continue
+        for stage, timing in fixture["stages"].items():
+            old = old_fixture["stages"].get(stage)
+            if not old or not old["median"]:
+                continue
+            ratio = timing["median"] / old["median"]
+            flag = "  ⚠️ slower" if ratio > REGRESSION_THRESHOLD else ""
+            regressions += bool(flag)
+            print(f"  {pages:>5}p {stage:<22} {old['median'] * 1000:9.1f}ms → {timing['median'] * 1000:9.1f}ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def print_table(results):
+    print("\n🚀 Startup (fresh interpreter)")
+    for stage, timing in results.get("startup", {}).items():
+        if "error" in timing:
+            print(f"  {stage:<22} failed: {timing['error']}")
+        else:
+            print(f"  {stage:<22} median {timing['median'] * 1000:9.1f}ms   in-process {timing['in_process_median'] * 1000:9.1f}ms")
+    for pages, fixture in results["fixtures"].items():
+        print(f"\n📄 {pages} pages ({fixture['input_tokens']} prompt tokens)")
+        for stage, timing in fixture["stages"].items():
+            print(f"  {stage:<22} median {timing['median'] * 1000:9.1f}ms   min {timing['min'] * 1000:9.1f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extraction, prompting, LLM calls, formatting, rendering and splitting")
+    parser.add_argument("--pages", type=int, nargs="+", default=list(DEFAULT_PAGE_COUNTS), help="Fixture sizes to run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--model", default="gpt-5-nano-2025-08-07")
+    parser.add_argument("--output", help="Results JSON path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--skip-startup", action="store_true", help="Don't measure cold-start import / first-paint time")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    stub_config = config_from_args(args)
+    server, base_url = start_stub_server(stub_config)
+    point_app_at_stub(base_url)
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": args.model,
+            "repeat": args.repeat,
+            "stub": stub_config.to_dict(),
+        },
+        "startup": {},
+        "fixtures": {},
+    }
+    try:
+        if not args.skip_startup:
+            print("⏱️ Measuring cold start...", file=sys.stderr)
+            results["startup"] = bench_startup(args.repeat)
+        for page_count in args.pages:
+            print(f"⏱️ Benchmarking {page_count}-page fixture...", file=sys.stderr)
+            results["fixtures"][str(page_count)] = bench_fixture(page_count, args.repeat, args.model)
+    finally:
+        server.shutdown()
+    from models.metrics import get_metrics
+    results["meta"]["stub_counts"] = stub_config.counts
+    results["meta"]["client_counts"] = get_metrics().retry_totals()
+    if results["meta"]["client_counts"]["rate_limited"] != stub_config.counts["rate_limited"]:
+        print(f"⚠️ Stub served {stub_config.counts['rate_limited']} 429s but the client counted {results['meta']['client_counts']['rate_limited']}", file=sys.stderr)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    print_table(results)
+    print(f"\n💾 Results saved to {output}")
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
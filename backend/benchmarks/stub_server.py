@@ -0,0 +1,277 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Local stand-in for the OpenAI chat completions API and Ollama's /api/generate and /api/chat.
+#   python -m benchmarks.stub_server --port 8911 --latency 0.3 --tokens-per-sec 80 --rate-429 0.05
+# then point the app at it:
+#   OPENAI_BASE_URL=http://127.0.0.1:8911/v1 OPENAI_API_KEY=stub OLLAMA_URL=http://127.0.0.1:8911
+
+# Markdown-ish output so the formatter and renderers get realistic input
+REPLY_LINES = [
+    "## Questions",
+    "1. Which process do plants use to make their own food?",
+    "A) Respiration",
+    "B) **Photosynthesis**",
+    "C) Transpiration",
+    "D) Digestion",
+    "2. Explain why the *mitochondria* is called the powerhouse of the cell.",
+    "- It releases energy from food through respiration.",
+    "- Energy is stored as `ATP` for the cell to use.",
+    "| Term | Meaning |",
+    "| --- | --- |",
+    "| Chlorophyll | Green pigment that absorbs light |",
+    "## Answer Key",
+    "1. B",
+    "2. It breaks down glucose to release usable energy.",
+]
+
+
+class StubConfig:
+    def __init__(self, latency=0.2, tokens_per_sec=100.0, rate_429=0.0, output_tokens=200, retry_after=0.05, seed=None):
+        self.latency = latency                # seconds before the first byte
+        self.tokens_per_sec = tokens_per_sec  # 0 = emit everything at once
+        self.rate_429 = rate_429              # probability of answering 429
+        self.output_tokens = output_tokens
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "rate_limited": 0}
+
+    def to_dict(self):
+        return {
+            "latency": self.latency,
+            "tokens_per_sec": self.tokens_per_sec,
+            "rate_429": self.rate_429,
+            "output_tokens": self.output_tokens,
+            "retry_after": self.retry_after,
+        }
+
+
+def reply_tokens(count):
+    # Roughly one "token" per word; newlines are kept so the output stays line-structured
+    words = []
+    while len(words) < count:
+        for line in REPLY_LINES:
+            words.extend(w + " " for w in line.split(" ")[:-1])
+            words.append(line.split(" ")[-1] + "\n")
+    return words[:count]
+
+
+def prompt_tokens(text):
+    return max(1, len(str(text)) // 4)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in self._rate_limit_headers().items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _rate_limit_headers(self):
+        return {
+            "x-ratelimit-limit-requests": "100000",
+            "x-ratelimit-remaining-requests": "99999",
+            "x-ratelimit-limit-tokens": "100000000",
+            "x-ratelimit-remaining-tokens": "99999999",
+        }
+
+    def _tokens(self, max_tokens=None):
+        count = self.config.output_tokens
+        if max_tokens:
+            count = min(count, int(max_tokens))
+        return reply_tokens(count)
+
+    def _pace(self, tokens):
+        # Yields tokens at the configured rate after the configured latency
+        time.sleep(self.config.latency)
+        interval = 1.0 / self.config.tokens_per_sec if self.config.tokens_per_sec > 0 else 0
+        for token in tokens:
+            if interval:
+                time.sleep(interval)
+            yield token
+
+    def _maybe_429(self):
+        config = self.config
+        with config.lock:
+            config.counts["requests"] += 1
+            limited = config.random.random() < config.rate_429
+            if limited:
+                config.counts["rate_limited"] += 1
+        if limited:
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}},
+                headers={"retry-after-ms": str(int(config.retry_after * 1000)), **self._rate_limit_headers()},
+            )
+        return limited
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("", "/health"):
+            self._send_json(200, {"status": "ok", "config": self.config.to_dict(), "counts": self.config.counts})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            payload = self._read_json()
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+
+        if self.path.endswith("/chat/completions"):
+            if not self._maybe_429():
+                self._openai_chat(payload)
+        elif self.path == "/api/generate":
+            self._ollama(payload, chat=False)
+        elif self.path == "/api/chat":
+            self._ollama(payload, chat=True)
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def _openai_chat(self, payload):
+        model = payload.get("model", "stub")
+        prompt = " ".join(str(m.get("content", "")) for m in payload.get("messages", []))
+        tokens = self._tokens(payload.get("max_completion_tokens") or payload.get("max_tokens"))
+        if payload.get("response_format"):
+            tokens = [json.dumps({"questions": [{"question": "What is a cell?", "type": "short_answer", "options": [], "answer": "The basic unit of life."}]})]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        usage = {"prompt_tokens": prompt_tokens(prompt), "completion_tokens": len(tokens), "total_tokens": prompt_tokens(prompt) + len(tokens)}
+
+        if not payload.get("stream"):
+            text = "".join(self._pace(tokens))
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            }, headers=self._rate_limit_headers())
+            return
+
+        def event(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+        self._start_stream("text/event-stream")
+        try:
+            self._write_chunk(event({"role": "assistant", "content": ""}))
+            for token in self._pace(tokens):
+                self._write_chunk(event({"content": token}))
+            self._write_chunk(event({}, "stop"))
+            if (payload.get("stream_options") or {}).get("include_usage"):
+                usage_chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model, "choices": [], "usage": usage}
+                self._write_chunk(f"data: {json.dumps(usage_chunk)}\n\n".encode("utf-8"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._end_stream()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client cancelled the stream
+
+    def _ollama(self, payload, chat):
+        model = payload.get("model", "stub")
+        tokens = self._tokens()
+
+        def message(text, done):
+            body = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "done": done}
+            if chat:
+                body["message"] = {"role": "assistant", "content": text}
+            else:
+                body["response"] = text
+            if done:
+                body["eval_count"] = len(tokens)
+            return body
+
+        if payload.get("stream") is False:
+            self._send_json(200, message("".join(self._pace(tokens)), True))
+            return
+
+        # Ollama streams newline-delimited JSON
+        self._start_stream("application/x-ndjson")
+        try:
+            for token in self._pace(tokens):
+                self._write_chunk((json.dumps(message(token, False)) + "\n").encode("utf-8"))
+            self._write_chunk((json.dumps(message("", True)) + "\n").encode("utf-8"))
+            self._end_stream()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_stub_server(config=None, host="127.0.0.1", port=0):
+    """Starts the stub in a daemon thread; returns (server, base_url). port=0 picks a free port."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config or StubConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="llm-stub-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def add_stub_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=100.0, help="Output rate; 0 sends everything at once")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probability of answering 429 to a chat completion")
+    parser.add_argument("--output-tokens", type=int, default=200)
+    parser.add_argument("--retry-after", type=float, default=0.05, help="retry-after sent with injected 429s (seconds)")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args):
+    return StubConfig(args.latency, args.tokens_per_sec, args.rate_429, args.output_tokens, args.retry_after, args.seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub OpenAI / Ollama server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8911)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(config_from_args(args), args.host, args.port)
+    print(f"🧪 Stub server on {base_url} (OPENAI_BASE_URL={base_url}/v1, OLLAMA_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
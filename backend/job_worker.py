@@ -0,0 +1,17 @@
+import argparse
+import multiprocessing
+from services.job_queue import WORKER_COUNT, run_worker
+
+
+# Run a dedicated worker pool next to the Streamlit server:
+#   python job_worker.py --workers 4
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background generation workers")
+    parser.add_argument("--workers", type=int, default=WORKER_COUNT)
+    args = parser.parse_args()
+
+    processes = [multiprocessing.Process(target=run_worker, name=f"job-worker-{i}") for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
@@ -1,14 +1,19 @@
 import streamlit as st
+import hashlib
 import os
 import tempfile
-from PyPDF2 import PdfReader
+import threading
+import uuid
 
-from services.quiz_gen import generate_quiz_from_text
+# Only lightweight modules here. Each page imports its own service below, and
+# PyMuPDF, reportlab, python-docx, openai and tiktoken load on first use.
+from services.quiz_schema import format_quiz_item, quiz_items_to_markdown
 #from services.flashcard_gen import generate_flashcards_from_path
-from services.summarizer import summarize_text
 #from services.chapter_splitter import main_split
-from services.text_to_pdf_docx import convert_text_to_pdf, generate_pdf, generate_docx
-from services.worksheet_generator import generate_worksheet
+from services.exporter import MIME_TYPES, export_bundle, export_documents, use_streaming_export
+from services.job_queue import JobStore, ensure_worker_pool
+from models.metrics import get_metrics
+from models.token_budget import preload_encodings
 
 
 
@@ -40,8 +45,220 @@ from services.worksheet_generator import generate_worksheet
 #             st.error(f"❌ Error showing answer: {str(e)}")
 
 
+def cancel_generation():
+    cancel_event = st.session_state.get("cancel_event")
+    if cancel_event is not None:
+        cancel_event.set()
 
 
+def start_cancellable_generation():
+    cancel_event = threading.Event()
+    st.session_state.cancel_event = cancel_event
+    st.button("⏹️ Stop generating", on_click=cancel_generation)
+    return cancel_event
+
+
+def show_stream_stats(stats):
+    if stats.get("ttft") is not None:
+        st.caption(f"⚡ First token after {stats['ttft']:.1f}s · finished in {stats['total']:.1f}s")
+    if stats.get("cancelled"):
+        st.warning("⏹️ Generation stopped.")
+    elif stats.get("truncated"):
+        st.warning("✂️ The answer hit its length limit and may be cut off. Generate again with fewer questions or less text.")
+
+
+def stream_generation(stream_fn, **kwargs):
+    # Render tokens as they arrive; Stop (or any rerun) closes the HTTP stream
+    cancel_event = start_cancellable_generation()
+    stats = {}
+    text = st.write_stream(stream_fn(**kwargs, stats=stats, cancel_event=cancel_event))
+    show_stream_stats(stats)
+    return text
+
+
+def stream_question_items(items_fn, **kwargs):
+    # Each question is shown as soon as its JSON object closes
+    cancel_event = start_cancellable_generation()
+    stats = {}
+    items = []
+    for item in items_fn(**kwargs, stats=stats, cancel_event=cancel_event):
+        items.append(item)
+        st.markdown(format_quiz_item(item, len(items)).replace("\n", "  \n"))
+
+    if items:
+        with st.expander("🔑 Answer Key"):
+            st.markdown("\n".join(f"{i}. {item['answer']}" for i, item in enumerate(items, start=1)))
+    show_stream_stats(stats)
+    return items
+
+
+def extract_pdf_text(uploaded_file):
+    from services.pdf_extractor import extract_normalized_cached
+    # Cached by content hash, so widget reruns don't re-parse the PDF
+    text, stats = extract_normalized_cached(uploaded_file.getvalue())
+    saved = stats["tokens_before"] - stats["tokens_after"]
+    if saved > 0:
+        st.caption(
+            f"🧹 Cleaned extracted text: {stats['tokens_before']:,} → {stats['tokens_after']:,} tokens "
+            f"(−{saved / stats['tokens_before']:.0%}; {stats['repeated_lines']} running header/footer lines, "
+            f"{stats['pages_dropped']} near-empty pages removed)"
+        )
+    return text
+
+
+def topic_input():
+    return st.text_input("🎯 Focus on a topic (optional)", placeholder="e.g. photosynthesis", help="Only the sections most relevant to this topic are sent to the model")
+
+
+def focus_on_topic(text, topic):
+    if not topic.strip():
+        return text
+    from services.section_index import focus_material
+    material, info = focus_material(text, topic)
+    if info["sections_used"]:
+        st.caption(f"🎯 Using {info['sections_used']} of {info['sections_total']} sections ({info['tokens']:,} of {info['total_tokens']:,} tokens)")
+    elif info["sections_total"]:
+        st.warning("🎯 No sections matched the topic; using the full text.")
+    return material
+
+
+@st.cache_resource
+def start_tokenizer_preload():
+    # Once per server process, after the first page has been drawn
+    return preload_encodings()
+
+
+@st.cache_resource
+def get_job_store():
+    ensure_worker_pool()
+    return JobStore()
+
+
+def get_user_id():
+    # Kept in the URL so a browser refresh finds the same user and jobs
+    if "uid" not in st.query_params:
+        st.query_params["uid"] = uuid.uuid4().hex
+    return st.query_params["uid"]
+
+
+def submit_background_job(kind, params):
+    job_id = get_job_store().submit(kind, params, user_id=get_user_id())
+    st.session_state[f"job_{kind}"] = job_id
+    st.query_params[f"job_{kind}"] = job_id
+    return job_id
+
+
+def active_job_id(kind):
+    return st.session_state.get(f"job_{kind}") or st.query_params.get(f"job_{kind}")
+
+
+@st.fragment(run_every=2)
+def poll_background_job(kind):
+    store = get_job_store()
+    job = store.get(active_job_id(kind))
+    if job is None or job["status"] not in ("queued", "running"):
+        st.rerun()  # Finished: redraw the full page with the result
+
+    if job["status"] == "queued":
+        st.info("🕒 Waiting for a free worker...")
+    else:
+        st.progress(min(max(job["progress"], 0.02), 0.99), text=job["message"] or "Generating...")
+    if job["result"]:
+        st.markdown(job["result"])
+    if st.button("⏹️ Cancel job", key=f"cancel_{kind}"):
+        store.cancel(job["id"])
+        st.rerun()
+
+
+def streamed_export_files(text, title, file_stem, class_grade, subject, bundle):
+    # Very large outputs are rendered to temp files once per text; the download
+    # buttons get deferred readers, so a file is only read when it is clicked
+    from services.streaming_export import ExportFiles
+
+    digest = hashlib.sha256(f"{title}|{class_grade}|{subject}|{text}".encode("utf-8")).hexdigest()
+    files = st.session_state.setdefault("export_files", {})
+    exports = files.get(file_stem)
+    if exports is None or exports.digest != digest:
+        if exports is not None:
+            exports.delete()
+        exports = files[file_stem] = ExportFiles(digest)
+    readers = {fmt: exports.document(fmt, text, title, class_grade, subject) for fmt in ("pdf", "docx")}
+    if bundle:
+        readers["zip"] = exports.bundle(text, title, file_stem, class_grade, subject)
+    return readers
+
+
+def render_export_buttons(text, title, file_stem, class_grade, subject):
+    pdf_col, docx_col, zip_col = st.columns(3)
+    bundle = zip_col.checkbox("🎒 Student + teacher bundle", key=f"bundle_{file_stem}", help="One ZIP with a student copy (answers removed) and a teacher copy, as PDF and Word")
+    if use_streaming_export(text):
+        files = streamed_export_files(text, title, file_stem, class_grade, subject, bundle)
+        documents = {("teacher", fmt): files[fmt] for fmt in ("pdf", "docx")}
+        bundle_data = files.get("zip")
+    else:
+        # Both formats come from one parse and are cached, so reruns don't re-render
+        documents = export_documents(text, title, class_grade, subject)
+        bundle_data = export_bundle(text, title, file_stem, class_grade, subject) if bundle else None
+    pdf_col.download_button(
+        label="📄 Download PDF",
+        data=documents[("teacher", "pdf")],
+        file_name=f"{file_stem}.pdf",
+        mime=MIME_TYPES["pdf"],
+        key=f"pdf_{file_stem}"
+    )
+    docx_col.download_button(
+        label="📄 Download Word File",
+        data=documents[("teacher", "docx")],
+        file_name=f"{file_stem}.docx",
+        mime=MIME_TYPES["docx"],
+        key=f"docx_{file_stem}"
+    )
+    if bundle:
+        zip_col.download_button(
+            label="🗂️ Download ZIP",
+            data=bundle_data,
+            file_name=f"{file_stem}_bundle.zip",
+            mime=MIME_TYPES["zip"],
+            key=f"zip_{file_stem}"
+        )
+
+
+def render_background_job(kind, title, file_stem, class_grade, subject):
+    job_id = active_job_id(kind)
+    job = get_job_store().get(job_id) if job_id else None
+    if job is None:
+        return None
+
+    if job["status"] in ("queued", "running"):
+        poll_background_job(kind)
+    elif job["status"] == "done":
+        st.success("✅ Background job finished")
+        st.markdown(job["result"])
+        render_export_buttons(job["result"], title, file_stem, class_grade, subject)
+        return job["result"]
+    elif job["status"] == "failed":
+        st.error(f"❌ Job failed: {job['error']}")
+    else:
+        st.warning("⏹️ Job cancelled.")
+    return None
+
+
+def render_metrics_panel():
+    # Admin-only: open the app with ?admin=1 (or set SHOW_METRICS_PANEL=1)
+    if st.query_params.get("admin") != "1" and not os.getenv("SHOW_METRICS_PANEL"):
+        return
+    metrics = get_metrics()
+    summary = metrics.summary()
+    with st.sidebar.expander("📊 LLM metrics"):
+        st.caption(f"This server process, last {summary['window_seconds'] // 60} min (background workers report via METRICS_FILE)")
+        if summary["models"]:
+            st.dataframe(summary["models"], hide_index=True)
+            st.metric("Estimated cost", f"${sum(row['cost_usd'] for row in summary['models']):.4f}")
+        else:
+            st.write("No LLM calls yet.")
+        if summary["stages"]:
+            st.dataframe(summary["stages"], hide_index=True)
+        st.download_button("⬇️ Prometheus metrics", data=metrics.to_prometheus(), file_name="metrics.prom", mime="text/plain")
 
 
 st.set_page_config(page_title="AI App", layout="wide")
@@ -52,9 +269,12 @@ feature = st.sidebar.radio("Choose a feature", [
     #"📄 Flashcards",
     "📝 Quiz Generator",
     "📝 Summarizer",
-    "📄 Worksheet Generator"
+    "📄 Worksheet Generator",
+    "📦 Lesson Pack"
     #"📖 Split Chapters"
 ])
+run_in_background = st.sidebar.checkbox("🕒 Run generation in background", help="Keeps running if you change widgets or refresh the page")
+render_metrics_panel()
 class_grade_options = ["grade 1","grade 2","grade 3","grade 4","grade 5","grade 6","grade 7","grade 8","grade 9","grade 10","grade 11","grade 12","1st year college","2nd year college","3rd year college","4th year college"]
 prompt_type_options = ["Summary", "Class Notes", "Lesson Plan"]
 subject_options = ["Science", "Mathematics", "History", "Geography", "English Language", "Physics", "Chemistry", "Islamic Studies", "Computer Studies", "Biology", "Psychology", "Thermodynamics", "Other"]
@@ -78,19 +298,15 @@ format_options = ["MCQs", "True/False", "Short Answers", "Long Answers", "Fill i
 #             st.error(str(e))
 
 if feature == "📝 Quiz Generator":
+    from services.quiz_gen import generate_quiz_from_text, generate_quiz_from_text_stream, generate_quiz_items_stream, use_sharded_quiz
+
     st.title("📝 Quiz Generator")
 
     uploaded_pdf = st.file_uploader("📄 Upload a PDF (optional)", type=["pdf"])
     default_text = ""
 
     if uploaded_pdf:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            tmp_file.write(uploaded_pdf.read())
-            temp_pdf_path = tmp_file.name
-
-        reader = PdfReader(temp_pdf_path)
-        for page in reader.pages:
-            default_text += page.extract_text() or ""
+        default_text = extract_pdf_text(uploaded_pdf)
         st.success("✅ PDF text extracted!")
 
     text_input = st.text_area("✏️ Paste or edit content for quiz generation (Make sure to remove answers, before preparing PDF file.):", value=default_text, height=300)
@@ -98,58 +314,47 @@ if feature == "📝 Quiz Generator":
     class_grade = st.selectbox("Choose class grade: (Consider Intermediate/A-Level to be grade 11/12)", class_grade_options)
     subject = st.selectbox("Choose class subject:", subject_options)
     quiz_type = st.selectbox("Choose quiz style:", format_options)
-
-    if st.button("Generate Quiz") and text_input.strip():
-        with st.spinner("Generating quiz..."):
-            quiz = generate_quiz_from_text(text=text_input, num_questions=num_questions, quiz_type=quiz_type, class_grade=class_grade, subject=subject)
-            st.session_state.quiz_data = quiz  # store in session state
-            #display_quiz(quiz)
+    topic = topic_input()
+    structured = st.checkbox("📋 Structured questions (each question appears as soon as it is ready)")
+
+    generate_clicked = st.button("Generate Quiz") and text_input.strip()
+    if generate_clicked:
+        text_input = focus_on_topic(text_input, topic)
+    if run_in_background:
+        if generate_clicked:
+            submit_background_job("quiz", dict(text=text_input, num_questions=int(num_questions), quiz_type=quiz_type, class_grade=class_grade, subject=subject, structured=structured))
+        render_background_job("quiz", "Quiz", "generated_quiz", class_grade, subject)
+
+    elif generate_clicked:
+        st.subheader("🧪 AI-Generated Quiz (including answers)")
+        if use_sharded_quiz(num_questions):
+            # Large quizzes: sections are generated concurrently and merged
+            with st.spinner(f"Generating {num_questions} questions in parallel..."):
+                quiz = generate_quiz_from_text(text=text_input, num_questions=num_questions, quiz_type=quiz_type, class_grade=class_grade, subject=subject)
             st.markdown(quiz)
+        elif structured:
+            quiz_items = stream_question_items(generate_quiz_items_stream, text=text_input, num_questions=num_questions, quiz_type=quiz_type, class_grade=class_grade, subject=subject)
+            st.session_state.quiz_items = quiz_items
+            quiz = quiz_items_to_markdown(quiz_items)
+        else:
+            quiz = stream_generation(generate_quiz_from_text_stream, text=text_input, num_questions=num_questions, quiz_type=quiz_type, class_grade=class_grade, subject=subject)
+        st.session_state.quiz_data = quiz  # store in session state
+        #display_quiz(quiz)
 
-        if "quiz_data" in st.session_state:
-            quiz_text = st.session_state.quiz_data
+    elif "quiz_data" in st.session_state:
+        # Reruns (e.g. ticking the bundle checkbox) keep showing the last quiz
+        st.subheader("🧪 AI-Generated Quiz (including answers)")
+        st.markdown(st.session_state.quiz_data)
 
-            st.subheader("🧪 AI-Generated Quiz (including answers)")
-            st.markdown(quiz_text)
+    if not run_in_background and "quiz_data" in st.session_state:
+        render_export_buttons(st.session_state.quiz_data, "Quiz", "generated_quiz", class_grade, subject)
 
-            # Format quiz using LLM
-            with st.spinner("Formatting quiz for export..."):
-                formatted_quiz = convert_text_to_pdf(quiz_text)
-
-            # PDF Export
-            if st.button("Download Quiz as PDF"):
-                quiz_pdf = generate_pdf(
-                    formatted_text=formatted_quiz,
-                    title="Quiz",
-                    class_grade=class_grade,
-                    subject=subject
-                )
-                st.download_button(
-                    label="📄 Download PDF",
-                    data=quiz_pdf,
-                    file_name="generated_quiz.pdf",
-                    mime="application/pdf"
-                )
-
-            # Word Export
-            if st.button("Download Quiz as Word File"):
-                quiz_docx = generate_docx(
-                    formatted_text=formatted_quiz,
-                    title="Quiz",
-                    class_grade=class_grade,
-                    subject=subject
-                )
-                st.download_button(
-                    label="📄 Download Word File",
-                    data=quiz_docx,
-                    file_name="generated_quiz.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                )
-    
 
 
 
 elif feature == "📝 Summarizer":
+    from services.summarizer import summarize_text_stream
+
     st.title("Text Summarizer")
 
     uploaded_pdf = st.file_uploader("📄 Or upload a PDF to extract text", type=["pdf"])
@@ -157,17 +362,8 @@ elif feature == "📝 Summarizer":
     default_text = ""
 
     if uploaded_pdf:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            tmp_file.write(uploaded_pdf.read())
-            temp_pdf_path = tmp_file.name
-
-
         try:
-            reader = PdfReader(temp_pdf_path)
-            extracted_text = ""
-            for page in reader.pages:
-                extracted_text += page.extract_text() or ""
-            default_text = extracted_text.strip()
+            default_text = extract_pdf_text(uploaded_pdf)
             st.success("✅ Text extracted from PDF! You can edit it below.")
         except Exception as e:
             st.error(f"❌ Failed to extract text: {str(e)}")
@@ -176,73 +372,51 @@ elif feature == "📝 Summarizer":
     class_grade = st.selectbox("Choose class grade: (Consider Intermediate/A-Level to be grade 11/12)", class_grade_options)
     subject = st.selectbox("Choose class subject:", subject_options)
     prompt_type = st.selectbox("Choose a summary type:", prompt_type_options)
+    topic = topic_input()
 
     # Summarization and PDF generation flow
-    if st.button("Summarize") and raw_text.strip():
-        with st.spinner("Summarizing..."):
+    summarize_clicked = st.button("Summarize") and raw_text.strip()
+    if summarize_clicked:
+        raw_text = focus_on_topic(raw_text, topic)
+    if run_in_background:
+        if summarize_clicked:
+            submit_background_job("summary", dict(raw_text=raw_text, prompt_type=prompt_type, class_grade=class_grade, subject=subject))
+        render_background_job("summary", "📝 Generated Notes", "generated_notes", class_grade, subject)
+
+    elif summarize_clicked:
+        with st.container():
             try:
-                # Step 1: Summarize
-                summary = summarize_text(
+                # Step 1: Summarize (streamed)
+                st.success("📝 Summary:")
+                summary = stream_generation(
+                    summarize_text_stream,
                     prompt_type=prompt_type,
                     raw_text=raw_text,
                     class_grade=class_grade,
                     subject=subject
                 )
-                st.success("📝 Summary:")
-                st.markdown(summary)
-
-                # Step 2: Convert to formatted Markdown for PDF
-                with st.spinner("Formatting summary for PDF..."):
-                    formatted_summary = convert_text_to_pdf(summary)
-
-                # Step 3: Add PDF conversion button
-                if st.button("Convert to PDF"):
-                    pdf_bytes = generate_pdf(
-                        formatted_text=formatted_summary,
-                        title="📝 Generated Notes",
-                        class_grade=class_grade,
-                        subject=subject
-                    )
-
-                    st.download_button(
-                        label="📄 Download PDF",
-                        data=pdf_bytes,
-                        file_name="generated_notes.pdf",
-                        mime="application/pdf"
-                    )
-                # Step 4: Add DOCX conversion button
-                if st.button("Convert to Docx"):
-                    pdf_bytes = generate_docx(
-                        formatted_text=formatted_summary,
-                        title="📝 Generated Notes",
-                        class_grade=class_grade,
-                        subject=subject
-                    )
-
-                    st.download_button(
-                        label="📄 Download Docx",
-                        data=pdf_bytes,
-                        file_name="generated_notes.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
+                st.session_state.summary_data = summary
 
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
+
+    elif "summary_data" in st.session_state:
+        # Reruns (e.g. ticking the bundle checkbox) keep showing the last summary
+        st.success("📝 Summary:")
+        st.markdown(st.session_state.summary_data)
+
+    if not run_in_background and "summary_data" in st.session_state:
+        # Step 2: Export (PDF, Word, or a student/teacher bundle)
+        render_export_buttons(st.session_state.summary_data, "📝 Generated Notes", "generated_notes", class_grade, subject)
                 
 elif feature == "📄 Worksheet Generator":
+    from services.worksheet_generator import generate_worksheet_stream, generate_worksheet_items_stream
+
     uploaded_file = st.file_uploader("Upload a PDF to generate worksheets", type=["pdf"])
     default_text = ""
-    if uploaded_file and st.button("Generate Worksheet"):
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            tmp_file.write(uploaded_file.read())
-            temp_pdf_path = tmp_file.name
-
+    if uploaded_file:
         try:
-            reader = PdfReader(temp_pdf_path)
-            extracted_text = ""
-            for page in reader.pages:
-                extracted_text += page.extract_text() or ""
-            default_text = extracted_text.strip()
+            default_text = extract_pdf_text(uploaded_file)
             st.success("✅ Text extracted from PDF! You can edit it below.")
         except Exception as e:
             st.error(f"❌ Failed to extract text: {str(e)}")
@@ -252,61 +426,93 @@ elif feature == "📄 Worksheet Generator":
     subject = st.selectbox("Choose class subject:", subject_options)
     worksheet_type = st.selectbox("Choose a worksheet format:", format_options)
     num_questions = st.number_input("🔢 Number of questions", min_value=1, max_value=200, value=5, step=1)
+    topic = topic_input()
+    structured = st.checkbox("📋 Structured questions (each question appears as soon as it is ready)")
 
 
     # Worksheet generation flow
-    if st.button("Generate Worksheet") and raw_text.strip():
-        with st.spinner("Generating worksheet..."):
+    generate_clicked = st.button("Generate Worksheet") and raw_text.strip()
+    if generate_clicked:
+        raw_text = focus_on_topic(raw_text, topic)
+    if run_in_background:
+        if generate_clicked:
+            submit_background_job("worksheet", dict(raw_text=raw_text, num_questions=int(num_questions), worksheet_type=worksheet_type, class_grade=class_grade, subject=subject, structured=structured))
+        render_background_job("worksheet", "📝 Generated Worksheet", "generated_worksheet", class_grade, subject)
+
+    elif generate_clicked:
+        with st.container():
             try:
-                # Step 1: Generate Worksheet
-                worksheet = generate_worksheet(
+                # Step 1: Generate Worksheet (streamed)
+                st.success("📝 Worksheet:")
+                worksheet_args = dict(
                     worksheet_type=worksheet_type,
                     raw_text=raw_text,
                     class_grade=class_grade,
                     subject=subject,
                     num_questions=num_questions
                 )
-                st.success("📝 Worksheet:")
-                st.markdown(worksheet)
-
-                # Step 2: Convert to formatted Markdown for PDF
-                with st.spinner("Formatting worksheet for PDF..."):
-                    formatted_worksheet = convert_text_to_pdf(worksheet)
-
-                # Step 3: Add PDF conversion button
-                if st.button("Convert to PDF"):
-                    pdf_bytes = generate_pdf(
-                        formatted_text=formatted_worksheet,
-                        title="📝 Generated Worksheet",
-                        class_grade=class_grade,
-                        subject=subject
-                    )
-
-                    st.download_button(
-                        label="📄 Download PDF",
-                        data=pdf_bytes,
-                        file_name="generated_worksheet.pdf",
-                        mime="application/pdf"
-                    )
-                # Step 4: Add DOCX conversion button
-                if st.button("Convert to Docx"):
-                    pdf_bytes = generate_docx(
-                        formatted_text=formatted_worksheet,
-                        title="📝 Generated Worksheet",
-                        class_grade=class_grade,
-                        subject=subject
-                    )
-
-                    st.download_button(
-                        label="📄 Download Docx",
-                        data=pdf_bytes,
-                        file_name="generated_worksheet.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
+                if structured:
+                    worksheet = quiz_items_to_markdown(stream_question_items(generate_worksheet_items_stream, **worksheet_args))
+                else:
+                    worksheet = stream_generation(generate_worksheet_stream, **worksheet_args)
+                st.session_state.worksheet_data = worksheet
 
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
 
+    elif "worksheet_data" in st.session_state:
+        # Reruns (e.g. ticking the bundle checkbox) keep showing the last worksheet
+        st.success("📝 Worksheet:")
+        st.markdown(st.session_state.worksheet_data)
+
+    if not run_in_background and "worksheet_data" in st.session_state:
+        # Step 2: Export (PDF, Word, or a student/teacher bundle)
+        render_export_buttons(st.session_state.worksheet_data, "📝 Generated Worksheet", "generated_worksheet", class_grade, subject)
+
+elif feature == "📦 Lesson Pack":
+    from services.lesson_pack import PACK_ARTIFACTS, generate_lesson_pack
+
+    st.title("📦 Lesson Pack")
+    st.caption("Builds one compact digest of the document, then generates every selected item from it in parallel.")
+
+    uploaded_file = st.file_uploader("📄 Upload a PDF", type=["pdf"])
+    default_text = ""
+    if uploaded_file:
+        try:
+            default_text = extract_pdf_text(uploaded_file)
+            st.success("✅ Text extracted from PDF! You can edit it below.")
+        except Exception as e:
+            st.error(f"❌ Failed to extract text: {str(e)}")
+
+    raw_text = st.text_area("✏️ Paste or edit the source text", value=default_text, height=300)
+    class_grade = st.selectbox("Choose class grade: (Consider Intermediate/A-Level to be grade 11/12)", class_grade_options)
+    subject = st.selectbox("Choose class subject:", subject_options)
+    artifacts = st.multiselect("Include", list(PACK_ARTIFACTS), default=list(PACK_ARTIFACTS), format_func=PACK_ARTIFACTS.get)
+    num_questions = st.number_input("🔢 Questions per quiz / worksheet", min_value=1, max_value=100, value=10, step=1)
+    question_format = st.selectbox("Choose question style:", format_options)
+
+    if st.button("Generate Lesson Pack") and raw_text.strip() and artifacts:
+        with st.spinner("Digesting the document and generating the pack..."):
+            st.session_state.lesson_pack = generate_lesson_pack(
+                raw_text, class_grade=class_grade, subject=subject, artifacts=artifacts,
+                num_questions=int(num_questions), question_format=question_format,
+            )
+
+    pack = st.session_state.get("lesson_pack")
+    if pack:
+        tokens = pack["tokens"]
+        st.caption(f"🧮 Material sent to the model: {tokens['pack_with_digest']:,} tokens instead of {tokens['pack_without_digest']:,}")
+        for name, error in pack["errors"].items():
+            st.error(f"❌ {PACK_ARTIFACTS[name]} failed: {error}")
+
+        names = list(pack["artifacts"])
+        for name, tab in zip(names, st.tabs([PACK_ARTIFACTS[n] for n in names])):
+            with tab:
+                st.markdown(pack["artifacts"][name])
+                render_export_buttons(pack["artifacts"][name], PACK_ARTIFACTS[name], f"lesson_pack_{name}", class_grade, subject)
+        with st.expander("📚 Document digest"):
+            st.markdown(pack["digest"])
+
 # elif feature == "📖 Split Chapters":
 #     uploaded_file = st.file_uploader("Upload a PDF to split into chapters", type=["pdf"])
 #     if uploaded_file and st.button("Split Chapters"):
@@ -331,6 +537,4 @@ elif feature == "📄 Worksheet Generator":
 #             with open(ch_path, "rb") as f:
 #                 st.download_button(f"📥 Download {ch_filename}", f, file_name=ch_filename)
 
-
-
-
+start_tokenizer_preload()
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import httpx
+from openai import AsyncOpenAI, RateLimitError
+from models.response_cache import get_response_cache, make_cache_key, cache_disabled
+from models.token_budget import count_tokens
+from models.model_router import MAX_TRUNCATION_FALLBACKS, fallback_route, resolve
+from models.rate_limiter import get_rate_limiter
+from models.metrics import get_metrics
+
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+
+# Total in-flight LLM calls for the whole process, plus a tighter cap per model
+GLOBAL_CONCURRENCY = int(os.getenv("LLM_GLOBAL_CONCURRENCY", "16"))
+MODEL_CONCURRENCY = {
+    "o4-mini": 8,
+    "gpt-oss-120b": 8,
+    "gpt-5-nano-2025-08-07": 16,
+    "llama3.1": 2,
+    "mistral": 2,
+}
+DEFAULT_MODEL_CONCURRENCY = 8
+
+RATE_LIMIT_ATTEMPTS = 6
+
+REQUEST_TIMEOUT = httpx.Timeout(180.0, connect=10.0)
+POOL_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60)
+
+
+class AsyncLLMClient:
+    def __init__(self, api_key, global_concurrency=GLOBAL_CONCURRENCY, model_concurrency=None, timeout=REQUEST_TIMEOUT):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.global_concurrency = global_concurrency
+        self.model_concurrency = dict(MODEL_CONCURRENCY, **(model_concurrency or {}))
+
+        self._openai = None
+        self._ollama = None
+        self._global_semaphore = None
+        self._model_semaphores = {}
+
+    # Clients and semaphores are created on first use, inside the running loop
+    @property
+    def openai(self):
+        if self._openai is None:
+            http_client = httpx.AsyncClient(timeout=self.timeout, limits=POOL_LIMITS)
+            # max_retries=0: 429s go through the loop in _chat_once and the shared limiter
+            self._openai = AsyncOpenAI(api_key=self.api_key, http_client=http_client, timeout=self.timeout, max_retries=0)
+        return self._openai
+
+    @property
+    def ollama(self):
+        if self._ollama is None:
+            self._ollama = httpx.AsyncClient(base_url=OLLAMA_URL, timeout=self.timeout, limits=POOL_LIMITS)
+        return self._ollama
+
+    def _semaphores(self, model):
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.global_concurrency)
+        if model not in self._model_semaphores:
+            limit = self.model_concurrency.get(model, DEFAULT_MODEL_CONCURRENCY)
+            self._model_semaphores[model] = asyncio.Semaphore(limit)
+        return self._global_semaphore, self._model_semaphores[model]
+
+    async def _governed(self, model, coro_fn):
+        global_semaphore, model_semaphore = self._semaphores(model)
+        async with global_semaphore:
+            async with model_semaphore:
+                return await coro_fn()
+
+    async def chat(self, prompt, model="gpt-5-nano-2025-08-07", max_tokens=None, timeout=None, use_cache=True, expected_output_tokens=None):
+        """model="auto" is routed like llm_client.ask_openai_sync, including the
+        retry of a truncated answer on another model."""
+        model, input_tokens, budget, route = resolve(prompt, model, expected_output_tokens)
+        max_tokens = max_tokens or budget
+
+        tried = []
+        while True:
+            output, finish_reason = await self._chat_once(prompt, model, input_tokens, max_tokens, timeout, use_cache)
+            if finish_reason != "length" or route is None or len(tried) >= MAX_TRUNCATION_FALLBACKS:
+                return output
+            tried.append(model)
+            route = fallback_route(prompt, route, tried)
+            if route is None:
+                return output
+            print(f"✂️ {model} ran out of its {max_tokens}-token budget; retrying on {route['model']} with {route['max_tokens']}")
+            model, input_tokens, max_tokens = route["model"], route["input_tokens"], route["max_tokens"]
+
+    async def _chat_once(self, prompt, model, input_tokens, max_tokens, timeout=None, use_cache=True):
+        """Returns (output, finish_reason); finish_reason is None for cached answers."""
+        started = time.perf_counter()
+        metrics = get_metrics()
+
+        use_cache = use_cache and not cache_disabled()
+        if use_cache:
+            cache = get_response_cache()
+            cache_key = make_cache_key(model, prompt, max_completion_tokens=max_tokens)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                metrics.record_llm_call(model, time.perf_counter() - started, input_tokens, cache_hit=True, kind="async")
+                return cached, None
+
+        rate_limiter = get_rate_limiter()
+
+        async def call():
+            for attempt in range(1, RATE_LIMIT_ATTEMPTS + 1):
+                await rate_limiter.acquire_async(model, input_tokens + max_tokens)
+                try:
+                    raw_response = await self.openai.chat.completions.with_raw_response.create(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        max_completion_tokens=max_tokens,
+                        timeout=timeout or self.timeout,
+                    )
+                except RateLimitError as e:
+                    metrics.record_rate_limited(model)
+                    if attempt == RATE_LIMIT_ATTEMPTS:
+                        metrics.record_llm_call(model, time.perf_counter() - started, input_tokens, retries=attempt - 1, error="RateLimitError", kind="async")
+                        raise
+                    # Blocks the model for retry-after; the next acquire waits it out
+                    rate_limiter.report_rate_limited(model, e.response.headers, default_wait=min(2 ** attempt, 20))
+                    continue
+                rate_limiter.update_from_headers(model, raw_response.headers)
+                response = raw_response.parse()
+                choice = response.choices[0]
+                output = (choice.message.content or "").strip()
+                usage = response.usage
+                metrics.record_llm_call(
+                    model, time.perf_counter() - started,
+                    input_tokens=usage.prompt_tokens if usage else input_tokens,
+                    output_tokens=usage.completion_tokens if usage else count_tokens(output, model),
+                    retries=attempt - 1, kind="async",
+                )
+                return output, choice.finish_reason
+
+        output, finish_reason = await self._governed(model, call)
+        # A truncated answer must not be served from the cache later
+        if use_cache and output and finish_reason != "length":
+            cache.set(cache_key, output, model=model)
+        return output, finish_reason
+
+    async def ollama_chat(self, prompt, model="llama3.1"):
+        async def call():
+            response = await self.ollama.post("/api/chat", json={
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "stream": False,
+            })
+            response.raise_for_status()
+            return response.json()["message"]["content"].strip()
+
+        return await self._governed(model, call)
+
+    async def ollama_generate(self, prompt, model="llama3.1"):
+        async def call():
+            full_text = ""
+            async with self.ollama.stream("POST", "/api/generate", json={"model": model, "prompt": prompt, "stream": True}) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        full_text += json.loads(line).get("response", "")
+                    except json.JSONDecodeError:
+                        continue  # Skip malformed lines (rare)
+            return full_text
+
+        return await self._governed(model, call)
+
+    async def chat_many(self, prompts, model="gpt-5-nano-2025-08-07", max_concurrency=None, return_exceptions=False, **kwargs):
+        # Optional extra cap for this fan-out only, on top of the global/per-model limits
+        local = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def one(prompt):
+            if local is None:
+                return await self.chat(prompt, model=model, **kwargs)
+            async with local:
+                return await self.chat(prompt, model=model, **kwargs)
+
+        return await asyncio.gather(*(one(p) for p in prompts), return_exceptions=return_exceptions)
+
+    async def aclose(self):
+        if self._openai is not None:
+            await self._openai.close()
+        if self._ollama is not None:
+            await self._ollama.aclose()
+        self._openai = self._ollama = None
+
+
+# Sync facade: one long-lived event loop in a daemon thread, so connection
+# pools survive across Streamlit reruns and calls from any thread.
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-async-loop", daemon=True).start()
+    return _loop
+
+
+def get_async_client() -> AsyncLLMClient:
+    global _client
+    with _loop_lock:
+        if _client is None:
+            from models.llm_client import get_api_key
+            _client = AsyncLLMClient(get_api_key())
+    return _client
+
+
+def run_sync(coro, timeout=None):
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    try:
+        return future.result(timeout)
+    except BaseException:
+        # Timeout, KeyboardInterrupt or a Streamlit rerun: stop the in-flight requests too
+        future.cancel()
+        raise
+
+
+def ask_async_sync(prompt, model="gpt-5-nano-2025-08-07", timeout=None, **kwargs):
+    return run_sync(get_async_client().chat(prompt, model=model, timeout=timeout, **kwargs), timeout=timeout)
+
+
+def ask_many_sync(prompts, model="gpt-5-nano-2025-08-07", max_concurrency=None, return_exceptions=False, timeout=None, **kwargs):
+    coro = get_async_client().chat_many(prompts, model=model, max_concurrency=max_concurrency, return_exceptions=return_exceptions, **kwargs)
+    return run_sync(coro, timeout=timeout)
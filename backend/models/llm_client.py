@@ -1,12 +1,14 @@
-import requests
 import json
 import traceback
 import os
-import streamlit as st
+import time
+import threading
 from dotenv import load_dotenv
 from pathlib import Path
-from openai import OpenAIError, RateLimitError, OpenAI
-from tenacity import retry, wait_random_exponential, stop_after_attempt, retry_if_exception_type
+from tenacity import retry, wait_random_exponential, stop_after_attempt, retry_if_exception
+from models.response_cache import get_response_cache, make_cache_key, cache_disabled
+from models.rate_limiter import get_rate_limiter
+from models.metrics import get_metrics
 
 
 # # Get path to .env in parent directory
@@ -16,18 +18,54 @@ from tenacity import retry, wait_random_exponential, stop_after_attempt, retry_i
 # load_dotenv(dotenv_path=env_path)
 
 
-api_key = st.secrets["api"]["OPENAI_API_KEY"]
+def get_api_key():
+    """OPENAI_API_KEY from the environment, else Streamlit secrets when running in the app."""
+    key = os.getenv("OPENAI_API_KEY")
+    if key:
+        return key
+    try:
+        import streamlit as st
+        return st.secrets["api"]["OPENAI_API_KEY"]
+    except Exception as e:
+        raise RuntimeError("OPENAI_API_KEY is not set and no Streamlit secret is available") from e
+
+
+_client = None
+_client_lock = threading.Lock()
+
 
-# Initialize OpenAI client with your API key
-client = OpenAI(api_key=api_key )
+def get_client():
+    # Built on first use so importing the services needs neither a key, Streamlit
+    # nor the openai package (which is slow to import)
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            # No SDK retries: the rate limiter and the retry loops here are the only
+            # retry path, so every attempt is paced, honours retry-after and is counted
+            _client = OpenAI(api_key=get_api_key(), max_retries=0)
+    return _client
+
+# Keep-alive connection pool for the local Ollama server, created on first use
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+_ollama_session = None
+
+
+def get_ollama_session():
+    global _ollama_session
+    with _client_lock:
+        if _ollama_session is None:
+            import requests
+            _ollama_session = requests.Session()
+    return _ollama_session
                 
 
 
 
 
 def ask_llama3_stream_false(prompt: str, model: str = "llama3.1") -> str:
-    url = "http://localhost:11434/api/chat"
-    response = requests.post(url, json={
+    url = f"{OLLAMA_URL}/api/chat"
+    response = get_ollama_session().post(url, json={
         "model": model,
         "messages": [
             {"role": "user", "content": prompt}
@@ -41,8 +79,8 @@ def ask_llama3_stream_false(prompt: str, model: str = "llama3.1") -> str:
 
 
 def ask_llama3(prompt: str, model="llama3.1"):
-    url = "http://localhost:11434/api/generate"
-    response = requests.post(
+    url = f"{OLLAMA_URL}/api/generate"
+    response = get_ollama_session().post(
         url,
         json={"model": model, "prompt": prompt, "stream": True},
         stream=True,
@@ -60,8 +98,8 @@ def ask_llama3(prompt: str, model="llama3.1"):
     return full_text
 
 def ask_mistral(prompt: str, model="mistral"):
-    url = "http://localhost:11434/api/generate"
-    response = requests.post(
+    url = f"{OLLAMA_URL}/api/generate"
+    response = get_ollama_session().post(
         url,
         json={"model": model, "prompt": prompt, "stream": True},
         stream=True,
@@ -81,78 +119,234 @@ def ask_mistral(prompt: str, model="mistral"):
 
 
 
-import tiktoken
+from models.token_budget import AUTO_MODEL, MODEL_LIMITS, count_tokens, get_max_tokens, max_output_tokens
+from models.model_router import MAX_TRUNCATION_FALLBACKS, fallback_route, resolve
 
-# OpenAI context limits per model
-MODEL_LIMITS = {
-    "o4-mini": {"context": 200_000, "output": 100_000},
-    "gpt-4o": {"context": 128_000, "output": 16_384},
-    "gpt-3.5-turbo": {"context": 16_000, "output": 4_096},
-    "gpt-4.1-nano-2025-04-14": {"context": 1_047_576, "output": 32_768},
-    "gpt-oss-120b": {"context": 131_072, "output": 131_072},
-    "gpt-5-nano-2025-08-07": {"context": 400_000, "output": 128_000}
-}
+DEFAULT_MODEL = "gpt-5-nano-2025-08-07"
+# ask_openai_sync reports unexpected failures as text starting with this, instead of raising
+ERROR_PREFIX = "❌ Unexpected Error: "
 
-def count_tokens(text: str, model) -> int:
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text))
 
+def is_error_result(text):
+    return isinstance(text, str) and text.startswith(ERROR_PREFIX)
 
-def get_max_tokens(prompt: str, model: str) -> int:
-    input_tokens = count_tokens(prompt, model)
-    context_limit = MODEL_LIMITS.get(model, {}).get("context", 200_000)
-    output_limit = MODEL_LIMITS.get(model, {}).get("output", 100_000)
 
-    max_available = context_limit - input_tokens
-    return min(max_available, output_limit, 48_000)  # Add a safe cap
+def wait_for_rate_limit(retry_state):
+    # Honour retry-after on a 429 and hold every other caller of the model too
+    error = retry_state.outcome.exception()
+    model = retry_state.kwargs.get("model") or (retry_state.args[1] if len(retry_state.args) > 1 else DEFAULT_MODEL)
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    fallback = wait_random_exponential(min=1, max=20)(retry_state)
+    return get_rate_limiter().report_rate_limited(model, headers, default_wait=fallback)
 
-@retry(
-    wait=wait_random_exponential(min=30, max=60),  # wait 1–60s between retries
-    stop=stop_after_attempt(10),  # try up to 5 times
-    retry=retry_if_exception_type(RateLimitError),  # only retry on rate limit
-    reraise=True  # re-raises final exception if all retries fail
-)
 
+# Attempt number of the call running on this thread, so metrics can report retries
+_attempt = threading.local()
 
 
-def ask_openai_sync(prompt: str, model: str = "gpt-5-nano-2025-08-07") -> str:
-    try:
-        input_tokens = count_tokens(prompt, model)
-        max_tokens = get_max_tokens(prompt, model)
+def remember_attempt(retry_state):
+    _attempt.number = retry_state.attempt_number
+
+
+def is_rate_limit_error(error):
+    from openai import RateLimitError
+    return isinstance(error, RateLimitError)
+
+
+RATE_LIMIT_ATTEMPTS = 6
 
-        print(f"📥 Input Tokens: {input_tokens}")
-        print(f"📤 Max Output Tokens: {max_tokens}")
 
-        response = client.chat.completions.create(
+@retry(
+    wait=wait_for_rate_limit,  # retry-after header, else 1–20s jittered backoff
+    stop=stop_after_attempt(RATE_LIMIT_ATTEMPTS),
+    retry=retry_if_exception(is_rate_limit_error),  # only retry on rate limit
+    before=remember_attempt,
+    reraise=True  # re-raises final exception if all retries fail
+)
+def _ask_openai_once(prompt: str, model: str, input_tokens: int, max_tokens: int, use_cache: bool = True, response_format=None):
+    """Returns (output, finish_reason); finish_reason is None for cached answers and errors."""
+    from openai import OpenAIError, RateLimitError
+    started = time.perf_counter()
+    retries = getattr(_attempt, "number", 1) - 1
+    metrics = get_metrics()
+    try:
+        # Same model + prompt + params → reuse the stored completion
+        use_cache = use_cache and not cache_disabled()
+        if use_cache:
+            cache = get_response_cache()
+            cache_key = make_cache_key(model, prompt, max_completion_tokens=max_tokens, response_format=response_format)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                metrics.record_llm_call(model, time.perf_counter() - started, input_tokens, cache_hit=True, retries=retries)
+                return cached, None
+
+        # Pace ahead of time (OpenAI counts prompt + max_completion_tokens against TPM)
+        rate_limiter = get_rate_limiter()
+        rate_limiter.acquire(model, input_tokens + max_tokens)
+
+        raw_response = get_client().chat.completions.with_raw_response.create(
             model=model,
             messages=[{"role": "user", "content": prompt}],
             stream=False,
-            max_completion_tokens=max_tokens
+            max_completion_tokens=max_tokens,
+            **({"response_format": response_format} if response_format else {})
+        )
+        rate_limiter.update_from_headers(model, raw_response.headers)
+        response = raw_response.parse()
+
+        choice = response.choices[0]
+        output = (choice.message.content or "").strip()
+        usage = response.usage
+        output_tokens = usage.completion_tokens if usage else count_tokens(output, model)
+        metrics.record_llm_call(
+            model, time.perf_counter() - started,
+            input_tokens=usage.prompt_tokens if usage else input_tokens,
+            output_tokens=output_tokens, retries=retries,
         )
 
-        output = response.choices[0].message.content.strip()
-        output_tokens = count_tokens(output, model)
+        # A truncated answer must not be served from the cache later
+        if use_cache and output and choice.finish_reason != "length":
+            cache.set(cache_key, output, model=model)
+        return output, choice.finish_reason
 
-        print(f"✅ Output Tokens: {output_tokens}")
-        return output
+    except RateLimitError:
+        # Counted on every attempt, including the last one that tenacity gives up on
+        metrics.record_rate_limited(model)
+        if retries + 1 >= RATE_LIMIT_ATTEMPTS:
+            metrics.record_llm_call(model, time.perf_counter() - started, input_tokens, retries=retries, error="RateLimitError")
+        raise  # tenacity retries after wait_for_rate_limit
 
     except OpenAIError as e:
         print(f"🚫 OpenAI API error: {e}")
         traceback.print_exc()
-        raise  # Reraise for tenacity to catch and retry
+        metrics.record_llm_call(model, time.perf_counter() - started, input_tokens, retries=retries, error=type(e).__name__)
+        raise
 
     except Exception as e:
+        metrics.record_llm_call(model, time.perf_counter() - started, input_tokens, retries=retries, error=type(e).__name__)
         print(f"❌ Unexpected error: {e}")
         traceback.print_exc()
-        return f"❌ Unexpected Error: {e}"
+        return f"{ERROR_PREFIX}{e}", None
+
+
+def ask_openai_sync(prompt: str, model: str = AUTO_MODEL, use_cache: bool = True, response_format=None, expected_output_tokens=None) -> str:
+    """With model="auto" the router picks the model and sizes max_completion_tokens
+    from `expected_output_tokens`; a truncated answer is retried on another model
+    with twice the budget."""
+    try:
+        model, input_tokens, max_tokens, route = resolve(prompt, model, expected_output_tokens)
+    except Exception as e:
+        print(f"❌ Unexpected error: {e}")
+        return f"{ERROR_PREFIX}{e}"
+
+    tried = []
+    while True:
+        output, finish_reason = _ask_openai_once(prompt, model, input_tokens, max_tokens, use_cache, response_format)
+        if finish_reason != "length" or route is None or len(tried) >= MAX_TRUNCATION_FALLBACKS:
+            return output
+        tried.append(model)
+        route = fallback_route(prompt, route, tried)
+        if route is None:
+            return output
+        print(f"✂️ {model} ran out of its {max_tokens}-token budget; retrying on {route['model']} with {route['max_tokens']}")
+        model, input_tokens, max_tokens = route["model"], route["input_tokens"], route["max_tokens"]
+
+
+def ask_openai_stream(prompt: str, model: str = AUTO_MODEL, stats=None, cancel_event=None, use_cache: bool = True, response_format=None, expected_output_tokens=None):
+    """Yields completion text as it arrives. Fills `stats` with ttft/total seconds;
+    setting `cancel_event` (or closing the generator) closes the HTTP stream.
+    model="auto" is routed like ask_openai_sync, but a streamed answer is never
+    retried: `stats["truncated"]` reports when it hit the budget."""
+    stats = stats if stats is not None else {}
+    stats.update({"ttft": None, "total": None, "cancelled": False, "cached": False, "truncated": False})
+    started = time.perf_counter()
+
+    model, input_tokens, max_tokens, _ = resolve(prompt, model, expected_output_tokens)
+    use_cache = use_cache and not cache_disabled()
+    if use_cache:
+        cache = get_response_cache()
+        cache_key = make_cache_key(model, prompt, max_completion_tokens=max_tokens, response_format=response_format)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            stats.update({"ttft": time.perf_counter() - started, "total": time.perf_counter() - started, "cached": True})
+            get_metrics().record_llm_call(model, stats["total"], input_tokens, ttft=stats["ttft"], cache_hit=True, kind="stream")
+            yield cached
+            return
+
+    from openai import RateLimitError
+    rate_limiter = get_rate_limiter()
+    for attempt in range(1, RATE_LIMIT_ATTEMPTS + 1):
+        rate_limiter.acquire(model, input_tokens + max_tokens)
+        try:
+            raw_response = get_client().chat.completions.with_raw_response.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                stream_options={"include_usage": True},  # final chunk carries token usage
+                max_completion_tokens=max_tokens,
+                **({"response_format": response_format} if response_format else {})
+            )
+        except RateLimitError as e:
+            # A 429 arrives before any token, so the stream can simply be reopened
+            get_metrics().record_rate_limited(model)
+            if attempt == RATE_LIMIT_ATTEMPTS:
+                get_metrics().record_llm_call(model, time.perf_counter() - started, input_tokens, retries=attempt - 1, error="RateLimitError", kind="stream")
+                raise
+            # Blocks the model for retry-after; the next acquire waits it out
+            rate_limiter.report_rate_limited(model, e.response.headers, default_wait=min(2 ** attempt, 20))
+            continue
+        break
+    rate_limiter.update_from_headers(model, raw_response.headers)
+    stream = raw_response.parse()
+
+    parts = []
+    usage = None
+    completed = False
+    try:
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                stats["cancelled"] = True
+                print("⏹️ Stream cancelled by user")
+                break
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            if chunk.choices[0].finish_reason == "length":
+                stats["truncated"] = True
+            token = chunk.choices[0].delta.content
+            if token:
+                if stats["ttft"] is None:
+                    stats["ttft"] = time.perf_counter() - started
+                parts.append(token)
+                yield token
+        else:
+            completed = True
+    except GeneratorExit:
+        # Consumer went away (e.g. Streamlit rerun) mid-stream
+        stats["cancelled"] = True
+        raise
+    finally:
+        stream.close()
+        stats["total"] = time.perf_counter() - started
+        get_metrics().record_llm_call(
+            model, stats["total"],
+            input_tokens=usage.prompt_tokens if usage else input_tokens,
+            output_tokens=usage.completion_tokens if usage else count_tokens("".join(parts), model),
+            ttft=stats["ttft"], retries=attempt - 1, kind="stream",
+            error="cancelled" if stats["cancelled"] else None,
+        )
+
+    output = "".join(parts).strip()
+    if stats["truncated"]:
+        print(f"✂️ {model} ran out of its {max_tokens}-token budget")
+    elif use_cache and completed and output:
+        cache.set(cache_key, output, model=model)
 
 
 def ask_openai_chat_streaming(messages: list, model: str = "gpt-oss-120b"):
     try:
-        stream = client.chat.completions.create(
+        stream = get_client().chat.completions.create(
             model=model,
             messages=messages,
             stream=True
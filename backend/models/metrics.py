@@ -0,0 +1,266 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+# USD per 1M tokens (input, output). Local Ollama models cost nothing.
+MODEL_PRICES = {
+    "o4-mini": (1.10, 4.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4.1-nano-2025-04-14": (0.10, 0.40),
+    "gpt-oss-120b": (0.15, 0.60),
+    "gpt-5-nano-2025-08-07": (0.05, 0.40),
+    "llama3.1": (0.0, 0.0),
+    "mistral": (0.0, 0.0),
+}
+DEFAULT_PRICE = (1.00, 4.00)  # unknown models: assume mid-range so cost isn't under-reported
+
+WINDOW_SECONDS = int(os.getenv("METRICS_WINDOW_SECONDS", "900"))
+WINDOW_EVENTS = 5_000
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Optional Prometheus textfile (node_exporter textfile collector); "{pid}" gives each process its own file
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_FILE_INTERVAL = 5.0
+
+
+def estimate_cost(model, input_tokens, output_tokens):
+    input_price, output_price = MODEL_PRICES.get(model, DEFAULT_PRICE)
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+
+class MetricsRegistry:
+    """Per-process LLM call and stage metrics.
+
+    Keeps a rolling window of recent events for the admin panel and
+    cumulative counters/histograms for Prometheus scraping.
+    """
+
+    def __init__(self, window_seconds=WINDOW_SECONDS, max_events=WINDOW_EVENTS):
+        self.window_seconds = window_seconds
+        self.llm_events = deque(maxlen=max_events)
+        self.stage_events = deque(maxlen=max_events)
+        self.counters = defaultdict(float)      # (name, labels tuple) -> value
+        self.histograms = defaultdict(_Histogram)
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._last_file_write = 0.0
+
+    def record_llm_call(self, model, wall, input_tokens=0, output_tokens=0, ttft=None, retries=0, cache_hit=False, error=None, kind="sync"):
+        cost = 0.0 if cache_hit else estimate_cost(model, input_tokens, output_tokens)
+        event = {
+            "time": time.time(), "model": model, "kind": kind, "wall": wall, "ttft": ttft,
+            "input_tokens": input_tokens, "output_tokens": output_tokens, "retries": retries,
+            "cache_hit": cache_hit, "error": error, "cost": cost,
+        }
+        labels = (("model", model), ("kind", kind))
+        with self._lock:
+            self.llm_events.append(event)
+            self.counters[("llm_calls_total", labels)] += 1
+            self.counters[("llm_cache_hits_total", labels)] += bool(cache_hit)
+            self.counters[("llm_errors_total", labels)] += bool(error)
+            self.counters[("llm_retries_total", labels)] += retries
+            self.counters[("llm_input_tokens_total", labels)] += 0 if cache_hit else input_tokens
+            self.counters[("llm_output_tokens_total", labels)] += 0 if cache_hit else output_tokens
+            self.counters[("llm_cost_usd_total", labels)] += cost
+            if not cache_hit:
+                self.histograms[("llm_call_seconds", labels)].observe(wall)
+                if ttft is not None:
+                    self.histograms[("llm_ttft_seconds", labels)].observe(ttft)
+        self._maybe_write_file()
+
+    def record_rate_limited(self, model):
+        with self._lock:
+            self.counters[("llm_rate_limited_total", (("model", model),))] += 1
+
+    def retry_totals(self):
+        """Cumulative retries and 429s over all models, for checking against server-side counts."""
+        totals = {"retries": 0, "rate_limited": 0}
+        with self._lock:
+            for (name, _), value in self.counters.items():
+                if name == "llm_retries_total":
+                    totals["retries"] += int(value)
+                elif name == "llm_rate_limited_total":
+                    totals["rate_limited"] += int(value)
+        return totals
+
+    def record_stage(self, stage, seconds, error=False):
+        labels = (("stage", stage),)
+        with self._lock:
+            self.stage_events.append({"time": time.time(), "stage": stage, "seconds": seconds, "error": error})
+            self.counters[("stage_runs_total", labels)] += 1
+            self.counters[("stage_errors_total", labels)] += bool(error)
+            self.histograms[("stage_seconds", labels)].observe(seconds)
+        self._maybe_write_file()
+
+    def _recent(self, events):
+        cutoff = time.time() - self.window_seconds
+        with self._lock:
+            return [e for e in events if e["time"] >= cutoff]
+
+    def summary(self):
+        """Rolling-window aggregates: one row per model and one per stage."""
+        by_model = defaultdict(list)
+        for event in self._recent(self.llm_events):
+            by_model[event["model"]].append(event)
+
+        models = []
+        for model, events in sorted(by_model.items()):
+            live = [e for e in events if not e["cache_hit"]]
+            walls = [e["wall"] for e in live]
+            ttfts = [e["ttft"] for e in live if e["ttft"] is not None]
+            models.append({
+                "model": model,
+                "calls": len(events),
+                "cache_hit_rate": sum(e["cache_hit"] for e in events) / len(events),
+                "errors": sum(bool(e["error"]) for e in events),
+                "retries": sum(e["retries"] for e in events),
+                "p50_s": _percentile(walls, 0.5),
+                "p95_s": _percentile(walls, 0.95),
+                "ttft_p50_s": _percentile(ttfts, 0.5),
+                "tokens_in": sum(e["input_tokens"] for e in live),
+                "tokens_out": sum(e["output_tokens"] for e in live),
+                "cost_usd": round(sum(e["cost"] for e in events), 4),
+            })
+
+        by_stage = defaultdict(list)
+        for event in self._recent(self.stage_events):
+            by_stage[event["stage"]].append(event["seconds"])
+        stages = [
+            {"stage": stage, "runs": len(times), "p50_s": _percentile(times, 0.5), "p95_s": _percentile(times, 0.95), "total_s": sum(times)}
+            for stage, times in sorted(by_stage.items())
+        ]
+        return {"window_seconds": self.window_seconds, "models": models, "stages": stages}
+
+    def to_prometheus(self):
+        """Cumulative metrics in the Prometheus text exposition format."""
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(h.buckets), h.count, h.sum)) for key, h in self.histograms.items())
+
+        lines = ["# TYPE process_uptime_seconds gauge", f"process_uptime_seconds {time.time() - self.started:.3f}"]
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f"# TYPE {name} counter")
+                declared.add(name)
+            lines.append(f"{name}{label_text(labels)} {value}")
+        for (name, labels), (buckets, count, total) in histograms:
+            if name not in declared:
+                lines.append(f"# TYPE {name} histogram")
+                declared.add(name)
+            for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f"{name}_bucket{label_text(labels, [('le', bound)])} {bucket_count}")
+            lines.append(f"{name}_bucket{label_text(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{label_text(labels)} {total:.6f}")
+            lines.append(f"{name}_count{label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_file(self, path):
+        path = str(path).replace("{pid}", str(os.getpid()))
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def _maybe_write_file(self):
+        if not METRICS_FILE:
+            return
+        now = time.monotonic()
+        if now - self._last_file_write < METRICS_FILE_INTERVAL:
+            return
+        self._last_file_write = now
+        try:
+            self.write_prometheus_file(METRICS_FILE)
+        except OSError as e:
+            print(f"⚠️ Could not write metrics file: {e}")
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+    return _metrics
+
+
+@contextmanager
+def stage_timer(stage):
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except GeneratorExit:
+        raise  # consumer stopped a stream early; not a failure
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        get_metrics().record_stage(stage, time.perf_counter() - started, error=failed)
+
+
+def _timed_generator(stage, generator, started):
+    failed = False
+    try:
+        yield from generator
+    except GeneratorExit:
+        raise
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        get_metrics().record_stage(stage, time.perf_counter() - started, error=failed)
+
+
+def timed_stage(stage):
+    """Decorator form of stage_timer. Streams (generator functions, or functions
+    returning a generator) are timed until the consumer finishes iterating."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                get_metrics().record_stage(stage, time.perf_counter() - started, error=True)
+                raise
+            if inspect.isgenerator(result):
+                return _timed_generator(stage, result, started)
+            get_metrics().record_stage(stage, time.perf_counter() - started)
+            return result
+        return wrapper
+    return decorator
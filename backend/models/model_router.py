@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+from models.metrics import DEFAULT_PRICE, MODEL_PRICES
+from models.token_budget import AUTO_MODEL, OUTPUT_SAFETY_CAP, count_tokens, get_encoding, max_output_tokens, model_limits, plan_budget
+
+
+# model="auto" routing: the cheapest (then fastest) model whose context fits the
+# measured prompt plus the expected answer, with max_completion_tokens sized to
+# that answer instead of the 48k safety cap. The reservation counts against the
+# TPM quota, so oversized budgets throttle every other call.
+
+# Candidate models. latency: rough seconds per 1k generated tokens; reasoning:
+# hidden reasoning tokens reserved on top of the visible answer. Prices come from
+# metrics.MODEL_PRICES unless an entry has "price": [input, output] (USD per 1M).
+# MODEL_ROUTES_FILE points at a JSON file of the same shape that overrides or
+# adds entries; "enabled": false removes a model from routing.
+ROUTES = {
+    "gpt-5-nano-2025-08-07": {"latency": 8.0, "reasoning": 4_000},
+    "gpt-4.1-nano-2025-04-14": {"latency": 4.0, "reasoning": 0},
+    "gpt-oss-120b": {"latency": 3.0, "reasoning": 2_000},
+    "o4-mini": {"latency": 10.0, "reasoning": 8_000},
+}
+ROUTES_FILE = os.getenv("MODEL_ROUTES_FILE")
+
+COST_TOLERANCE = 1.2            # among models within 20% of the cheapest, the fastest wins
+OUTPUT_MARGIN = 1.3             # headroom over the expected answer length
+UNKNOWN_OUTPUT_TOKENS = 4_000   # expected answer when the caller gives no estimate
+MAX_TRUNCATION_FALLBACKS = 2
+TOKENS_PER_QUESTION = 120       # question, options and its answer-key line
+
+_routes = None
+_routes_lock = threading.Lock()
+
+
+def load_routes(path=ROUTES_FILE):
+    routes = {model: dict(entry) for model, entry in ROUTES.items()}
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            for model, entry in json.load(f).items():
+                routes.setdefault(model, {}).update(entry)
+    return {model: entry for model, entry in routes.items() if entry.get("enabled", True)}
+
+
+def get_routes():
+    global _routes
+    with _routes_lock:
+        if _routes is None:
+            _routes = load_routes()
+        return _routes
+
+
+def question_output_tokens(num_questions):
+    """Expected answer length for a quiz or worksheet of `num_questions`."""
+    return 200 + int(num_questions) * TOKENS_PER_QUESTION
+
+
+def reserved_output_tokens(model, expected_output_tokens):
+    reasoning = get_routes().get(model, {}).get("reasoning", 0)
+    return int(expected_output_tokens * OUTPUT_MARGIN) + reasoning
+
+
+def _prompt_tokens(prompt, models):
+    # One count per tokenizer, not per model
+    by_encoding, counts = {}, {}
+    for model in models:
+        name = get_encoding(model).name
+        if name not in by_encoding:
+            by_encoding[name] = count_tokens(prompt, model)
+        counts[model] = by_encoding[name]
+    return counts
+
+
+def choose_route(prompt, expected_output_tokens=None, exclude=()):
+    """Returns {"model", "input_tokens", "max_tokens", "expected_output_tokens", "cost"}.
+
+    Raises ValueError when the prompt and answer fit no enabled model.
+    """
+    expected = expected_output_tokens or UNKNOWN_OUTPUT_TOKENS
+    routes = {model: entry for model, entry in get_routes().items() if model not in exclude}
+    input_counts = _prompt_tokens(prompt, routes)
+
+    candidates = []
+    for model, entry in routes.items():
+        context_limit, output_limit = model_limits(model)
+        input_tokens = input_counts[model]
+        needed = reserved_output_tokens(model, expected)
+        # max_tokens is clamped to the safety cap, so a larger need doesn't fit
+        if needed > min(output_limit, OUTPUT_SAFETY_CAP) or input_tokens + needed > context_limit:
+            continue
+        input_price, output_price = entry.get("price") or MODEL_PRICES.get(model, DEFAULT_PRICE)
+        generated = expected + entry.get("reasoning", 0)
+        candidates.append({
+            "model": model,
+            "input_tokens": input_tokens,
+            "max_tokens": min(needed, max_output_tokens(input_tokens, model)),
+            "expected_output_tokens": expected,
+            "cost": (input_tokens * input_price + generated * output_price) / 1_000_000,
+            "latency": entry.get("latency", 0.0) * generated / 1000,
+        })
+
+    if not candidates:
+        raise ValueError(f"No routable model fits a {max(input_counts.values(), default=0)}-token prompt with a {expected}-token answer")
+    cheapest = min(c["cost"] for c in candidates)
+    affordable = [c for c in candidates if c["cost"] <= cheapest * COST_TOLERANCE]
+    return min(affordable, key=lambda c: (c["latency"], c["cost"]))
+
+
+def fallback_route(prompt, route, tried):
+    """After a truncated answer: twice the answer budget on a model not tried yet, or None."""
+    try:
+        return choose_route(prompt, route["expected_output_tokens"] * 2, exclude=tried)
+    except ValueError:
+        return None
+
+
+def resolve(prompt, model, expected_output_tokens=None):
+    """(model, input_tokens, max_tokens, route) for a call; route is None for a pinned model."""
+    if model == AUTO_MODEL:
+        route = choose_route(prompt, expected_output_tokens)
+        return route["model"], route["input_tokens"], route["max_tokens"], route
+    # Pinned model: max_completion_tokens is sized to the expected answer when
+    # there is an estimate, else the capped maximum the prompt leaves free
+    reserve = reserved_output_tokens(model, expected_output_tokens) if expected_output_tokens else None
+    plan = plan_budget(model, prompt, reserve_output=reserve)
+    return model, plan["instruction_tokens"], plan["output_tokens"], None
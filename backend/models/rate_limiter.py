@@ -0,0 +1,178 @@
+import asyncio
+import os
+import re
+import threading
+import time
+
+
+# Starting points per model; the x-ratelimit-* response headers correct them at runtime
+RATE_LIMITS = {
+    "o4-mini": {"rpm": 500, "tpm": 200_000},
+    "gpt-4o": {"rpm": 500, "tpm": 30_000},
+    "gpt-3.5-turbo": {"rpm": 3_500, "tpm": 200_000},
+    "gpt-4.1-nano-2025-04-14": {"rpm": 500, "tpm": 200_000},
+    "gpt-oss-120b": {"rpm": 500, "tpm": 200_000},
+    "gpt-5-nano-2025-08-07": {"rpm": 500, "tpm": 200_000},
+}
+DEFAULT_RATE_LIMIT = {
+    "rpm": int(os.getenv("LLM_DEFAULT_RPM", "500")),
+    "tpm": int(os.getenv("LLM_DEFAULT_TPM", "200000")),
+}
+
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value):
+    """Parses OpenAI reset values such as '20ms', '1s' or '6m0s' into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def retry_after_seconds(headers):
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+class TokenBucket:
+    """Bucket that may go into debt: a reservation is taken immediately and the
+    caller is told how long to wait until the bucket has paid it back. Callers
+    are therefore paced in arrival order instead of racing for refills."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def sync(self, limit=None, remaining=None, now=None):
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+            self.rate = self.capacity / 60.0
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+
+
+class ModelRateLimiter:
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens):
+        with self.lock:
+            now = time.monotonic()
+            wait = max(self.requests.reserve(1, now), self.tokens.reserve(tokens, now))
+            return max(wait, self.blocked_until - now)
+
+    def block_for(self, seconds):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        if not headers:
+            return
+        now = time.monotonic()
+        with self.lock:
+            self.requests.sync(
+                limit=_int_header(headers, "x-ratelimit-limit-requests"),
+                remaining=_int_header(headers, "x-ratelimit-remaining-requests"),
+                now=now,
+            )
+            self.tokens.sync(
+                limit=_int_header(headers, "x-ratelimit-limit-tokens"),
+                remaining=_int_header(headers, "x-ratelimit-remaining-tokens"),
+                now=now,
+            )
+            # Out of budget: hold everyone until the window resets
+            for kind in ("requests", "tokens"):
+                if _int_header(headers, f"x-ratelimit-remaining-{kind}") == 0:
+                    reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if reset:
+                        self.blocked_until = max(self.blocked_until, now + reset)
+
+
+def _int_header(headers, name):
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """Process-wide registry: every session and thread paces against the same buckets."""
+
+    def __init__(self, limits=None):
+        self.limits = dict(RATE_LIMITS, **(limits or {}))
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def for_model(self, model):
+        with self._lock:
+            if model not in self._models:
+                limits = self.limits.get(model, DEFAULT_RATE_LIMIT)
+                self._models[model] = ModelRateLimiter(limits["rpm"], limits["tpm"])
+            return self._models[model]
+
+    def acquire(self, model, tokens):
+        wait = self.for_model(model).reserve(tokens)
+        if wait > 0:
+            print(f"⏳ Pacing {model}: waiting {wait:.1f}s for rate limit budget")
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, model, tokens):
+        wait = self.for_model(model).reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def update_from_headers(self, model, headers):
+        self.for_model(model).update_from_headers(headers)
+
+    def report_rate_limited(self, model, headers=None, default_wait=2.0):
+        """Called on a 429; blocks the model for retry-after and returns that delay."""
+        wait = retry_after_seconds(headers) or default_wait
+        limiter = self.for_model(model)
+        limiter.update_from_headers(headers)
+        limiter.block_for(wait)
+        return wait
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+    return _rate_limiter
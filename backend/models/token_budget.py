@@ -0,0 +1,122 @@
+import threading
+from functools import lru_cache
+
+
+# OpenAI context limits per model
+MODEL_LIMITS = {
+    "o4-mini": {"context": 200_000, "output": 100_000},
+    "gpt-4o": {"context": 128_000, "output": 16_384},
+    "gpt-3.5-turbo": {"context": 16_000, "output": 4_096},
+    "gpt-4.1-nano-2025-04-14": {"context": 1_047_576, "output": 32_768},
+    "gpt-oss-120b": {"context": 131_072, "output": 131_072},
+    "gpt-5-nano-2025-08-07": {"context": 400_000, "output": 128_000}
+}
+
+DEFAULT_CONTEXT = 200_000
+DEFAULT_OUTPUT = 100_000
+OUTPUT_SAFETY_CAP = 48_000
+
+# model="auto" lets models.model_router pick the model per call; token counts
+# for it use o200k_base, the tokenizer of every routed model
+AUTO_MODEL = "auto"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model):
+    # encoding_for_model does a registry lookup and may load BPE files; do it once per model
+    import tiktoken
+    if model == AUTO_MODEL:
+        return tiktoken.get_encoding("o200k_base")
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def preload_encodings(models=None):
+    """Loads the tokenizers on a daemon thread so the first count_tokens call is fast."""
+    def load():
+        for model in models or (*MODEL_LIMITS, AUTO_MODEL):
+            get_encoding(model)
+
+    thread = threading.Thread(target=load, name="tiktoken-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def encode(text: str, model) -> list:
+    return get_encoding(model).encode(text, disallowed_special=())
+
+
+def count_tokens(text: str, model) -> int:
+    return len(encode(text, model))
+
+
+def count_tokens_batch(texts, model) -> list:
+    encoded = get_encoding(model).encode_batch(list(texts), disallowed_special=())
+    return [len(tokens) for tokens in encoded]
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model, on_newline: bool = False) -> str:
+    """Encodes once and slices. With on_newline, backs off to the last full line."""
+    tokens = encode(text, model)
+    if len(tokens) <= max_tokens:
+        return text
+
+    truncated = get_encoding(model).decode(tokens[:max_tokens])
+    if on_newline and "\n" in truncated:
+        truncated = truncated[:truncated.rfind("\n")]
+    return truncated
+
+
+def split_by_tokens(text: str, max_tokens: int, model) -> list:
+    """Encodes once and cuts into (piece, token count) slices of at most max_tokens."""
+    tokens = encode(text, model)
+    decode = get_encoding(model).decode
+    return [(decode(tokens[i:i + max_tokens]), len(tokens[i:i + max_tokens])) for i in range(0, len(tokens), max_tokens)]
+
+
+def model_limits(model):
+    if model == AUTO_MODEL:
+        # The router picks a model the prompt fits, so the largest window bounds it
+        return max(l["context"] for l in MODEL_LIMITS.values()), max(l["output"] for l in MODEL_LIMITS.values())
+    limits = MODEL_LIMITS.get(model, {})
+    return limits.get("context", DEFAULT_CONTEXT), limits.get("output", DEFAULT_OUTPUT)
+
+
+def max_output_tokens(input_tokens: int, model, cap: int = OUTPUT_SAFETY_CAP) -> int:
+    context_limit, output_limit = model_limits(model)
+    return max(0, min(context_limit - input_tokens, output_limit, cap))
+
+
+def get_max_tokens(prompt: str, model: str) -> int:
+    return plan_budget(model, prompt)["output_tokens"]
+
+
+def plan_budget(model, instructions: str, material: str = "", reserve_output: int = None, output_cap: int = OUTPUT_SAFETY_CAP):
+    """Splits the context window into instruction, material and output reservations.
+
+    Material that does not fit next to the instructions and the reserved output
+    is truncated on a line boundary. "output_tokens" is the max_completion_tokens
+    to send: the reservation, or whatever the prompt leaves free if that is less.
+    """
+    context_limit, output_limit = model_limits(model)
+    reserved = min(reserve_output or output_cap, output_limit, output_cap)
+
+    instruction_tokens = count_tokens(instructions, model)
+    material_budget = max(0, context_limit - instruction_tokens - reserved)
+
+    material_tokens = count_tokens(material, model) if material else 0
+    truncated = material_tokens > material_budget
+    if truncated:
+        material = truncate_to_tokens(material, material_budget, model, on_newline=True)
+        material_tokens = count_tokens(material, model)
+
+    return {
+        "context": context_limit,
+        "instruction_tokens": instruction_tokens,
+        "material_tokens": material_tokens,
+        "output_tokens": min(reserved, max_output_tokens(instruction_tokens + material_tokens, model, output_cap)),
+        "material": material,
+        "truncated": truncated,
+    }
@@ -1,26 +1,33 @@
 import fitz  # PyMuPDF
-from PyPDF2 import PdfReader, PdfWriter
 import os
 import re
 import json
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from models.llm_client import ask_llama3_stream_false, ask_openai_sync
+from models.metrics import timed_stage
+from services.page_numbers import detect_visible_page_map, fit_visible_to_internal, header_footer_numbers
+
+
+SKIP_CHAPTER_TITLES = re.compile(r"^\s*(preface|foreword|about the author|acknowledg|contents|table of contents|index|bibliography|references|glossary|copyright|dedication|title page|cover)\b", re.IGNORECASE)
+SPLIT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+@contextmanager
+def open_pdf(pdf):
+    # Accept a path or an already opened document so callers can share one handle;
+    # only a document opened here is closed here
+    if isinstance(pdf, fitz.Document):
+        yield pdf
+    else:
+        with fitz.open(pdf) as doc:
+            yield doc
 
 
 def get_visible_page_numbers(pdf_path):
-    doc = fitz.open(pdf_path)
-    page_number_map = {}
-    for i, page in enumerate(doc):
-        text = page.get_text("text")
-        lines = [line.strip() for line in text.split("\n") if line.strip()]
-        candidates = lines[:3] + lines[-3:]
-        for line in candidates:
-            match = re.search(r"(\d+)", line)
-            if match:
-                visible_page = int(match.group(1))
-                if visible_page not in page_number_map:
-                    page_number_map[visible_page] = i
-                break
-    return page_number_map
+    # Header/footer clip scan with offset fitting; see services/page_numbers.py
+    with open_pdf(pdf_path) as doc:
+        return fit_visible_to_internal([header_footer_numbers(page) for page in doc])
 
 
 def map_chapters_to_internal_indices(chapters, visible_to_internal):
@@ -42,6 +49,8 @@ def interpolate_visible_to_internal_map(visible_to_internal, max_interpolation_r
     
     known = sorted(visible_to_internal.items())
     full_map = {}
+    if not known:
+        return full_map
 
     for i in range(len(known) - 1):
         vis1, int1 = known[i]
@@ -64,40 +73,94 @@ def interpolate_visible_to_internal_map(visible_to_internal, max_interpolation_r
     return full_map
 
 
-def split_pdf_by_chapter_list(pdf_path, chapters, output_dir):
-    os.makedirs(output_dir, exist_ok=True)
-    reader = PdfReader(pdf_path)
-    total_pages = len(reader.pages)
+_split_source = None
+
+
+def _init_split_worker(pdf_path):
+    # Each worker process opens the source once and reuses it for all its chapters
+    global _split_source
+    _split_source = fitz.open(pdf_path)
+
 
+def _write_chapter(job):
+    start, end, out_path = job
+    chapter = fitz.open()
+    chapter.insert_pdf(_split_source, from_page=start, to_page=end - 1)
+    chapter.save(out_path, garbage=3, deflate=True)
+    chapter.close()
+    return out_path
+
+
+def chapter_page_ranges(chapters, total_pages, output_dir):
+    jobs = []
     for i, chap in enumerate(chapters):
         start = chap["page"]
         end = chapters[i + 1]["page"] if i + 1 < len(chapters) else total_pages
-
-        writer = PdfWriter()
-        for p in range(start, end):
-            writer.add_page(reader.pages[p])
+        if end <= start:
+            continue
 
         safe_title = re.sub(r"[^\w\-_. ]", "_", chap["title"])[:50]
         out_path = os.path.join(output_dir, f"{i+1:02d}_{safe_title}.pdf")
+        jobs.append((start, end, out_path))
+    return jobs
 
-        with open(out_path, "wb") as f:
-            writer.write(f)
 
+def split_pdf_by_chapter_list(pdf_path, chapters, output_dir, total_pages=None, max_workers=SPLIT_WORKERS):
+    os.makedirs(output_dir, exist_ok=True)
+    if total_pages is None:
+        with fitz.open(pdf_path) as doc:
+            total_pages = len(doc)
+
+    jobs = chapter_page_ranges(chapters, total_pages, output_dir)
+    if max_workers <= 1 or len(jobs) <= 1:
+        _init_split_worker(pdf_path)
+        try:
+            saved = [_write_chapter(job) for job in jobs]
+        finally:
+            _split_source.close()
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs)), initializer=_init_split_worker, initargs=(pdf_path,)) as executor:
+            saved = list(executor.map(_write_chapter, jobs))
+
+    for out_path in saved:
         print(f"✅ Saved: {out_path}")
+    return saved
+
+
+def chapters_from_outline(doc):
+    """Top-level chapters from the embedded PDF outline, as internal (0-based) pages."""
+    toc = doc.get_toc(simple=True)
+    if not toc:
+        return []
+
+    # A single level-1 entry is usually the book title; use its children instead
+    top_level = min(level for level, _, _ in toc)
+    entries = [e for e in toc if e[0] == top_level]
+    if len(entries) < 2:
+        entries = [e for e in toc if e[0] == top_level + 1]
+
+    chapters = []
+    for _, title, page in entries:
+        if page < 1 or SKIP_CHAPTER_TITLES.match(title):
+            continue
+        chapters.append({"title": title.strip(), "page": page - 1})
+
+    chapters.sort(key=lambda x: x["page"])
+    return chapters if len(chapters) >= 2 else []
 
 
 def extract_chapters_from_index_with_llm(pdf_path, model="gpt-oss-120b", max_pages=10):
-    doc = fitz.open(pdf_path)
     index_texts = []
-    for i in range(min(max_pages, len(doc))):
-        page_text = doc[i].get_text("text")
-        if "contents" in page_text.lower():
-            index_texts.append(page_text)
-            if i + 1 < len(doc):
-                next_text = doc[i + 1].get_text("text")
-                if len(next_text.strip()) > 100:
-                    index_texts.append(next_text)
-            break
+    with open_pdf(pdf_path) as doc:
+        for i in range(min(max_pages, len(doc))):
+            page_text = doc[i].get_text("text")
+            if "contents" in page_text.lower():
+                index_texts.append(page_text)
+                if i + 1 < len(doc):
+                    next_text = doc[i + 1].get_text("text")
+                    if len(next_text.strip()) > 100:
+                        index_texts.append(next_text)
+                break
 
     if not index_texts:
         print("⚠️ No Table of Contents found.")
@@ -157,36 +220,42 @@ def remove_duplicate_page_numbers(chapter_dict):
     return {title: page for page, title in seen.items()}
 
 
+@timed_stage("split")
 def main_split(pdf_path, output_dir, chapter_dict=None, visible_to_internal_map=None):
-    print("🔍 Getting chapter list...")
-
-    if chapter_dict is None:
-        chapter_dict = extract_chapters_from_index_with_llm(pdf_path)
-        print(chapter_dict)
-        if not chapter_dict:
-            print("❌ No chapters detected. Exiting.")
-            return [], {}
-
-    chapter_dict = remove_duplicate_page_numbers(chapter_dict)
-    chapters = [{"title": t, "page": int(p)} for t, p in chapter_dict.items()]
-    chapters.sort(key=lambda x: x["page"])
+    """Splits the PDF into one file per chapter in `output_dir`.
 
-    print("📄 Mapping visible → internal page numbers...")
-
-    # Use provided map or regenerate
-    if visible_to_internal_map is None:
-        visible_to_internal_map = get_visible_page_numbers(pdf_path)
-        visible_to_internal_map = interpolate_visible_to_internal_map(visible_to_internal_map)
-
-
-    internal_chapters = map_chapters_to_internal_indices(chapters, visible_to_internal_map)
-
-    if not internal_chapters:
-        print("❌ Could not map any chapter pages. Exiting.")
-        return [], {}
+    Returns the chapters that were split as {"title", "page"} dicts (0-based
+    start page), or [] when no chapters could be found or mapped.
+    """
+    print("🔍 Getting chapter list...")
+    # One open document is shared by outline, labels, index and page-number detection
+    with fitz.open(pdf_path) as doc:
+        total_pages = len(doc)
+        internal_chapters = chapters_from_outline(doc) if chapter_dict is None else []
+        if internal_chapters:
+            print(f"📑 Using embedded outline: {len(internal_chapters)} chapters")
+        else:
+            if chapter_dict is None:
+                chapter_dict = extract_chapters_from_index_with_llm(doc)
+                print(chapter_dict)
+                if not chapter_dict:
+                    print("❌ No chapters detected. Exiting.")
+                    return []
+
+            chapter_dict = remove_duplicate_page_numbers(chapter_dict)
+            chapters = [{"title": t, "page": int(p)} for t, p in chapter_dict.items()]
+            chapters.sort(key=lambda x: x["page"])
+
+            print("📄 Mapping visible → internal page numbers...")
+            # Use provided map, else page labels when present, else header/footer numbers fitted across all pages
+            if visible_to_internal_map is None:
+                visible_to_internal_map = detect_visible_page_map(doc)
+            internal_chapters = map_chapters_to_internal_indices(chapters, visible_to_internal_map)
+            if not internal_chapters:
+                print("❌ Could not map any chapter pages. Exiting.")
+                return []
 
     print(f"✂️ Splitting PDF into {len(internal_chapters)} chapters...")
-    split_pdf_by_chapter_list(pdf_path, internal_chapters, output_dir)
+    split_pdf_by_chapter_list(pdf_path, internal_chapters, output_dir, total_pages)
     print("✅ All chapters split and saved.")
-
-    return
+    return internal_chapters
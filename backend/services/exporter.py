@@ -0,0 +1,141 @@
+import hashlib
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from services.markdown_render import parse_markdown
+from services.text_to_pdf_docx import convert_text_to_pdf, render_docx, render_pdf
+
+
+# Export subsystem: the text is formatted and parsed once, every missing
+# format/copy is rendered concurrently from the same blocks, and the bytes are
+# kept in a bounded in-process cache so reruns and repeated clicks are free.
+
+RENDERERS = {"pdf": render_pdf, "docx": render_docx}
+MIME_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "zip": "application/zip",
+}
+COPIES = ("student", "teacher")
+MAX_CACHED_EXPORT_BYTES = int(os.getenv("EXPORT_CACHE_BYTES", str(256 * 1024 * 1024)))
+# Longer outputs go through services.streaming_export (temp files, no byte cache)
+STREAMING_EXPORT_MIN_CHARS = int(os.getenv("STREAMING_EXPORT_MIN_CHARS", "100000"))
+
+ANSWER_HEADING_RE = re.compile(r"^\W*(?:answers?(?:\s+key)?|answer\s+sheet|solutions?)\W*$", re.IGNORECASE)
+ANSWER_LINE_RE = re.compile(r"^\W*(?:correct\s+)?answers?\s*\**\s*[:\-–]", re.IGNORECASE)
+
+_export_cache = OrderedDict()  # (content hash, title, grade, subject, format, copy) -> bytes
+_export_cache_bytes = 0
+_export_cache_lock = threading.Lock()
+
+
+def _cache_get(key):
+    with _export_cache_lock:
+        data = _export_cache.get(key)
+        if data is not None:
+            _export_cache.move_to_end(key)
+        return data
+
+
+def _cache_put(key, data):
+    global _export_cache_bytes
+    with _export_cache_lock:
+        if key in _export_cache:
+            return
+        _export_cache[key] = data
+        _export_cache_bytes += len(data)
+        while _export_cache_bytes > MAX_CACHED_EXPORT_BYTES and len(_export_cache) > 1:
+            _, evicted = _export_cache.popitem(last=False)
+            _export_cache_bytes -= len(evicted)
+
+
+def clear_export_cache():
+    global _export_cache_bytes
+    with _export_cache_lock:
+        _export_cache.clear()
+        _export_cache_bytes = 0
+
+
+def _without_answer_lines(block):
+    if block["type"] == "paragraph":
+        lines = [line for line in block["text"].split("\n") if not ANSWER_LINE_RE.match(line)]
+        return {**block, "text": "\n".join(lines)} if lines else None
+    if block["type"] in ("bullet_list", "numbered_list"):
+        items = []
+        for item in block["items"]:
+            lines = [line for line in item["text"].split("\n") if not ANSWER_LINE_RE.match(line)]
+            if lines:
+                items.append({**item, "text": "\n".join(lines)})
+        return {**block, "items": items} if items else None
+    return block
+
+
+def student_blocks(blocks):
+    """The blocks without the answer key section and inline "Answer: ..." lines."""
+    result, skip_level = [], None
+    for block in blocks:
+        if block["type"] == "heading":
+            if skip_level is not None and block["level"] <= skip_level:
+                skip_level = None
+            if skip_level is None and ANSWER_HEADING_RE.match(block["text"]):
+                skip_level = block["level"]
+                continue
+        if skip_level is not None:
+            continue
+        block = _without_answer_lines(block)
+        if block:
+            result.append(block)
+    return result
+
+
+def use_streaming_export(text):
+    return len(text) >= STREAMING_EXPORT_MIN_CHARS
+
+
+def export_documents(text, title, class_grade=None, subject=None, formats=tuple(RENDERERS), copies=("teacher",)):
+    """Returns {(copy, format): bytes}. Only cache misses are rendered, concurrently."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    keys = {(copy, fmt): (digest, title, class_grade, subject, fmt, copy) for copy in copies for fmt in formats}
+
+    results = {}
+    for name, key in keys.items():
+        data = _cache_get(key)
+        if data is not None:
+            results[name] = data
+    missing = [name for name in keys if name not in results]
+    if not missing:
+        return results
+
+    blocks = parse_markdown(convert_text_to_pdf(text))
+    variants = {"teacher": blocks}
+    if "student" in copies:
+        variants["student"] = student_blocks(blocks)
+
+    with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+        futures = {
+            (copy, fmt): executor.submit(RENDERERS[fmt], variants[copy], title, class_grade, subject)
+            for copy, fmt in missing
+        }
+        for name, future in futures.items():
+            results[name] = future.result()
+            _cache_put(keys[name], results[name])
+    return results
+
+
+def export_document(text, fmt, title, class_grade=None, subject=None, copy="teacher"):
+    return export_documents(text, title, class_grade, subject, formats=(fmt,), copies=(copy,))[(copy, fmt)]
+
+
+def export_bundle(text, title, file_stem, class_grade=None, subject=None):
+    """ZIP with a student copy (answers removed) and a teacher copy, in every format."""
+    documents = export_documents(text, title, class_grade, subject, copies=COPIES)
+    buffer = BytesIO()
+    # PDF and DOCX are already compressed
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for (copy, fmt), data in sorted(documents.items()):
+            archive.writestr(f"{file_stem}_{copy}.{fmt}", data)
+    return buffer.getvalue()
@@ -1,82 +1,217 @@
 # flashcard_service.py
 
 import fitz  # PyMuPDF
+import asyncio
+import hashlib
 import json
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from models.llm_client import count_tokens, ask_openai_sync
+import re
+from pathlib import Path
+from models.async_client import get_async_client, run_sync
+from models.response_cache import CACHE_DIR
+from models.token_budget import AUTO_MODEL
+from services.chapter_splitter import chapters_from_outline
+from services.text_chunker import chunk_text
+from services.text_normalizer import normalize_pages
 
 
-def generate_flashcards_from_path(input_path, model="o4-mini"):
+# Flashcard calls are network-bound, so this is independent of CPU count
+FLASHCARD_CONCURRENCY = 8
+CHUNK_TOKENS = 12_000
+FLASHCARD_OUTPUT_TOKENS = 3_000  # expected JSON answer per chunk, sizes max_completion_tokens
+CHECKPOINT_DIR = CACHE_DIR / "flashcard_checkpoints"
+
+LEADING_FILLER_RE = re.compile(r"^(what|who|define|explain)\s+(is|are|was|were|does|do)?\s*|^(the|a|an)\s+")
+
+
+def list_pdf_paths(input_path):
     # Normalize input to list of PDF paths
     if isinstance(input_path, list):
         pdf_paths = input_path
     elif os.path.isfile(input_path) and input_path.lower().endswith('.pdf'):
         pdf_paths = [input_path]
     elif os.path.isdir(input_path):
-        pdf_paths = [
+        pdf_paths = sorted(
             os.path.join(input_path, f)
             for f in os.listdir(input_path)
             if f.lower().endswith(".pdf")
-        ]
+        )
         if not pdf_paths:
             raise ValueError(f"No PDF files found in folder: {input_path}")
     else:
         raise ValueError(f"Invalid input path: {input_path}")
+    return pdf_paths
+
+
+def normalize_term(term):
+    """'What is Photosynthesis?' and 'photosynthesis' map to the same key."""
+    term = re.sub(r"[^\w\s]", " ", term.casefold())
+    term = re.sub(r"\s+", " ", term).strip()
+    stripped = term
+    for _ in range(2):  # "what is the cell" → "the cell" → "cell"
+        stripped = LEADING_FILLER_RE.sub("", stripped).strip()
+    return stripped or term
+
+
+class FlashcardIndex:
+    """Merges cards from many sources; duplicate terms keep the first answer
+    and remember every source and alternative answer instead of overwriting."""
+
+    def __init__(self):
+        self.cards = {}  # normalized term -> card
+
+    def add(self, term, answer, source=None):
+        key = normalize_term(term)
+        if not key:
+            return
+        card = self.cards.get(key)
+        if card is None:
+            self.cards[key] = {"term": term.strip(), "answer": str(answer).strip(), "sources": [source] if source else [], "alternatives": []}
+            return
+        if source and source not in card["sources"]:
+            card["sources"].append(source)
+        answer = str(answer).strip()
+        if answer and answer != card["answer"] and answer not in card["alternatives"]:
+            card["alternatives"].append(answer)
+
+    def to_dict(self):
+        return {card["term"]: card["answer"] for card in self.cards.values()}
+
+
+def pdf_chunks(pdf_path, model):
+    """One or more chunks per chapter (outline-based), else token chunks of the whole text."""
+    with fitz.open(pdf_path) as doc:
+        chapters = chapters_from_outline(doc)
+        pages = [page.get_text() for page in doc]
+    bounds = [c["page"] for c in chapters] + [len(pages)] if chapters else [0, len(pages)]
+    # Per chapter, so each chapter's own running header is recognised
+    texts = [normalize_pages(pages[start:end], model)[0] for start, end in zip(bounds, bounds[1:])]
+
+    chunks = []
+    for text in texts:
+        chunks.extend(chunk_text(text, max_tokens=CHUNK_TOKENS, model=model))
+    return [c for c in chunks if c.strip()]
+
+
+def build_flashcard_prompt(text):
+    return (
+        "You are an expert flashcard generator.\n"
+        "Create a dictionary of flashcards from the following text.\n"
+        "Each key should be a concise question or term. Each value should be the answer or explanation.\n"
+        "Return ONLY valid JSON (no markdown, no explanation).\n\n"
+        f"Text:\n{text}"
+    )
 
-    flashcards_combined = {}
 
-    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-        futures = {
-            executor.submit(generate_flashcards_from_pdf, path, model): path
-            for path in pdf_paths
-        }
+def parse_flashcards(output, label):
+    try:
+        flashcards = json.loads(output)
+    except json.JSONDecodeError:
+        # Tolerate a ```json fence or a sentence around the object
+        match = re.search(r"\{[\s\S]*\}", output)
+        if not match:
+            raise ValueError(f"Invalid JSON output from LLM for: {label}")
+        flashcards = json.loads(match.group(0))
 
-        for future in as_completed(futures):
-            path = futures[future]
-            try:
-                flashcards = future.result()
-                flashcards_combined.update(flashcards)
-            except Exception as e:
-                raise RuntimeError(f"❌ Failed for {os.path.basename(path)}: {e}")
+    if not isinstance(flashcards, dict):
+        raise ValueError(f"Output is not a dictionary for: {label}")
+    return flashcards
 
-    return flashcards_combined
 
+def _chunk_id(pdf_path, chunk):
+    return hashlib.sha256(f"{os.path.basename(pdf_path)}\n{chunk}".encode("utf-8")).hexdigest()[:20]
 
-def generate_flashcards_from_pdf(pdf_path, model="gpt-oss-120b"):
-    doc = fitz.open(pdf_path)
-    full_text = "\n".join([page.get_text() for page in doc])
 
-    MAX_INPUT_TOKENS = 100_000
-    lines = full_text.splitlines()
-    selected_lines = []
-    total_tokens = 0
+def _checkpoint_path(pdf_paths, model):
+    key = hashlib.sha256(json.dumps([model] + sorted(os.path.abspath(p) for p in pdf_paths)).encode("utf-8")).hexdigest()[:16]
+    return CHECKPOINT_DIR / f"{key}.json"
 
-    for line in lines:
-        tokens = count_tokens(line, model)
-        if total_tokens + tokens > MAX_INPUT_TOKENS:
-            break
-        selected_lines.append(line)
-        total_tokens += tokens
 
-    limited_text = "\n".join(selected_lines)
+def load_checkpoint(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"done": {}}
 
-    prompt = (
-        "You are an expert flashcard generator.\n"
-        "Create a dictionary of flashcards from the following text.\n"
-        "Each key should be a concise question or term. Each value should be the answer or explanation.\n"
-        "Return ONLY valid JSON (no markdown, no explanation).\n\n"
-        f"Text:\n{limited_text}"
-    )
 
-    output = ask_openai_sync(prompt, model=model)
+def save_checkpoint(path, checkpoint):
+    # Write-then-rename so an interrupted run never leaves a truncated file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
 
-    try:
-        flashcards = json.loads(output)
-    except json.JSONDecodeError:
-        raise ValueError(f"Invalid JSON output from LLM for: {os.path.basename(pdf_path)}")
 
-    if not isinstance(flashcards, dict):
-        raise ValueError(f"Output is not a dictionary for: {os.path.basename(pdf_path)}")
+async def _run_flashcard_jobs(jobs, model, max_concurrency, on_done):
+    client = get_async_client()
+    semaphore = asyncio.Semaphore(max_concurrency)
 
-    return flashcards
+    async def one(job):
+        chunk_id, pdf_path, chunk = job
+        async with semaphore:
+            try:
+                output = await client.chat(build_flashcard_prompt(chunk), model=model, expected_output_tokens=FLASHCARD_OUTPUT_TOKENS)
+                return job, parse_flashcards(output, os.path.basename(pdf_path)), None
+            except Exception as e:
+                return job, None, e
+
+    for finished in asyncio.as_completed([one(job) for job in jobs]):
+        on_done(*(await finished))
+
+
+def run_flashcard_pipeline(input_path, model=AUTO_MODEL, max_concurrency=FLASHCARD_CONCURRENCY, checkpoint_path=None):
+    """Returns {"flashcards": {...}, "index": FlashcardIndex, "failed": {source: error}}.
+    Finished chunks are checkpointed as they complete, so a rerun resumes."""
+    pdf_paths = list_pdf_paths(input_path)
+    checkpoint_path = Path(checkpoint_path) if checkpoint_path else _checkpoint_path(pdf_paths, model)
+    checkpoint = load_checkpoint(checkpoint_path)
+    failed = {}
+
+    jobs = []
+    for path in pdf_paths:
+        try:
+            for chunk in pdf_chunks(path, model):
+                jobs.append((_chunk_id(path, chunk), path, chunk))
+        except Exception as e:
+            failed[os.path.basename(path)] = f"Could not read PDF: {e}"
+
+    pending = [job for job in jobs if job[0] not in checkpoint["done"]]
+    print(f"🃏 {len(jobs)} chunks from {len(pdf_paths)} PDFs ({len(jobs) - len(pending)} already checkpointed)")
+
+    def on_done(job, flashcards, error):
+        chunk_id, path, _ = job
+        if error is not None:
+            print(f"⚠️ Failed chunk of {os.path.basename(path)}: {error}")
+            failed[os.path.basename(path)] = str(error)
+            return
+        checkpoint["done"][chunk_id] = flashcards
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    if pending:
+        run_sync(_run_flashcard_jobs(pending, model, max_concurrency, on_done))
+
+    # Merge in file/chunk order so results are deterministic regardless of completion order
+    index = FlashcardIndex()
+    for chunk_id, path, _ in jobs:
+        for term, answer in checkpoint["done"].get(chunk_id, {}).items():
+            index.add(term, answer, source=os.path.basename(path))
+
+    if not failed and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    return {"flashcards": index.to_dict(), "index": index, "failed": failed}
+
+
+def generate_flashcards_from_path(input_path, model=AUTO_MODEL, max_concurrency=FLASHCARD_CONCURRENCY):
+    result = run_flashcard_pipeline(input_path, model=model, max_concurrency=max_concurrency)
+    if result["failed"]:
+        print(f"⚠️ Partial flashcards: {len(result['failed'])} file(s) had failures: {', '.join(result['failed'])}")
+    if not result["flashcards"] and result["failed"]:
+        raise RuntimeError(f"❌ Flashcard generation failed for all files: {result['failed']}")
+    return result["flashcards"]
+
+
+def generate_flashcards_from_pdf(pdf_path, model=AUTO_MODEL):
+    return generate_flashcards_from_path([pdf_path], model=model)
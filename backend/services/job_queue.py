@@ -0,0 +1,314 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from models.response_cache import CACHE_DIR
+
+
+JOBS_DB = CACHE_DIR / "jobs.sqlite3"
+
+MAX_RUNNING_PER_USER = int(os.getenv("JOBS_MAX_RUNNING_PER_USER", "2"))
+WORKER_COUNT = int(os.getenv("JOBS_WORKERS", "4"))
+POLL_INTERVAL = 0.5
+HEARTBEAT_TIMEOUT = 60        # running job with no heartbeat for this long is requeued
+PARTIAL_FLUSH_SECONDS = 1.0   # how often streamed text is written back for polling
+RETENTION_SECONDS = float(os.getenv("JOBS_RETENTION_DAYS", "7")) * 86400  # finished jobs older than this are deleted
+PRUNE_INTERVAL = 3600
+
+PRIORITY_INTERACTIVE = 10    # a teacher waiting in the app
+PRIORITY_BULK = 0            # API submissions; run when no interactive job is queued
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobStore:
+    def __init__(self, path=JOBS_DB):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        # One connection per thread; SQLite handles cross-process locking
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    params_hash TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority DESC, created_at);
+                CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs (user_id, kind, params_hash, status);
+                CREATE TABLE IF NOT EXISTS workers (
+                    pid INTEGER PRIMARY KEY,
+                    heartbeat_at REAL NOT NULL
+                );
+                """
+            )
+            self._local.conn = conn
+        return conn
+
+    def submit(self, kind, params, user_id="anonymous", priority=PRIORITY_INTERACTIVE):
+        """Queues a job; an identical job already queued or running for the user is reused."""
+        params_json = json.dumps(params, sort_keys=True)
+        params_hash = hashlib.sha256(f"{kind}\n{params_json}".encode("utf-8")).hexdigest()
+
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE user_id = ? AND kind = ? AND params_hash = ? AND status IN ('queued', 'running')",
+                (user_id, kind, params_hash),
+            ).fetchone()
+            if row:
+                conn.execute("COMMIT")
+                return row["id"]
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, user_id, kind, params, params_hash, priority, status, created_at) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, user_id, kind, params_json, params_hash, priority, time.time()),
+            )
+            conn.execute("COMMIT")
+            return job_id
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, job_id):
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_for_user(self, user_id, limit=20):
+        rows = self.conn.execute("SELECT * FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim_next(self):
+        """Atomically moves the best queued job to running, honouring the per-user cap."""
+        now = time.time()
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs of workers that died mid-run go back to the queue
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running' AND heartbeat_at < ?",
+                (now - HEARTBEAT_TIMEOUT,),
+            )
+            row = conn.execute(
+                """
+                SELECT * FROM jobs AS j
+                WHERE j.status = 'queued'
+                  AND (SELECT COUNT(*) FROM jobs AS r WHERE r.user_id = j.user_id AND r.status = 'running') < ?
+                ORDER BY j.priority DESC, j.created_at ASC
+                LIMIT 1
+                """,
+                (MAX_RUNNING_PER_USER,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (now, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+            return dict(row)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def update_progress(self, job_id, progress=None, message=None, partial=None):
+        self.conn.execute(
+            """
+            UPDATE jobs SET progress = COALESCE(?, progress), message = COALESCE(?, message),
+                            result = COALESCE(?, result), heartbeat_at = ?
+            WHERE id = ?
+            """,
+            (progress, message, partial, time.time(), job_id),
+        )
+        row = self.conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["status"] if row else None
+
+    def finish(self, job_id, result):
+        self.conn.execute(
+            "UPDATE jobs SET status = 'done', progress = 1, result = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+            (result, time.time(), job_id),
+        )
+
+    def fail(self, job_id, error):
+        self.conn.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+            (error, time.time(), job_id),
+        )
+
+    def cancel(self, job_id):
+        self.conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+            (time.time(), job_id),
+        )
+
+    def prune_finished(self, max_age=RETENTION_SECONDS):
+        """Deletes done, failed and cancelled jobs (with their results) older than max_age."""
+        cursor = self.conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND finished_at < ?",
+            (time.time() - max_age,),
+        )
+        return cursor.rowcount
+
+    def worker_heartbeat(self, pid):
+        self.conn.execute("INSERT OR REPLACE INTO workers (pid, heartbeat_at) VALUES (?, ?)", (pid, time.time()))
+
+    def live_workers(self, max_age=HEARTBEAT_TIMEOUT / 4):
+        row = self.conn.execute("SELECT COUNT(*) AS n FROM workers WHERE heartbeat_at > ?", (time.time() - max_age,)).fetchone()
+        return row["n"]
+
+
+def _stream_job(stream, report):
+    # Collect streamed text and flush it to the store so pollers see partial output
+    parts = []
+    last_flush = 0.0
+    for token in stream:
+        parts.append(token)
+        if time.monotonic() - last_flush > PARTIAL_FLUSH_SECONDS:
+            report(None, None, "".join(parts))
+            last_flush = time.monotonic()
+    return "".join(parts)
+
+
+def _stream_items_job(items, report):
+    # Structured mode: each question is flushed as Markdown once its JSON object closes
+    from services.quiz_schema import quiz_items_to_markdown
+    collected = []
+    last_flush = 0.0
+    for item in items:
+        collected.append(item)
+        if time.monotonic() - last_flush > PARTIAL_FLUSH_SECONDS:
+            report(None, f"{len(collected)} questions ready", quiz_items_to_markdown(collected))
+            last_flush = time.monotonic()
+    return quiz_items_to_markdown(collected)
+
+
+def run_quiz_job(params, report, cancel_event):
+    from services.quiz_gen import generate_quiz_from_text, generate_quiz_from_text_stream, generate_quiz_items_stream, use_sharded_quiz
+    structured = params.pop("structured", False)
+    if use_sharded_quiz(params["num_questions"]):
+        report(0.1, "Generating shards in parallel")
+        return generate_quiz_from_text(**params)
+    if structured:
+        return _stream_items_job(generate_quiz_items_stream(**params, cancel_event=cancel_event), report)
+    return _stream_job(generate_quiz_from_text_stream(**params, cancel_event=cancel_event), report)
+
+
+def run_summary_job(params, report, cancel_event):
+    from services.summarizer import summarize_text_stream
+    report(0.05, "Preparing material")
+    return _stream_job(summarize_text_stream(**params, cancel_event=cancel_event), report)
+
+
+def run_worksheet_job(params, report, cancel_event):
+    from services.worksheet_generator import generate_worksheet_items_stream, generate_worksheet_stream
+    if params.pop("structured", False):
+        return _stream_items_job(generate_worksheet_items_stream(**params, cancel_event=cancel_event), report)
+    return _stream_job(generate_worksheet_stream(**params, cancel_event=cancel_event), report)
+
+
+JOB_HANDLERS = {
+    "quiz": run_quiz_job,
+    "summary": run_summary_job,
+    "worksheet": run_worksheet_job,
+}
+
+
+def _heartbeat(store, job_id, cancel_event, done_event):
+    # Keeps long silent jobs (e.g. sharded quizzes) from being requeued, and notices cancels
+    while not done_event.wait(HEARTBEAT_TIMEOUT / 6):
+        store.worker_heartbeat(os.getpid())
+        if store.update_progress(job_id) == "cancelled":
+            cancel_event.set()
+
+
+def execute_job(store, job):
+    cancel_event = threading.Event()
+    done_event = threading.Event()
+    threading.Thread(target=_heartbeat, args=(store, job["id"], cancel_event, done_event), daemon=True).start()
+
+    def report(progress=None, message=None, partial=None):
+        if store.update_progress(job["id"], progress, message, partial) == "cancelled":
+            cancel_event.set()
+            raise JobCancelled()
+
+    try:
+        handler = JOB_HANDLERS[job["kind"]]
+        result = handler(json.loads(job["params"]), report, cancel_event)
+        if cancel_event.is_set():
+            return
+        store.finish(job["id"], result)
+        print(f"✅ Job {job['id']} ({job['kind']}) done")
+    except JobCancelled:
+        print(f"⏹️ Job {job['id']} cancelled")
+    except Exception as e:
+        traceback.print_exc()
+        store.fail(job["id"], f"{type(e).__name__}: {e}")
+    finally:
+        done_event.set()
+
+
+def run_worker(poll_interval=POLL_INTERVAL, stop_event=None):
+    store = JobStore()
+    pid = os.getpid()
+    print(f"👷 Job worker {pid} started")
+    last_prune = 0.0
+    while stop_event is None or not stop_event.is_set():
+        store.worker_heartbeat(pid)
+        job = store.claim_next()
+        if job is None:
+            # Only idle workers sweep, so the queue never waits on it
+            if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                store.prune_finished()
+                last_prune = time.monotonic()
+            time.sleep(poll_interval)
+            continue
+        execute_job(store, job)
+
+
+_pool = []
+_pool_lock = threading.Lock()
+
+
+def ensure_worker_pool(workers=WORKER_COUNT):
+    """Starts worker processes unless some are already heartbeating (e.g. from job_worker.py)."""
+    with _pool_lock:
+        alive = [p for p in _pool if p.is_alive()]
+        if alive or JobStore().live_workers():
+            return len(alive)
+
+        # spawn, not fork: the Streamlit server process is multi-threaded
+        context = multiprocessing.get_context("spawn")
+        _pool[:] = [context.Process(target=run_worker, name=f"job-worker-{i}", daemon=True) for i in range(workers)]
+        for process in _pool:
+            process.start()
+        return len(_pool)
@@ -0,0 +1,116 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from models.llm_client import DEFAULT_MODEL
+from models.metrics import timed_stage
+from models.response_cache import cache_disabled, get_response_cache, make_cache_key
+from models.token_budget import count_tokens
+from services.quiz_gen import generate_quiz_from_text
+from services.summarizer import summarize_text
+from services.text_chunker import chunk_text
+from services.worksheet_generator import generate_worksheet
+
+
+# A lesson pack builds one compact digest of the document and generates every
+# artifact from it, instead of sending the full text once per artifact.
+DIGEST_SECTION_TOKENS = 6_000
+DIGEST_CONCURRENCY = 8
+DIGEST_OUTPUT_TOKENS = 1_500  # expected digest per section, sizes max_completion_tokens
+# Below this the source is already compact; digesting would cost more than it saves
+DIGEST_MIN_TOKENS = 4_000
+
+PACK_ARTIFACTS = {
+    "summary": "Summary",
+    "notes": "Class Notes",
+    "lesson_plan": "Lesson Plan",
+    "quiz": "Quiz",
+    "worksheet": "Worksheet",
+}
+
+# Static instructions first, section text last: every digest call shares this prefix
+DIGEST_INSTRUCTIONS = """You are condensing a textbook section into a study digest that teachers will use to write summaries, notes, lesson plans, quizzes and worksheets.
+
+Write the digest in Markdown:
+- Start with "## " and the section title (make one up if the section has none).
+- Then terse bullet points grouped under **Key concepts**, **Definitions** and **Facts & examples**.
+- Keep every definition, formula, date, name, number, process step and worked example a question could be asked about.
+- Drop narrative filler, repetition, exercises' instructions and page furniture.
+- Use as few words as possible; never add information that is not in the section.
+
+Section:
+"""
+
+
+def build_digest_prompt(section):
+    return f"{DIGEST_INSTRUCTIONS}{section}\n"
+
+
+@timed_stage("lesson_digest")
+def build_digest(text, model=DEFAULT_MODEL, max_concurrency=DIGEST_CONCURRENCY):
+    """Per-section digest of `text`, cached by content hash so every artifact
+    (and every rerun on the same PDF) reuses it."""
+    if count_tokens(text, model) <= DIGEST_MIN_TOKENS:
+        return text
+
+    use_cache = not cache_disabled()
+    cache_key = make_cache_key(model, "lesson-digest:" + hashlib.sha256(text.encode("utf-8")).hexdigest(), section_tokens=DIGEST_SECTION_TOKENS, instructions=DIGEST_INSTRUCTIONS)
+    if use_cache:
+        cached = get_response_cache().get(cache_key)
+        if cached is not None:
+            return cached
+
+    from models.async_client import ask_many_sync
+
+    sections = chunk_text(text, max_tokens=DIGEST_SECTION_TOKENS, model=model)
+    print(f"📚 Digesting {len(sections)} sections")
+    digests = ask_many_sync([build_digest_prompt(s) for s in sections], model=model, max_concurrency=max_concurrency, expected_output_tokens=DIGEST_OUTPUT_TOKENS)
+    digest = "\n\n".join(d.strip() for d in digests if d and d.strip())
+
+    if use_cache and digest:
+        get_response_cache().set(cache_key, digest, model=model)
+    return digest
+
+
+def _artifact_job(artifact, digest, class_grade, subject, num_questions, question_format, model):
+    if artifact == "quiz":
+        return lambda: generate_quiz_from_text(digest, num_questions, question_format, class_grade, subject, model=model)
+    if artifact == "worksheet":
+        return lambda: generate_worksheet(digest, num_questions, question_format, class_grade, subject, model=model)
+    # The digest is already compact, so skip the summarizer's own map-reduce pass
+    return lambda: summarize_text(digest, PACK_ARTIFACTS[artifact], class_grade, subject, model=model, mode="direct")
+
+
+@timed_stage("lesson_pack")
+def generate_lesson_pack(text, class_grade=None, subject=None, artifacts=tuple(PACK_ARTIFACTS), num_questions=10, question_format="Mixed", model=DEFAULT_MODEL):
+    """Returns {"digest", "artifacts": {name: text}, "errors": {name: message}, "tokens": {...}}.
+
+    All artifacts use one model so they share the cached preamble + digest prefix.
+    """
+    unknown = set(artifacts) - set(PACK_ARTIFACTS)
+    if unknown:
+        raise ValueError(f"Unknown lesson pack artifact(s): {', '.join(sorted(unknown))}")
+
+    digest = build_digest(text, model=model)
+
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, len(artifacts))) as executor:
+        futures = {
+            artifact: executor.submit(_artifact_job(artifact, digest, class_grade, subject, num_questions, question_format, model))
+            for artifact in artifacts
+        }
+        for artifact, future in futures.items():
+            try:
+                results[artifact] = future.result()
+            except Exception as e:
+                errors[artifact] = f"{type(e).__name__}: {e}"
+
+    source_tokens = count_tokens(text, model)
+    digest_tokens = count_tokens(digest, model)
+    tokens = {
+        "source": source_tokens,
+        "digest": digest_tokens,
+        # Material tokens sent for the whole pack, with and without the digest
+        "pack_without_digest": source_tokens * len(artifacts),
+        "pack_with_digest": digest_tokens * len(artifacts) + (source_tokens if digest != text else 0),
+    }
+    print(f"📦 Lesson pack: {tokens['pack_with_digest']} material tokens instead of {tokens['pack_without_digest']}")
+    return {"digest": digest, "artifacts": results, "errors": errors, "tokens": tokens}
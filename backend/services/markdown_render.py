@@ -0,0 +1,200 @@
+import re
+from xml.sax.saxutils import escape
+
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+RULE_RE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+BULLET_RE = re.compile(r"^(\s*)[-*+•]\s+(.*)$")
+NUMBERED_RE = re.compile(r"^(\s*)(\d+)[.)]\s+(.*)$")
+TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$")
+FENCE_RE = re.compile(r"^\s*```")
+
+# **bold**, __bold__, *italic*, _italic_, `code`
+INLINE_RE = re.compile(r"(\*\*(.+?)\*\*|__(.+?)__|(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?!\w)|(?<![\w_])_(?!\s)(.+?)(?<!\s)_(?!\w)|`([^`]+)`)")
+
+
+def parse_inline(text):
+    """Returns a list of (text, bold, italic, code) runs."""
+    runs = []
+    pos = 0
+    for match in INLINE_RE.finditer(text):
+        if match.start() > pos:
+            runs.append((text[pos:match.start()], False, False, False))
+        bold, bold_alt, italic, italic_alt, code = match.group(2, 3, 4, 5, 6)
+        if bold or bold_alt:
+            # Allow *italic* inside **bold**
+            for inner, _, inner_italic, inner_code in parse_inline(bold or bold_alt):
+                runs.append((inner, True, inner_italic, inner_code))
+        elif italic or italic_alt:
+            runs.append((italic or italic_alt, False, True, False))
+        else:
+            runs.append((code, False, False, True))
+        pos = match.end()
+    if pos < len(text):
+        runs.append((text[pos:], False, False, False))
+    return runs
+
+
+def _split_table_row(line):
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|"):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split("|")]
+
+
+def _indent_level(whitespace):
+    return len(whitespace.replace("\t", "    ")) // 2
+
+
+def parse_markdown(text):
+    """Parses Markdown into a flat list of block dicts:
+    heading, paragraph, bullet_list, numbered_list, table, code and rule."""
+    blocks = []
+    lines = text.replace("\r\n", "\n").split("\n")
+    paragraph = []
+    i = 0
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append({"type": "paragraph", "text": "\n".join(paragraph)})
+            paragraph.clear()
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        if not stripped:
+            flush_paragraph()
+            i += 1
+            continue
+
+        if FENCE_RE.match(line):
+            flush_paragraph()
+            code = []
+            i += 1
+            while i < len(lines) and not FENCE_RE.match(lines[i]):
+                code.append(lines[i])
+                i += 1
+            blocks.append({"type": "code", "text": "\n".join(code)})
+            i += 1
+            continue
+
+        heading = HEADING_RE.match(stripped)
+        if heading:
+            flush_paragraph()
+            blocks.append({"type": "heading", "level": len(heading.group(1)), "text": heading.group(2)})
+            i += 1
+            continue
+
+        if RULE_RE.match(line):
+            flush_paragraph()
+            blocks.append({"type": "rule"})
+            i += 1
+            continue
+
+        if "|" in stripped and i + 1 < len(lines) and TABLE_SEPARATOR_RE.match(lines[i + 1]):
+            flush_paragraph()
+            rows = [_split_table_row(line)]
+            i += 2
+            while i < len(lines) and "|" in lines[i] and lines[i].strip():
+                rows.append(_split_table_row(lines[i]))
+                i += 1
+            width = max(len(row) for row in rows)
+            blocks.append({"type": "table", "rows": [row + [""] * (width - len(row)) for row in rows]})
+            continue
+
+        bullet = BULLET_RE.match(line)
+        numbered = NUMBERED_RE.match(line)
+        if bullet or numbered:
+            flush_paragraph()
+            list_type = "bullet_list" if bullet else "numbered_list"
+            items = []
+            while i < len(lines):
+                line = lines[i]
+                bullet = BULLET_RE.match(line)
+                numbered = NUMBERED_RE.match(line)
+                if list_type == "bullet_list" and bullet:
+                    items.append({"level": _indent_level(bullet.group(1)), "text": bullet.group(2)})
+                elif list_type == "numbered_list" and numbered:
+                    items.append({"level": _indent_level(numbered.group(1)), "number": int(numbered.group(2)), "text": numbered.group(3)})
+                elif (bullet or numbered) and _indent_level((bullet or numbered).group(1)) > 0:
+                    # A nested list of the other kind stays inside the current list
+                    match = bullet or numbered
+                    item = {"level": _indent_level(match.group(1)), "text": match.group(match.lastindex)}
+                    if numbered:
+                        item["number"] = int(numbered.group(2))
+                    items.append(item)
+                elif line.strip() and items and not (bullet or numbered) and not HEADING_RE.match(line.strip()) and not RULE_RE.match(line):
+                    # Lazy continuation, e.g. the "A) ..." options under a numbered question
+                    items[-1]["text"] += "\n" + line.strip()
+                else:
+                    break
+                i += 1
+            blocks.append({"type": list_type, "items": items})
+            continue
+
+        paragraph.append(stripped)
+        i += 1
+
+    flush_paragraph()
+    return blocks
+
+
+def to_reportlab_markup(text):
+    """Inline Markdown → reportlab Paragraph mini-HTML."""
+    parts = []
+    for run_text, bold, italic, code in parse_inline(text):
+        chunk = escape(run_text).replace("\n", "<br/>")
+        if code:
+            chunk = f'<font face="Courier">{chunk}</font>'
+        if italic:
+            chunk = f"<i>{chunk}</i>"
+        if bold:
+            chunk = f"<b>{chunk}</b>"
+        parts.append(chunk)
+    return "".join(parts)
+
+
+def add_docx_runs(paragraph, text):
+    for run_text, bold, italic, code in parse_inline(text):
+        lines = run_text.split("\n")
+        for n, line in enumerate(lines):
+            run = paragraph.add_run(line)
+            run.bold = bold or None
+            run.italic = italic or None
+            if code:
+                run.font.name = "Courier New"
+            if n < len(lines) - 1:
+                run.add_break()
+    return paragraph
+
+
+def normalize_markdown(raw_text):
+    """Deterministic clean-up of LLM output into the Markdown subset we render:
+    unified bullets/numbering, headings for 'Answer Key:'-style label lines,
+    and at most one blank line between blocks."""
+    out = []
+    for line in raw_text.replace("\r\n", "\n").split("\n"):
+        stripped = line.strip()
+        line = line.rstrip()
+
+        # "1) ..." → "1. ...", "• ..." → "- ..."
+        line = re.sub(r"^(\s*)(\d+)\)\s+", r"\1\2. ", line)
+        line = re.sub(r"^(\s*)[•●▪◦]\s*", r"\1- ", line)
+
+        # Short standalone label lines such as "Answer Key:" or "**Answers**" become headings
+        label = re.fullmatch(r"\**([A-Z][A-Za-z0-9 /&'\-]{2,40}?):?\**:?", stripped)
+        if label and not HEADING_RE.match(stripped) and stripped.upper() != stripped.lower():
+            words = label.group(1).split()
+            if len(words) <= 5 and (stripped.endswith(":") or stripped.startswith("**")):
+                if out and out[-1].strip():
+                    out.append("")
+                out.append(f"## {label.group(1).strip()}")
+                continue
+
+        out.append(line)
+
+    text = "\n".join(out)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
@@ -0,0 +1,103 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+import fitz  # PyMuPDF
+
+
+# Fraction of the page height scanned for running headers / footers
+HEADER_FOOTER_BAND = 0.1
+PAGE_NUMBER_RE = re.compile(r"^[\-–(\[]?(\d{1,4})[\-–)\]]?$")
+
+# Offsets (internal index - visible number) are voted on within this many pages
+VOTE_WINDOW = 8
+MIN_SUPPORT = 3
+
+
+def page_label_map(doc):
+    """Visible page number → internal index, from the PDF /PageLabels tree."""
+    if not doc.get_page_labels():
+        return {}
+
+    label_map = {}
+    for page in doc:
+        label = page.get_label()
+        if label and label.isdigit() and int(label) not in label_map:
+            label_map[int(label)] = page.number
+    return label_map
+
+
+def header_footer_numbers(page, band=HEADER_FOOTER_BAND):
+    """Integers found in the header and footer strips only (no full-page extraction)."""
+    rect = page.rect
+    height = rect.height * band
+    strips = [
+        fitz.Rect(rect.x0, rect.y0, rect.x1, rect.y0 + height),
+        fitz.Rect(rect.x0, rect.y1 - height, rect.x1, rect.y1),
+    ]
+
+    numbers = set()
+    for strip in strips:
+        for word in page.get_text("words", clip=strip):
+            match = PAGE_NUMBER_RE.match(word[4])
+            if match:
+                numbers.add(int(match.group(1)))
+    return numbers
+
+
+def fit_visible_to_internal(candidates, window=VOTE_WINDOW, min_support=MIN_SUPPORT):
+    """Fits piecewise-constant offsets to per-page number candidates.
+
+    Each candidate v on page i votes for offset i - v. A page keeps the
+    offset with the most votes among nearby pages, so stray numbers (years,
+    figure labels, "of 300") lose to the monotonic sequence. Pages without a
+    detected number inherit the previous page's offset. When a number occurs
+    in more than one run, the longest consistent run wins.
+    """
+    support = defaultdict(list)  # offset -> pages supporting it, ascending
+    for i, values in enumerate(candidates):
+        for v in values:
+            support[i - v].append(i)
+
+    def votes(offset, i):
+        pages = support[offset]
+        return bisect_right(pages, i + window) - bisect_left(pages, i - window)
+
+    chosen = []
+    for i, values in enumerate(candidates):
+        best = max(((votes(i - v, i), -(i - v)) for v in values if v > 0), default=None)
+        chosen.append(-best[1] if best and best[0] >= min_support else None)
+
+    # Carry each offset over following pages without a number of their own
+    effective = []
+    carried = next((o for o in chosen if o is not None), None)
+    for offset in chosen:
+        if offset is not None:
+            carried = offset
+        effective.append(carried)
+
+    # Runs of consecutive pages sharing an offset, weighted by their own evidence
+    run_of, run_support = [], []
+    for i, offset in enumerate(effective):
+        if i == 0 or offset != effective[i - 1]:
+            run_support.append(0)
+        run_of.append(len(run_support) - 1)
+        run_support[-1] += chosen[i] is not None
+
+    # A number seen in several runs (arabic front matter, then body pages
+    # restarting at 1) goes to the best-supported run, then the later page
+    best = {}
+    for i, offset in enumerate(effective):
+        if offset is None or i - offset <= 0:
+            continue
+        key = (run_support[run_of[i]], chosen[i] is not None, i)
+        if i - offset not in best or key > best[i - offset][0]:
+            best[i - offset] = (key, i)
+    return {visible: i for visible, (_, i) in best.items()}
+
+
+def detect_visible_page_map(doc):
+    """Visible → internal page map: /PageLabels when present, otherwise header/footer fitting."""
+    labels = page_label_map(doc)
+    if labels:
+        return labels
+    return fit_visible_to_internal([header_footer_numbers(page) for page in doc])
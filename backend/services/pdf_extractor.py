@@ -0,0 +1,91 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+from models.metrics import timed_stage
+from services.text_normalizer import normalize_pages
+
+
+# Below this many pages a process pool costs more than it saves
+PARALLEL_PAGE_THRESHOLD = 40
+MAX_CACHED_DOCUMENTS = 16
+
+_text_cache = OrderedDict()  # content hash -> tuple of page texts
+_clean_cache = OrderedDict()  # content hash -> (normalized text, stats)
+_text_cache_lock = threading.Lock()
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _extract_page_range(args):
+    data, start, end = args
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return [doc[i].get_text("text") for i in range(start, end)]
+
+
+def extract_pages_from_bytes(data: bytes, max_workers=None) -> list:
+    """Extracts the text of every page straight from the PDF bytes (no temp file)."""
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        page_count = len(doc)
+        if page_count < PARALLEL_PAGE_THRESHOLD:
+            return [page.get_text("text") for page in doc]
+
+    workers = max(1, min(max_workers or os.cpu_count() or 1, page_count // PARALLEL_PAGE_THRESHOLD + 1))
+    step = -(-page_count // workers)
+    ranges = [(data, start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+    # Each worker opens its own document; PyMuPDF objects are not shareable across processes
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pages = []
+        for chunk in executor.map(_extract_page_range, ranges):
+            pages.extend(chunk)
+    return pages
+
+
+def extract_pages_cached(data: bytes) -> tuple:
+    key = content_hash(data)
+    with _text_cache_lock:
+        if key in _text_cache:
+            _text_cache.move_to_end(key)
+            return _text_cache[key]
+
+    pages = tuple(extract_pages_from_bytes(data))
+
+    with _text_cache_lock:
+        _text_cache[key] = pages
+        while len(_text_cache) > MAX_CACHED_DOCUMENTS:
+            _text_cache.popitem(last=False)
+    return pages
+
+
+@timed_stage("extract")
+def extract_normalized_cached(data: bytes) -> tuple:
+    """Returns (text, stats): the pages cleaned by normalize_pages, cached by content hash."""
+    key = content_hash(data)
+    with _text_cache_lock:
+        if key in _clean_cache:
+            _clean_cache.move_to_end(key)
+            return _clean_cache[key]
+
+    result = normalize_pages(extract_pages_cached(data))
+
+    with _text_cache_lock:
+        _clean_cache[key] = result
+        while len(_clean_cache) > MAX_CACHED_DOCUMENTS:
+            _clean_cache.popitem(last=False)
+    return result
+
+
+def extract_text_from_pdf_bytes(data: bytes) -> str:
+    # Headers/footers, page numbers and wrap noise are removed before any prompt sees the text
+    return extract_normalized_cached(data)[0]
+
+
+def clear_extraction_cache():
+    with _text_cache_lock:
+        _text_cache.clear()
+        _clean_cache.clear()
@@ -0,0 +1,34 @@
+from models.token_budget import AUTO_MODEL, OUTPUT_SAFETY_CAP, model_limits, plan_budget
+
+
+# Every generation prompt starts with the same static preamble, followed by the
+# study material, with the per-request task (counts, formats, grade) at the end.
+# Prompts built from the same material therefore share one long prefix, so the
+# provider's prompt-prefix cache covers it when several artifacts are built from
+# one document (lesson packs) or a teacher regenerates with different settings.
+
+TEACHER_PREAMBLE = """You are an assistant for school teachers. You turn study material into classroom-ready documents: summaries, class notes, lesson plans, quizzes and worksheets.
+
+General rules:
+- Use only the facts in the study material below; do not invent content.
+- Match vocabulary and difficulty to the class level named in the task.
+- Unless the task asks for JSON, write clean Markdown: # and ## headings, bullet points, numbered lists and **bold** key terms.
+- Output only the requested document, with no remarks before or after it."""
+
+
+def _render(material, task):
+    return f"{TEACHER_PREAMBLE}\n\nStudy Material:\n{material}\n\nTask:\n{task}\n"
+
+
+def compose_prompt(material, task, model=AUTO_MODEL):
+    """The prompt for `task` on `material`, with the material cut on a line
+    boundary when it would crowd out the output reservation (plan_budget)."""
+    task = task.strip()
+    context_limit, _ = model_limits(model)
+    # Every token is at least one byte, so shorter prompts can't overflow and aren't counted
+    if len(_render("", task).encode("utf-8")) + len(material.encode("utf-8")) + OUTPUT_SAFETY_CAP > context_limit:
+        plan = plan_budget(model, _render("", task), material)
+        if plan["truncated"]:
+            print(f"✂️ Study material cut to {plan['material_tokens']} tokens to fit the {model} context window")
+        material = plan["material"]
+    return _render(material, task)
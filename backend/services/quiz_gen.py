@@ -1,39 +1,65 @@
-from models.llm_client import ask_openai_sync
+from models.llm_client import AUTO_MODEL, ask_openai_sync, ask_openai_stream
+from models.model_router import question_output_tokens
+from models.metrics import timed_stage
+from services.quiz_sharding import generate_questions_sharded
+from services.prompting import compose_prompt
+from services.quiz_schema import QUIZ_RESPONSE_FORMAT, JsonItemStreamParser, build_structured_prompt, iter_json_items, normalize_quiz_item
 import os
 
-from docx import Document
 from io import BytesIO
 import json
 import re
 
 
-def generate_quiz_from_text(text, num_questions, quiz_type="Mixed", class_grade=None, subject=None):
-    prompt = f"""
-You are a quiz generator AI. Generate {num_questions} questions in {quiz_type} question answer format, from the following study material, for a {subject} {class_grade} class. 
+def build_quiz_prompt(text, num_questions, quiz_type="Mixed", class_grade=None, subject=None, model=AUTO_MODEL):
+    return compose_prompt(text, model=model, task=f"""
+Generate a quiz of {num_questions} questions in {quiz_type} question answer format from the study material, for a {subject} {class_grade} class.
 Output questions and answers key in the end.
+""")
 
-Study Material:
-{text}
-"""
 
-    response = ask_openai_sync(prompt)
+# Above this many questions the material is split and shards run concurrently
+SHARD_THRESHOLD_QUESTIONS = 25
+
+
+def use_sharded_quiz(num_questions, mode="auto"):
+    return mode == "sharded" or (mode == "auto" and num_questions > SHARD_THRESHOLD_QUESTIONS)
+
+
+@timed_stage("generate_quiz")
+def generate_quiz_from_text(text, num_questions, quiz_type="Mixed", class_grade=None, subject=None, mode="auto", model=AUTO_MODEL):
+    if use_sharded_quiz(num_questions, mode):
+        return generate_questions_sharded(text, num_questions, quiz_type, class_grade, subject, model=model)
+
+    prompt = build_quiz_prompt(text, num_questions, quiz_type, class_grade, subject, model)
+
+    response = ask_openai_sync(prompt, model=model, expected_output_tokens=question_output_tokens(num_questions))
     #print(response)
     #temp = extract_quiz_json(response)
     #print (temp)
     return response
-    
 
-def extract_quiz_json(content_str):
-    try:
-        content = content_str.strip()
 
-        if content.startswith('['):
-            return json.loads(content)
+@timed_stage("generate_quiz")
+def generate_quiz_from_text_stream(text, num_questions, quiz_type="Mixed", class_grade=None, subject=None, stats=None, cancel_event=None):
+    prompt = build_quiz_prompt(text, num_questions, quiz_type, class_grade, subject)
+    return ask_openai_stream(prompt, stats=stats, cancel_event=cancel_event, expected_output_tokens=question_output_tokens(num_questions))
 
-        json_match = re.search(r'\[\s*{.*}\s*\]', content, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            return json.loads(json_str)
+
+@timed_stage("generate_quiz")
+def generate_quiz_items_stream(text, num_questions, quiz_type="Mixed", class_grade=None, subject=None, stats=None, cancel_event=None):
+    """Yields normalized question dicts as soon as each JSON object closes."""
+    prompt = build_structured_prompt("quiz", text, num_questions, quiz_type, class_grade, subject)
+    tokens = ask_openai_stream(prompt, stats=stats, cancel_event=cancel_event, response_format=QUIZ_RESPONSE_FORMAT, expected_output_tokens=question_output_tokens(num_questions))
+    for item in iter_json_items(tokens):
+        yield normalize_quiz_item(item)
+
+
+def extract_quiz_json(content_str):
+    try:
+        items = JsonItemStreamParser().feed(content_str)
+        if items:
+            return [normalize_quiz_item(item) for item in items]
 
         raise ValueError("No valid JSON array found in input.")
 
@@ -47,14 +73,20 @@ def extract_quiz_json(content_str):
 
 
 def generate_quiz_docx(quiz_data, title="Generated Quiz"):
+    from docx import Document
+
     doc = Document()
     doc.add_heading(title, level=1)
 
+    quiz_data = [normalize_quiz_item(q) for q in quiz_data]
+    for idx, q in enumerate(quiz_data, 1):
+        doc.add_paragraph(f"Q{idx}: {q['question']}")
+        for letter, opt in zip("ABCDEFGHIJ", q['options']):
+            doc.add_paragraph(f"{letter}) {opt}", style='List Bullet')
+
+    doc.add_heading("Answer Key", level=2)
     for idx, q in enumerate(quiz_data, 1):
-        doc.add_paragraph(f"Q{idx}: {q['question']}", style='List Number')
-        for opt in q['options']:
-            doc.add_paragraph(opt, style='List Bullet')
-        doc.add_paragraph(f"✅ Answer: {q['answer']}\n")
+        doc.add_paragraph(f"{idx}. {q['answer']}")
 
     buffer = BytesIO()
     doc.save(buffer)
@@ -0,0 +1,134 @@
+import json
+from models.token_budget import AUTO_MODEL
+from services.prompting import compose_prompt
+
+
+QUESTION_TYPES = ["mcq", "true_false", "short_answer", "long_answer", "fill_in_the_blank"]
+
+QUIZ_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "question": {"type": "string"},
+        "type": {"type": "string", "enum": QUESTION_TYPES},
+        "options": {"type": "array", "items": {"type": "string"}},
+        "answer": {"type": "string"},
+    },
+    "required": ["question", "type", "options", "answer"],
+    "additionalProperties": False,
+}
+
+# Structured Outputs need an object at the top level
+QUIZ_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "quiz",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"questions": {"type": "array", "items": QUIZ_ITEM_SCHEMA}},
+            "required": ["questions"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def build_structured_prompt(kind, text, num_questions, question_format="Mixed", class_grade=None, subject=None, model=AUTO_MODEL):
+    return compose_prompt(text, model=model, task=f"""
+Generate a {kind} of {num_questions} questions in {question_format} format from the study material, for a {subject} {class_grade} class.
+Return JSON only: {{"questions": [{{"question": ..., "type": ..., "options": [...], "answer": ...}}, ...]}}
+- type is one of: {", ".join(QUESTION_TYPES)}
+- options lists the choices for mcq and true_false questions, otherwise []
+- answer is the correct option text or the model answer
+""")
+
+
+class JsonItemStreamParser:
+    """Incremental JSON scanner: feed it text chunks and it returns every object
+    whose parent is an array as soon as that object's closing brace arrives.
+    Works for {"questions": [{...}, ...]} and for a bare [{...}, ...]."""
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.stack = []        # open containers: "{" or "["
+        self.in_string = False
+        self.escaped = False
+        self.item_start = None
+        self.item_depth = None
+
+    def feed(self, text):
+        self.buffer += text
+        items = []
+        buffer = self.buffer
+
+        while self.pos < len(buffer):
+            char = buffer[self.pos]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                if char == "{" and self.item_start is None and self.stack and self.stack[-1] == "[":
+                    self.item_start = self.pos
+                    self.item_depth = len(self.stack)
+                self.stack.append(char)
+            elif char in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if char == "}" and self.item_start is not None and len(self.stack) == self.item_depth:
+                    raw = buffer[self.item_start:self.pos + 1]
+                    try:
+                        items.append(json.loads(raw))
+                    except json.JSONDecodeError:
+                        pass  # Malformed item; skip it rather than the whole quiz
+                    self.item_start = None
+                    self.item_depth = None
+            self.pos += 1
+
+        # Drop text we will never need again
+        keep_from = self.item_start if self.item_start is not None else self.pos
+        self.buffer = buffer[keep_from:]
+        self.pos -= keep_from
+        if self.item_start is not None:
+            self.item_start = 0
+        return items
+
+
+def iter_json_items(chunks):
+    parser = JsonItemStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+
+
+def normalize_quiz_item(item):
+    if not isinstance(item, dict):
+        item = {"question": str(item)}
+    return {
+        "question": str(item.get("question", "")).strip(),
+        "type": item.get("type") or ("mcq" if item.get("options") else "short_answer"),
+        "options": [str(opt).strip() for opt in item.get("options") or []],
+        "answer": str(item.get("answer", "")).strip(),
+    }
+
+
+def format_quiz_item(item, number):
+    lines = [f"{number}. {item['question']}"]
+    for letter, option in zip("ABCDEFGHIJ", item["options"]):
+        # Models sometimes prefix options themselves
+        lines.append(option if option[:2] in (f"{letter})", f"{letter}.") else f"{letter}) {option}")
+    return "\n".join(lines)
+
+
+def quiz_items_to_markdown(items, include_answers=True, title="Questions"):
+    blocks = [f"## {title}", ""]
+    blocks.extend(format_quiz_item(item, i) + "\n" for i, item in enumerate(items, start=1))
+    if include_answers:
+        blocks.append("## Answer Key\n")
+        blocks.extend(f"{i}. {item['answer']}" for i, item in enumerate(items, start=1))
+    return "\n".join(blocks).strip()
@@ -0,0 +1,178 @@
+import math
+import re
+from difflib import SequenceMatcher
+from models.llm_client import AUTO_MODEL
+from models.model_router import question_output_tokens
+from models.token_budget import count_tokens_batch
+from services.text_chunker import chunk_text
+from services.prompting import compose_prompt
+
+
+QUESTIONS_PER_SHARD = 15
+SHARD_CHUNK_TOKENS = 4_000
+SHARD_CONCURRENCY = 8
+# Ask each shard for a few extra questions so dedupe doesn't leave us short
+OVERSAMPLE = 1.15
+DUPLICATE_THRESHOLD = 0.85
+
+ANSWER_KEY_RE = re.compile(r"^\s*(?:#+\s*)?\**\s*(?:answers?(?:\s+key)?|answer\s+sheet)\s*\**\s*:?\s*\**\s*$", re.IGNORECASE | re.MULTILINE)
+QUESTION_START_RE = re.compile(r"^\s*(?:#+\s*)?\**\s*(?:Q(?:uestion)?\s*)?(\d+)\s*[.):]\**\s*", re.IGNORECASE)
+ANSWER_LINE_RE = re.compile(r"^\s*\**\s*(?:Q(?:uestion)?\s*)?(\d+)\s*[.):\-]\**\s*(.+)$", re.IGNORECASE)
+
+
+def build_shard_prompt(text, num_questions, question_format, class_grade, subject, part, total):
+    return compose_prompt(text, f"""
+Generate a quiz of exactly {num_questions} questions in {question_format} question answer format from the study material, for a {subject} {class_grade} class.
+This material is part {part} of {total} of a longer text; only ask about this part.
+
+Output format (follow exactly):
+## Questions
+1. <question>
+<options on their own lines, if any>
+2. ...
+
+## Answer Key
+1. <answer>
+2. ...
+""")
+
+
+def allocate_questions(weights, total):
+    """Splits `total` across shards in proportion to `weights` (largest remainder)."""
+    weight_sum = sum(weights) or 1
+    exact = [total * w / weight_sum for w in weights]
+    counts = [math.floor(x) for x in exact]
+    remainders = sorted(range(len(weights)), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in remainders[: total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def partition_material(text, num_shards, model=AUTO_MODEL):
+    """Groups consecutive sections into up to `num_shards` shards of similar token size."""
+    chunks = chunk_text(text, max_tokens=SHARD_CHUNK_TOKENS, model=model)
+    sizes = count_tokens_batch(chunks, model)
+    target = sum(sizes) / max(1, num_shards)
+
+    shards, current, current_size = [], [], 0
+    for chunk, size in zip(chunks, sizes):
+        if current and current_size + size / 2 > target and len(shards) < num_shards - 1:
+            shards.append(("\n\n".join(current), current_size))
+            current, current_size = [], 0
+        current.append(chunk)
+        current_size += size
+    if current:
+        shards.append(("\n\n".join(current), current_size))
+    return shards
+
+
+def parse_quiz_output(output):
+    """Returns ([question blocks], {number: answer}) from a questions + answer key response."""
+    key_match = ANSWER_KEY_RE.search(output)
+    questions_part = output[:key_match.start()] if key_match else output
+    answers_part = output[key_match.end():] if key_match else ""
+
+    questions = []
+    current = None
+    for line in questions_part.splitlines():
+        match = QUESTION_START_RE.match(line)
+        if match:
+            current = [int(match.group(1)), [line[match.end():].strip()]]
+            questions.append(current)
+        elif current is not None and line.strip() and not line.lstrip().startswith("#"):
+            current[1].append(line.strip())
+
+    answers = {}
+    for line in answers_part.splitlines():
+        match = ANSWER_LINE_RE.match(line)
+        if match:
+            answers[int(match.group(1))] = match.group(2).strip()
+
+    return [(number, "\n".join(lines)) for number, lines in questions], answers
+
+
+def normalize_question(text):
+    stem = text.split("\n", 1)[0].lower()
+    return re.sub(r"[^a-z0-9 ]+", "", re.sub(r"\s+", " ", stem)).strip()
+
+
+def is_near_duplicate(stem, seen_stems, threshold=DUPLICATE_THRESHOLD):
+    words = set(stem.split())
+    for other in seen_stems:
+        other_words = set(other.split())
+        # Cheap word-overlap filter before the more expensive sequence ratio
+        if words and other_words and len(words & other_words) / len(words | other_words) < threshold / 2:
+            continue
+        if SequenceMatcher(None, stem, other).ratio() >= threshold:
+            return True
+    return False
+
+
+def merge_quiz_shards(outputs, quotas):
+    """Each shard keeps at most its `quotas` share; questions beyond a share only
+    back-fill shards that came up short (failed or heavily deduplicated).
+
+    `outputs` lines up with `quotas`; a failed shard's output is "".
+    """
+    pending = []
+    for output in outputs:
+        questions, answers = parse_quiz_output(output)
+        pending.append([(body, answers.get(number, "")) for number, body in questions])
+
+    seen = []
+    picked = [[] for _ in pending]
+
+    def take(i):
+        # Next question of shard i that isn't a near-duplicate of one already picked
+        while pending[i]:
+            body, answer = pending[i].pop(0)
+            stem = normalize_question(body)
+            if stem and not is_near_duplicate(stem, seen):
+                seen.append(stem)
+                picked[i].append((body, answer))
+                return True
+        return False
+
+    for i, quota in enumerate(quotas):
+        while len(picked[i]) < quota and take(i):
+            pass
+    # Spread the shortfall over the shards with surplus, one question at a time
+    shortfall = sum(quotas) - sum(len(questions) for questions in picked)
+    while shortfall > 0 and any(pending):
+        for i in range(len(pending)):
+            if shortfall > 0 and take(i):
+                shortfall -= 1
+
+    merged = [question for questions in picked for question in questions]
+    question_lines = [f"{i}. {body}" for i, (body, _) in enumerate(merged, start=1)]
+    answer_lines = [f"{i}. {answer}" for i, (_, answer) in enumerate(merged, start=1)]
+    return "## Questions\n\n" + "\n\n".join(question_lines) + "\n\n## Answer Key\n\n" + "\n".join(answer_lines)
+
+
+def generate_questions_sharded(text, num_questions, question_format="Mixed", class_grade=None, subject=None, model=AUTO_MODEL, max_concurrency=SHARD_CONCURRENCY):
+    from models.async_client import ask_many_sync
+
+    num_shards = max(1, math.ceil(num_questions / QUESTIONS_PER_SHARD))
+    shards = partition_material(text, num_shards, model)
+    counts = allocate_questions([size for _, size in shards], num_questions)
+
+    jobs = [(i, material, count) for i, ((material, _), count) in enumerate(zip(shards, counts), start=1) if count > 0]
+    prompts = [
+        build_shard_prompt(material, math.ceil(count * OVERSAMPLE), question_format, class_grade, subject, part, len(shards))
+        for part, material, count in jobs
+    ]
+    print(f"🧩 Generating {num_questions} questions across {len(prompts)} shards")
+
+    # Budget for the largest shard; every shard shares the same kwargs
+    expected = question_output_tokens(max((math.ceil(count * OVERSAMPLE) for _, _, count in jobs), default=0))
+    results = ask_many_sync(prompts, model=model, max_concurrency=max_concurrency, return_exceptions=True, expected_output_tokens=expected)
+    outputs = []
+    for (part, _, _), result in zip(jobs, results):
+        if isinstance(result, BaseException):
+            print(f"⚠️ Shard {part} failed: {result}")
+            result = ""
+        outputs.append(result)
+
+    if not any(outputs):
+        raise RuntimeError("❌ All quiz shards failed.")
+    return merge_quiz_shards(outputs, [count for _, _, count in jobs])
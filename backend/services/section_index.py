@@ -0,0 +1,129 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from models.token_budget import count_tokens, count_tokens_batch
+from services.text_chunker import chunk_text
+
+
+# Retrieval units: small enough that a topic maps to a few of them
+SECTION_TOKENS = 800
+MIN_SECTION_TOKENS = 80
+TOP_K = 12
+TOPIC_TOKEN_BUDGET = 6_000
+MAX_CACHED_INDEXES = 16
+
+# Okapi BM25 parameters
+K1 = 1.5
+B = 0.75
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be been but by can do does for from has have how if in into is it its
+of on or that the their then there these they this to was were what when where which who why
+will with about also than such so not no we you your our i he she his her them us
+""".split())
+
+
+def stem(word):
+    # Light suffix stripping so "cells"/"cell" and "reacting"/"react" match
+    for suffix in ("ing", "ies", "es", "ed", "s"):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def tokenize(text):
+    return [stem(w) for w in WORD_RE.findall(text.casefold()) if w not in STOPWORDS]
+
+
+class SectionIndex:
+    """BM25 inverted index over the sections of one document."""
+
+    def __init__(self, sections, model="gpt-oss-120b"):
+        self.sections = sections
+        self.token_counts = count_tokens_batch(sections, model) if sections else []
+        self.postings = defaultdict(list)  # term -> [(section index, term frequency)]
+        self.lengths = []
+
+        for i, section in enumerate(sections):
+            terms = tokenize(section)
+            self.lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings[term].append((i, tf))
+
+        n = len(sections)
+        self.avg_length = (sum(self.lengths) / n) if n else 0.0
+        self.idf = {term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for term, p in self.postings.items()}
+
+    @classmethod
+    def from_text(cls, text, model="gpt-oss-120b"):
+        sections = chunk_text(text, max_tokens=SECTION_TOKENS, model=model, min_tokens=MIN_SECTION_TOKENS)
+        return cls([s for s in sections if s.strip()], model=model)
+
+    def search(self, query, k=TOP_K):
+        """Returns [(score, section index)] best first; sections without any query term are skipped."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                norm = 1 - B + B * self.lengths[i] / (self.avg_length or 1)
+                scores[i] += idf * tf * (K1 + 1) / (tf + K1 * norm)
+        return sorted(((score, i) for i, score in scores.items()), reverse=True)[:k]
+
+    def select(self, query, token_budget=TOPIC_TOKEN_BUDGET, k=TOP_K):
+        """Best-matching sections that fit in `token_budget`, returned in document order."""
+        chosen, used = [], 0
+        for _, i in self.search(query, k):
+            if used + self.token_counts[i] > token_budget:
+                continue
+            chosen.append(i)
+            used += self.token_counts[i]
+        return sorted(chosen), used
+
+
+_index_cache = OrderedDict()  # (content hash, model) -> SectionIndex
+_index_cache_lock = threading.Lock()
+
+
+def get_section_index(text, model="gpt-oss-120b"):
+    """Built once per document and reused across reruns and topics."""
+    key = (hashlib.sha256(text.encode("utf-8")).hexdigest(), model)
+    with _index_cache_lock:
+        if key in _index_cache:
+            _index_cache.move_to_end(key)
+            return _index_cache[key]
+
+    index = SectionIndex.from_text(text, model)
+
+    with _index_cache_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > MAX_CACHED_INDEXES:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def focus_material(text, topic, token_budget=TOPIC_TOKEN_BUDGET, k=TOP_K, model="gpt-oss-120b"):
+    """Narrows `text` to the sections about `topic`.
+
+    Returns (material, info). The full text is returned unchanged when no
+    topic is given, when it already fits the budget, or when nothing matches.
+    """
+    total_tokens = count_tokens(text, model)
+    info = {"topic": topic, "sections_used": None, "sections_total": None, "tokens": total_tokens, "total_tokens": total_tokens}
+    if not topic or not topic.strip() or total_tokens <= token_budget:
+        return text, info
+
+    index = get_section_index(text, model)
+    chosen, used = index.select(topic, token_budget, k)
+    info["sections_total"] = len(index.sections)
+    if not chosen:
+        print(f"🔎 No sections match topic {topic!r}; using the full text")
+        return text, info
+
+    info.update(sections_used=len(chosen), tokens=used)
+    print(f"🔎 Topic {topic!r}: {len(chosen)}/{len(index.sections)} sections, {used} of {total_tokens} tokens")
+    return "\n\n".join(index.sections[i] for i in chosen), info
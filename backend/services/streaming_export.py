@@ -0,0 +1,181 @@
+import os
+import tempfile
+import weakref
+import zipfile
+from pathlib import Path
+from docx import Document
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Frame, PageTemplate, SimpleDocTemplate
+from models.metrics import timed_stage
+from services.exporter import student_blocks
+from services.markdown_render import parse_markdown
+from services.text_to_pdf_docx import add_blocks_to_docx, add_docx_header, convert_text_to_pdf, header_flowables, iter_flowables
+
+
+# Streaming export for very large outputs (whole-book notes, 200-question
+# quizzes). Flowables are built lazily and laid out a few at a time, and the
+# result is written straight to a file instead of BytesIO + getvalue() copies.
+# Imported only when a large export is requested (reportlab and python-docx load here).
+
+# Enough look-ahead for keepWithNext headings to find the flowable they keep with
+STREAM_LOOKAHEAD = 32
+
+
+class StreamingDocTemplate(SimpleDocTemplate):
+    """SimpleDocTemplate that pulls flowables from an iterator instead of a list."""
+
+    def build_incrementally(self, flowables, lookahead=STREAM_LOOKAHEAD):
+        # Same page setup as SimpleDocTemplate.build
+        self._calc()
+        frame = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id="normal")
+        self.addPageTemplates([PageTemplate(id="First", frames=frame, pagesize=self.pagesize),
+                               PageTemplate(id="Later", frames=frame, pagesize=self.pagesize)])
+
+        self._startBuild()
+        canv = self.canv
+        source = iter(flowables)
+        pending = []
+        exhausted = False
+        try:
+            canv._doctemplate = self
+            while True:
+                while not exhausted and len(pending) < lookahead:
+                    flowable = next(source, None)
+                    if flowable is None:
+                        exhausted = True
+                    else:
+                        pending.append(flowable)
+                if not pending:
+                    break
+                self.clean_hanging()
+                self.handle_flowable(pending)
+        finally:
+            del canv._doctemplate
+        self._endBuild()
+
+
+@timed_stage("render_pdf")
+def stream_pdf(blocks, sink, title=None, class_grade=None, subject=None):
+    """Lays out `blocks` page by page and writes the PDF to the file-like `sink`.
+
+    reportlab still keeps the finished (compressed) page streams until the
+    final save, but never the full list of flowables or extra byte copies.
+    """
+    styles = getSampleStyleSheet()
+    doc = StreamingDocTemplate(sink, pagesize=A4)
+
+    def flowables():
+        yield from header_flowables(title, class_grade, subject, styles)
+        yield from iter_flowables(blocks, styles)
+
+    doc.build_incrementally(flowables())
+
+
+@timed_stage("render_docx")
+def stream_docx(blocks, sink, title=None, class_grade=None, subject=None):
+    """Writes the DOCX to `sink`. python-docx keeps the document tree in memory
+    until save, so this only avoids the BytesIO and getvalue() copies."""
+    doc = Document()
+    add_docx_header(doc, title, class_grade, subject)
+    add_blocks_to_docx(doc, blocks)
+    doc.save(sink)
+
+
+STREAM_WRITERS = {"pdf": stream_pdf, "docx": stream_docx}
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass  # Windows: an open file can't be removed; the temp dir is cleaned by the OS
+
+
+def _render_to_path(suffix, write):
+    """Calls write(sink) on a new temp file and returns its path."""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as sink:
+            write(sink)
+    except BaseException:
+        _unlink(path)
+        raise
+    return path
+
+
+def _temp_file(suffix, write):
+    """Like _render_to_path, but returns the file reopened for reading ("rb").
+
+    The file is unlinked right away where the OS allows it, so it disappears
+    once the returned handle is closed or garbage collected.
+    """
+    path = _render_to_path(suffix, write)
+    try:
+        return open(path, "rb")
+    finally:
+        _unlink(path)
+
+
+def _document_writer(text, fmt, title, class_grade=None, subject=None):
+    blocks = parse_markdown(convert_text_to_pdf(text))
+    return lambda sink: STREAM_WRITERS[fmt](blocks, sink, title, class_grade, subject)
+
+
+def _bundle_writer(text, title, file_stem, class_grade=None, subject=None):
+    """Same layout as exporter.export_bundle, each entry streamed into the ZIP."""
+    blocks = parse_markdown(convert_text_to_pdf(text))
+    copies = {"student": student_blocks(blocks), "teacher": blocks}
+
+    def write(sink):
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+            for copy, copy_blocks in copies.items():
+                for fmt, writer in STREAM_WRITERS.items():
+                    with archive.open(f"{file_stem}_{copy}.{fmt}", "w", force_zip64=True) as entry:
+                        writer(copy_blocks, entry, title, class_grade, subject)
+
+    return write
+
+
+def export_to_file(text, fmt, title, class_grade=None, subject=None):
+    return _temp_file(f".{fmt}", _document_writer(text, fmt, title, class_grade, subject))
+
+
+def bundle_to_file(text, title, file_stem, class_grade=None, subject=None):
+    return _temp_file(".zip", _bundle_writer(text, title, file_stem, class_grade, subject))
+
+
+class ExportFiles:
+    """Exports of one text rendered to temp files and kept on disk, for UIs that
+    offer them across reruns. Each file is only read when `reader(name)` is
+    called (e.g. by a download button's deferred `data=`). The files are deleted
+    by delete(), or when the object is garbage collected with its session.
+    """
+
+    def __init__(self, digest):
+        self.digest = digest
+        self.paths = {}
+        self._finalizer = weakref.finalize(self, _unlink_all, self.paths)
+
+    def document(self, fmt, text, title, class_grade=None, subject=None):
+        if fmt not in self.paths:
+            self.paths[fmt] = _render_to_path(f".{fmt}", _document_writer(text, fmt, title, class_grade, subject))
+        return self.reader(fmt)
+
+    def bundle(self, text, title, file_stem, class_grade=None, subject=None):
+        if "zip" not in self.paths:
+            self.paths["zip"] = _render_to_path(".zip", _bundle_writer(text, title, file_stem, class_grade, subject))
+        return self.reader("zip")
+
+    def reader(self, name):
+        path = self.paths[name]
+        return lambda: Path(path).read_bytes()
+
+    def delete(self):
+        self._finalizer()
+
+
+def _unlink_all(paths):
+    for path in paths.values():
+        _unlink(path)
+    paths.clear()
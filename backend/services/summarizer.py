@@ -1,16 +1,29 @@
 # summarizer_service.py
 
-from models.llm_client import ask_openai_sync
+from models.llm_client import AUTO_MODEL, ask_openai_sync, ask_openai_stream, count_tokens
+from models.metrics import timed_stage
+from services.text_chunker import chunk_text
+from services.prompting import compose_prompt
 
 
-def summarize_text(raw_text, prompt_type, class_grade=None, subject=None, model="gpt-oss-120b"):
+# Inputs above this size go through the chunked map-reduce path
+MAP_REDUCE_THRESHOLD_TOKENS = 24_000
+CHUNK_TOKENS = 6_000
+MAP_WORKERS = 4
+
+# Expected answer lengths, used to size max_completion_tokens
+SUMMARY_OUTPUT_TOKENS = {"Summary": 1_200, "Class Notes": 2_500, "Lesson Plan": 1_500}
+CHUNK_NOTES_TOKENS = 1_500
+
+
+def build_summary_prompt(raw_text, prompt_type, class_grade=None, subject=None, model=AUTO_MODEL):
     if prompt_type == "Summary":
-        prompt = f"Summarize the following:\n\n{raw_text}"
+        task = "Summarize the study material."
     elif prompt_type == "Class Notes":
-        prompt = f"Make class teaching notes from this text for one class:\n\n{raw_text}"
+        task = "Make class teaching notes from the study material for one class."
     elif prompt_type == "Lesson Plan":
-        prompt = f"""
-You are an experienced teacher. Create a structured lesson plan for a {class_grade} {subject} class from the following content from the following content for a single 40-minute class. Focus on engaging students and achieving clear learning outcomes.
+        task = f"""
+You are an experienced teacher. Create a structured lesson plan for a {class_grade} {subject} class from the study material for a single 40-minute class. Focus on engaging students and achieving clear learning outcomes.
 
 Use the following format:
 1. **Topic**: (Title of the lesson)
@@ -25,9 +38,66 @@ Use the following format:
    - Wrap-up/Exit Ticket (5 mins):
 7. **Assessment Method**: (How the teacher will evaluate understanding)
 8. **Homework (Optional)**: (If relevant)
+"""
+
+    else:
+        raise ValueError(f"Unknown summary type: {prompt_type}")
 
-Text to base this on:
-{raw_text}
+    return compose_prompt(raw_text, task, model)
+
+
+def build_chunk_prompt(chunk, index, total, class_grade=None, subject=None):
+    return f"""
+You are helping a teacher condense a long {subject or ""} textbook for a {class_grade or ""} class.
+This is part {index} of {total}. Write dense bullet-point notes for this part only.
+Keep every key concept, definition, formula, date, name and example. Do not add an introduction or conclusion.
+
+Text:
+{chunk}
 """
 
-    return ask_openai_sync(prompt=prompt, model=model)
+
+def map_chunks(raw_text, class_grade=None, subject=None, model=AUTO_MODEL, chunk_tokens=CHUNK_TOKENS, max_workers=MAP_WORKERS):
+    from models.async_client import ask_many_sync  # httpx/asyncio stack only for map-reduce
+
+    chunks = chunk_text(raw_text, max_tokens=chunk_tokens, model=model)
+    print(f"🧩 Map phase: {len(chunks)} chunks")
+
+    # Each chunk is its own cached call, so editing one section only re-summarizes that chunk
+    prompts = [build_chunk_prompt(chunk, i, len(chunks), class_grade, subject) for i, chunk in enumerate(chunks, start=1)]
+    notes = ask_many_sync(prompts, model=model, max_concurrency=max_workers, expected_output_tokens=CHUNK_NOTES_TOKENS)
+
+    return "\n\n".join(f"Part {i}:\n{note}" for i, note in enumerate(notes, start=1))
+
+
+def prepare_summary_material(raw_text, class_grade=None, subject=None, model=AUTO_MODEL, mode="auto"):
+    """Returns the text the final pass should see: the raw text for small inputs,
+    otherwise the (recursively) reduced chunk notes."""
+    if mode == "direct":
+        return raw_text
+    if mode == "auto" and count_tokens(raw_text, model) <= MAP_REDUCE_THRESHOLD_TOKENS:
+        return raw_text
+
+    material = map_chunks(raw_text, class_grade, subject, model)
+    # Notes of a very large book can still be too big for one reduce call
+    while count_tokens(material, model) > MAP_REDUCE_THRESHOLD_TOKENS:
+        reduced = map_chunks(material, class_grade, subject, model)
+        if len(reduced) >= len(material):
+            break
+        material = reduced
+    return material
+
+
+@timed_stage("generate_summary")
+def summarize_text(raw_text, prompt_type, class_grade=None, subject=None, model=AUTO_MODEL, mode="auto"):
+    material = prepare_summary_material(raw_text, class_grade, subject, model, mode)
+    prompt = build_summary_prompt(material, prompt_type, class_grade, subject, model)
+    return ask_openai_sync(prompt=prompt, model=model, expected_output_tokens=SUMMARY_OUTPUT_TOKENS.get(prompt_type))
+
+
+@timed_stage("generate_summary")
+def summarize_text_stream(raw_text, prompt_type, class_grade=None, subject=None, model=AUTO_MODEL, stats=None, cancel_event=None, mode="auto"):
+    # The map phase is blocking; only the final reduce pass is streamed
+    material = prepare_summary_material(raw_text, class_grade, subject, model, mode)
+    prompt = build_summary_prompt(material, prompt_type, class_grade, subject, model)
+    return ask_openai_stream(prompt, model=model, stats=stats, cancel_event=cancel_event, expected_output_tokens=SUMMARY_OUTPUT_TOKENS.get(prompt_type))
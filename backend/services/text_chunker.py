@@ -0,0 +1,97 @@
+import re
+from models.token_budget import count_tokens, count_tokens_batch, split_by_tokens
+
+
+HEADING_PATTERNS = [
+    re.compile(r"^#{1,6}\s+\S"),                                   # Markdown headings
+    re.compile(r"^(chapter|unit|lesson|section|part)\s+[\dIVXLC]+\b", re.IGNORECASE),
+    re.compile(r"^\d+(\.\d+){0,2}\s+[A-Z][^.!?]{2,80}$"),          # "1.2 Cell Structure"
+    re.compile(r"^[A-Z][A-Z0-9 ,:&'\-]{3,60}$"),                   # "PHOTOSYNTHESIS"
+]
+
+MIN_SECTION_TOKENS = 300
+
+
+def is_heading(line):
+    line = line.strip()
+    if not line or len(line) > 90:
+        return False
+    return any(p.match(line) for p in HEADING_PATTERNS)
+
+
+def split_into_sections(text):
+    """Splits text at heading-like lines. Returns a list of (heading, body) tuples;
+    text before the first heading gets an empty heading."""
+    sections = []
+    heading = ""
+    body = []
+
+    for line in text.splitlines():
+        if is_heading(line):
+            if heading or "".join(body).strip():
+                sections.append((heading, "\n".join(body).strip()))
+            heading = line.strip().lstrip("#").strip()
+            body = []
+        else:
+            body.append(line)
+
+    if heading or "".join(body).strip():
+        sections.append((heading, "\n".join(body).strip()))
+    return sections
+
+
+def _split_oversized(text, max_tokens, model):
+    # Pack paragraphs; a single paragraph over budget is cut on line boundaries,
+    # and a single line over budget is cut by tokens, so no piece exceeds max_tokens
+    pieces = []
+    current = []
+    current_tokens = 0
+    separator_tokens = count_tokens("\n\n", model)
+
+    paragraphs = re.split(r"\n\s*\n", text)
+    for para, para_tokens in zip(paragraphs, count_tokens_batch(paragraphs, model)):
+        if para_tokens <= max_tokens:
+            units = [(para, para_tokens)]
+        else:
+            lines = para.splitlines()
+            units = []
+            for line, line_tokens in zip(lines, count_tokens_batch(lines, model)):
+                units.extend(split_by_tokens(line, max_tokens, model) if line_tokens > max_tokens else [(line, line_tokens)])
+        for unit, unit_tokens in units:
+            if current and current_tokens + separator_tokens + unit_tokens > max_tokens:
+                pieces.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current_tokens += unit_tokens + (separator_tokens if current else 0)
+            current.append(unit)
+
+    if current:
+        pieces.append("\n\n".join(current))
+    return pieces
+
+
+def chunk_text(text, max_tokens=6_000, model="gpt-oss-120b", min_tokens=MIN_SECTION_TOKENS):
+    """Chunks text on section boundaries so that editing one section only changes
+    its own chunk. Tiny sections are merged forward; big ones are split by tokens."""
+    chunks = []
+    pending = ""
+
+    for heading, body in split_into_sections(text):
+        section = f"{heading}\n{body}".strip() if heading else body
+        if pending:
+            section = f"{pending}\n\n{section}"
+            pending = ""
+
+        tokens = count_tokens(section, model)
+        if tokens < min_tokens:
+            pending = section
+        elif tokens <= max_tokens:
+            chunks.append(section)
+        else:
+            chunks.extend(_split_oversized(section, max_tokens, model))
+
+    if pending:
+        if chunks and count_tokens(f"{chunks[-1]}\n\n{pending}", model) <= max_tokens:
+            chunks[-1] = f"{chunks[-1]}\n\n{pending}"
+        else:
+            chunks.append(pending)
+    return chunks
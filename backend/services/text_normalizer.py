@@ -0,0 +1,140 @@
+import re
+from collections import Counter
+from models.metrics import timed_stage
+from models.token_budget import count_tokens
+
+
+# Cleans extracted PDF pages before they reach any prompt: running headers and
+# footers, page numbers, hyphenated line breaks, hard-wrapped lines and ragged
+# whitespace cost tokens without adding content.
+
+EDGE_LINES = 3                 # lines at the top/bottom of a page checked for headers/footers
+REPEAT_MIN_PAGES = 3
+REPEAT_MIN_FRACTION = 0.3      # share of pages a header/footer line must appear on
+MIN_PAGE_CHARS = 40            # pages with less text than this (after cleaning) are dropped
+MIN_FURNITURE_CHARS = 12       # repeated lines shorter than this (page number aside) are kept
+TOKEN_MODEL = "gpt-oss-120b"
+
+PAGE_NUMBER_RE = re.compile(r"^\W*(?:page\s*)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?\W*$", re.IGNORECASE)
+HYPHEN_BREAK_RE = re.compile(r"(\w+)-\n[ \t]*([a-z]\w*)")
+WORD_RE = re.compile(r"\w+(?:-\w+)*")
+EDGE_NUMBER_RE = re.compile(r"^(?:page\s*)?\d{1,4}\b\W*|\W*\b(?:page\s*)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?$", re.IGNORECASE)
+LIST_OR_HEADING_RE = re.compile(r"^(?:[-*•▪◦]|\d{1,3}[.)]|[A-Za-z][.)]|#|[A-Z0-9][A-Z0-9 ,:'&-]{2,}$)")
+MID_WORD_BREAK_RE = re.compile(r"\w[-\u00ad]$")
+SMALL_WORD = r"(?:a|an|and|at|by|for|in|of|on|or|the|to|with)"
+TITLE_CASE_RE = re.compile(rf"^[A-Z0-9][\w'’&:-]*(?:\s+(?:[A-Z0-9(][\w'’&:)-]*|{SMALL_WORD}|[·–-]))*$")
+SPACES_RE = re.compile(r"[ \t ]+")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def line_signature(line):
+    # Only a leading or trailing page number is wildcarded ("Chapter 3 · 41"):
+    # "Exercise 1" and "Exercise 2" must stay different lines
+    return EDGE_NUMBER_RE.sub("#", SPACES_RE.sub(" ", line).strip().casefold())
+
+
+def is_page_furniture(signature):
+    return len(re.sub(r"[\W#]", "", signature)) >= MIN_FURNITURE_CHARS
+
+
+def find_repeated_lines(pages):
+    """Signatures of lines that recur at the top or bottom of many pages."""
+    if len(pages) < REPEAT_MIN_PAGES:
+        return set()
+    counts = Counter()
+    for page in pages:
+        lines = [line for line in page.splitlines() if line.strip()]
+        counts.update({line_signature(line) for line in lines[:EDGE_LINES] + lines[-EDGE_LINES:]})
+    threshold = max(REPEAT_MIN_PAGES, REPEAT_MIN_FRACTION * len(pages))
+    return {signature for signature, n in counts.items() if n >= threshold and is_page_furniture(signature)}
+
+
+def strip_page_furniture(page, repeated):
+    lines = page.splitlines()
+    edge = {i for i in range(len(lines)) if i < EDGE_LINES or i >= len(lines) - EDGE_LINES}
+    kept = []
+    for i, line in enumerate(lines):
+        if i in edge and (PAGE_NUMBER_RE.match(line) or line_signature(line) in repeated):
+            continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def continues_line(prev, line):
+    """True when `line` is the wrapped rest of `prev`: it starts lowercase or
+    `prev` broke off mid-word. Table rows and lines after headings never join."""
+    if "|" in prev or "|" in line or LIST_OR_HEADING_RE.match(line):
+        return False
+    if MID_WORD_BREAK_RE.search(prev):
+        return True
+    return line[0].islower() and not TITLE_CASE_RE.match(prev)
+
+
+def word_counts(text):
+    """Lowercased word frequencies; hyphenated compounds count as one word."""
+    return Counter(word.casefold() for word in WORD_RE.findall(HYPHEN_BREAK_RE.sub(" ", text)))
+
+
+def repair_hyphen_break(match, vocabulary):
+    # "photo-/synthesis" is a typesetting break when the document spells it
+    # "photosynthesis" elsewhere; "well-/known" stays hyphenated
+    left, right = match.group(1), match.group(2)
+    joined, compound = f"{left}{right}", f"{left}-{right}"
+    if vocabulary[joined.casefold()] > vocabulary[compound.casefold()]:
+        return joined
+    return compound
+
+
+def join_wrapped_lines(text, vocabulary=None):
+    """Repairs hyphenated line breaks and joins lines that were wrapped mid-sentence.
+
+    `vocabulary` (word_counts of the whole document) decides whether a hyphen at
+    a line break is dropped; it defaults to the counts of `text` itself.
+    """
+    if vocabulary is None:
+        vocabulary = word_counts(text)
+    text = HYPHEN_BREAK_RE.sub(lambda match: repair_hyphen_break(match, vocabulary), text)
+    out = []
+    for line in text.split("\n"):
+        line = SPACES_RE.sub(" ", line).strip()
+        prev = out[-1] if out else ""
+        if line and prev and continues_line(prev, line):
+            if MID_WORD_BREAK_RE.search(prev):
+                # "COVID-" + "19" keeps its hyphen, a soft hyphen is dropped
+                out[-1] = prev.rstrip("\u00ad") + line
+            else:
+                out[-1] = f"{prev} {line}"
+        else:
+            out.append(line)
+    return BLANK_LINES_RE.sub("\n\n", "\n".join(out)).strip()
+
+
+def normalize_text(text):
+    """Whitespace, hyphenation and wrap repair for text without page structure."""
+    return join_wrapped_lines(text)
+
+
+@timed_stage("normalize")
+def normalize_pages(pages, model=TOKEN_MODEL):
+    """Returns (text, stats) with headers/footers, page numbers and near-empty pages removed.
+
+    stats: pages, pages_dropped, repeated_lines, tokens_before, tokens_after.
+    """
+    raw = "\n".join(pages).strip()
+    repeated = find_repeated_lines(pages)
+    vocabulary = word_counts(raw)
+    cleaned = []
+    for page in pages:
+        page = join_wrapped_lines(strip_page_furniture(page, repeated), vocabulary)
+        if len(re.sub(r"\s", "", page)) >= MIN_PAGE_CHARS:
+            cleaned.append(page)
+    text = "\n\n".join(cleaned)
+
+    stats = {
+        "pages": len(pages),
+        "pages_dropped": len(pages) - len(cleaned),
+        "repeated_lines": len(repeated),
+        "tokens_before": count_tokens(raw, model),
+        "tokens_after": count_tokens(text, model),
+    }
+    return text, stats
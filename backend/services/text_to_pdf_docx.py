@@ -1,14 +1,22 @@
-from models.llm_client import ask_openai_sync
+from models.metrics import timed_stage
+from models.token_budget import AUTO_MODEL
 from io import BytesIO
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from docx import Document
+from services.markdown_render import parse_markdown, normalize_markdown, to_reportlab_markup, add_docx_runs
 
+# reportlab, python-docx and the OpenAI client are imported inside the functions
+# that need them, so pages that never export don't pay for loading them.
 
 
 
-def convert_text_to_pdf(raw_text, model="gpt-oss-120b"):
+
+@timed_stage("format")
+def convert_text_to_pdf(raw_text, use_llm=False, model=AUTO_MODEL):
+    # Local, deterministic formatting; the LLM pass is opt-in only
+    if not use_llm:
+        return normalize_markdown(raw_text)
+
+    from models.llm_client import ask_openai_sync, count_tokens
+
     prompt = f"""
     You are a teacher preparing educational content to be turned into a printable PDF. Take the following unformatted text and reformat it using Markdown so it’s clean and readable in a document.
 
@@ -23,12 +31,58 @@ def convert_text_to_pdf(raw_text, model="gpt-oss-120b"):
     Text:
     \"\"\"{raw_text}\"\"\"
     """
-    return ask_openai_sync(prompt=prompt, model=model)
+    # Reformatting: the answer is about as long as the text
+    return ask_openai_sync(prompt=prompt, model=model, expected_output_tokens=count_tokens(raw_text, model) + 200)
+
+
+def add_markdown_to_docx(doc, formatted_text):
+    return add_blocks_to_docx(doc, parse_markdown(formatted_text))
+
+
+def add_blocks_to_docx(doc, blocks):
+    from docx.shared import Pt, Inches
+
+    for block in blocks:
+        kind = block["type"]
+        if kind == "heading":
+            # Level 1 is used by the document title
+            add_docx_runs(doc.add_heading("", level=min(block["level"] + 1, 9)), block["text"])
+        elif kind == "paragraph":
+            add_docx_runs(doc.add_paragraph(), block["text"])
+        elif kind in ("bullet_list", "numbered_list"):
+            for item in block["items"]:
+                paragraph = doc.add_paragraph()
+                paragraph.paragraph_format.left_indent = Inches(0.25 * (item["level"] + 1))
+                paragraph.paragraph_format.first_line_indent = Inches(-0.2)
+                # Numbers are written out so each list keeps its own numbering
+                marker = f"{item['number']}. " if "number" in item else "• "
+                paragraph.add_run(marker)
+                add_docx_runs(paragraph, item["text"])
+        elif kind == "table":
+            rows = block["rows"]
+            table = doc.add_table(rows=len(rows), cols=len(rows[0]))
+            table.style = "Table Grid"
+            for r, row in enumerate(rows):
+                for c, cell_text in enumerate(row):
+                    cell_paragraph = table.cell(r, c).paragraphs[0]
+                    add_docx_runs(cell_paragraph, cell_text)
+                    if r == 0:
+                        for run in cell_paragraph.runs:
+                            run.bold = True
+        elif kind == "code":
+            run = doc.add_paragraph().add_run(block["text"])
+            run.font.name = "Courier New"
+            run.font.size = Pt(9)
+        elif kind == "rule":
+            doc.add_paragraph("")
+    return doc
 
 
 def generate_docx(formatted_text, title=None, class_grade=None, subject=None):
-    doc = Document()
+    return render_docx(parse_markdown(formatted_text), title, class_grade, subject)
 
+
+def add_docx_header(doc, title, class_grade, subject):
     # Add title
     doc.add_heading(title, level=1)
 
@@ -43,9 +97,15 @@ def generate_docx(formatted_text, title=None, class_grade=None, subject=None):
 
     doc.add_paragraph("")  # Spacer
 
-    # Add content (split on double newlines)
-    for para in formatted_text.strip().split("\n\n"):
-        doc.add_paragraph(para.strip())
+
+@timed_stage("render_docx")
+def render_docx(blocks, title=None, class_grade=None, subject=None):
+    """DOCX bytes from already-parsed Markdown blocks (see parse_markdown)."""
+    from docx import Document
+
+    doc = Document()
+    add_docx_header(doc, title, class_grade, subject)
+    add_blocks_to_docx(doc, blocks)
 
     # Convert to BytesIO
     buffer = BytesIO()
@@ -56,35 +116,95 @@ def generate_docx(formatted_text, title=None, class_grade=None, subject=None):
 
 
 
-# PDF generation from Markdown-like formatted text
-def generate_pdf(formatted_text, title=None, class_grade=None, subject=None):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    flowables = []
+def markdown_to_flowables(formatted_text, styles):
+    return blocks_to_flowables(parse_markdown(formatted_text), styles)
+
+
+def blocks_to_flowables(blocks, styles):
+    return list(iter_flowables(blocks, styles))
 
-    title_style = styles["Title"]
-    subtitle_style = styles["Heading2"]
+
+def iter_flowables(blocks, styles):
+    """Yields the flowables for `blocks` one at a time."""
+    from reportlab.platypus import Paragraph, Spacer, Table, TableStyle, Preformatted, HRFlowable
+    from reportlab.lib import colors
+
+    heading_styles = {1: styles["Heading1"], 2: styles["Heading2"], 3: styles["Heading3"]}
     normal_style = styles["Normal"]
+    list_styles = {}
+
+    for block in blocks:
+        kind = block["type"]
+        if kind == "heading":
+            yield Paragraph(to_reportlab_markup(block["text"]), heading_styles.get(block["level"], styles["Heading4"]))
+        elif kind == "paragraph":
+            yield Paragraph(to_reportlab_markup(block["text"]), normal_style)
+            yield Spacer(1, 8)
+        elif kind in ("bullet_list", "numbered_list"):
+            for item in block["items"]:
+                marker = f"{item['number']}." if "number" in item else "•"
+                level = item["level"]
+                if level not in list_styles:
+                    indent = 18 * (level + 1)
+                    list_styles[level] = normal_style.clone(f"ListItem{level}", leftIndent=indent, bulletIndent=indent - 14, spaceAfter=2)
+                yield Paragraph(to_reportlab_markup(item["text"]), list_styles[level], bulletText=marker)
+            yield Spacer(1, 8)
+        elif kind == "table":
+            data = [[Paragraph(to_reportlab_markup(cell), normal_style) for cell in row] for row in block["rows"]]
+            table = Table(data, repeatRows=1)
+            table.setStyle(TableStyle([
+                ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+                ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+                ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ]))
+            yield table
+            yield Spacer(1, 8)
+        elif kind == "code":
+            yield Preformatted(block["text"], styles["Code"])
+        elif kind == "rule":
+            yield HRFlowable(width="100%", color=colors.grey)
+            yield Spacer(1, 8)
+
+
+def header_flowables(title, class_grade, subject, styles):
+    from reportlab.platypus import Paragraph, Spacer
 
+    flowables = []
     # Add metadata
     if title:
-        flowables.append(Paragraph(title, title_style))
+        flowables.append(Paragraph(title, styles["Title"]))
         flowables.append(Spacer(1, 12))
-    
+
     if class_grade or subject:
         metadata = ""
         if class_grade:
             metadata += f"<b>Class:</b> {class_grade}<br/>"
         if subject:
             metadata += f"<b>Subject:</b> {subject}"
-        flowables.append(Paragraph(metadata, subtitle_style))
+        flowables.append(Paragraph(metadata, styles["Heading2"]))
         flowables.append(Spacer(1, 12))
+    return flowables
+
+
+# PDF generation from Markdown-like formatted text
+def generate_pdf(formatted_text, title=None, class_grade=None, subject=None):
+    return render_pdf(parse_markdown(formatted_text), title, class_grade, subject)
+
+
+@timed_stage("render_pdf")
+def render_pdf(blocks, title=None, class_grade=None, subject=None):
+    """PDF bytes from already-parsed Markdown blocks (see parse_markdown)."""
+    from reportlab.platypus import SimpleDocTemplate
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    styles = getSampleStyleSheet()
+    flowables = header_flowables(title, class_grade, subject, styles)
 
     # Add formatted text
-    for para in formatted_text.split("\n\n"):
-        flowables.append(Paragraph(para.strip(), normal_style))
-        flowables.append(Spacer(1, 12))
+    flowables.extend(blocks_to_flowables(blocks, styles))
 
     doc.build(flowables)
     pdf = buffer.getvalue()
@@ -1,23 +1,41 @@
-from models.llm_client import ask_openai_sync
+from models.llm_client import AUTO_MODEL, ask_openai_sync, ask_openai_stream
+from models.model_router import question_output_tokens
+from models.metrics import timed_stage
+from services.prompting import compose_prompt
+from services.quiz_schema import QUIZ_RESPONSE_FORMAT, build_structured_prompt, iter_json_items, normalize_quiz_item
 import os
 
-from docx import Document
-from io import BytesIO
 import json
 import re
 
 
-def generate_worksheet(raw_text, num_questions, worksheet_type="Mixed", class_grade=None, subject=None):
-    prompt = f"""
-You are a worksheet generator AI. Generate {num_questions} questions in {worksheet_type} question answer format, from the following study material, for a {subject} {class_grade} class. 
+def build_worksheet_prompt(raw_text, num_questions, worksheet_type="Mixed", class_grade=None, subject=None, model=AUTO_MODEL):
+    return compose_prompt(raw_text, model=model, task=f"""
+Generate a worksheet of {num_questions} questions in {worksheet_type} question answer format from the study material, for a {subject} {class_grade} class.
 Output questions and answers key in the end.
+""")
 
-Study Material:
-{raw_text}
-"""
 
-    response = ask_openai_sync(prompt)
+@timed_stage("generate_worksheet")
+def generate_worksheet(raw_text, num_questions, worksheet_type="Mixed", class_grade=None, subject=None, model=AUTO_MODEL):
+    prompt = build_worksheet_prompt(raw_text, num_questions, worksheet_type, class_grade, subject, model)
+
+    response = ask_openai_sync(prompt, model=model, expected_output_tokens=question_output_tokens(num_questions))
     #print(response)
     #temp = extract_quiz_json(response)
     #print (temp)
-    return response
\ No newline at end of file
+    return response
+
+
+@timed_stage("generate_worksheet")
+def generate_worksheet_stream(raw_text, num_questions, worksheet_type="Mixed", class_grade=None, subject=None, stats=None, cancel_event=None):
+    prompt = build_worksheet_prompt(raw_text, num_questions, worksheet_type, class_grade, subject)
+    return ask_openai_stream(prompt, stats=stats, cancel_event=cancel_event, expected_output_tokens=question_output_tokens(num_questions))
+
+
+@timed_stage("generate_worksheet")
+def generate_worksheet_items_stream(raw_text, num_questions, worksheet_type="Mixed", class_grade=None, subject=None, stats=None, cancel_event=None):
+    prompt = build_structured_prompt("worksheet", raw_text, num_questions, worksheet_type, class_grade, subject)
+    tokens = ask_openai_stream(prompt, stats=stats, cancel_event=cancel_event, response_format=QUIZ_RESPONSE_FORMAT, expected_output_tokens=question_output_tokens(num_questions))
+    for item in iter_json_items(tokens):
+        yield normalize_quiz_item(item)
@@ -0,0 +1,30 @@
+import sys
+import pytest
+from pathlib import Path
+
+# Modules import each other as top-level packages (models.*, services.*), as when run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+class CharEncoding:
+    """One token per character; stands in for tiktoken, whose BPE files may need a download."""
+    name = "chars"
+
+    def encode(self, text, disallowed_special=()):
+        return [ord(c) for c in text]
+
+    def encode_batch(self, texts, disallowed_special=()):
+        return [self.encode(text) for text in texts]
+
+    def decode(self, tokens):
+        return "".join(chr(t) for t in tokens)
+
+
+@pytest.fixture
+def char_tokens(monkeypatch):
+    import models.model_router
+    import models.token_budget
+    encoding = CharEncoding()
+    monkeypatch.setattr(models.token_budget, "get_encoding", lambda model: encoding)
+    monkeypatch.setattr(models.model_router, "get_encoding", lambda model: encoding)
+    return encoding
@@ -0,0 +1,29 @@
+from services.job_queue import PRIORITY_BULK, JobStore
+
+
+def test_interactive_jobs_are_claimed_before_bulk_jobs(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    bulk = store.submit("quiz", {"text": "a"}, user_id="api", priority=PRIORITY_BULK)
+    interactive = store.submit("quiz", {"text": "b"}, user_id="teacher")
+
+    assert store.claim_next()["id"] == interactive
+    assert store.claim_next()["id"] == bulk
+
+
+def test_identical_queued_job_is_reused(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    first = store.submit("summary", {"raw_text": "x", "structured": False})
+
+    assert store.submit("summary", {"structured": False, "raw_text": "x"}) == first
+    assert store.submit("summary", {"raw_text": "x", "structured": True}) != first
+
+
+def test_prune_finished_keeps_live_jobs(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    done = store.submit("quiz", {"n": 1})
+    store.finish(store.claim_next()["id"], "result")
+    queued = store.submit("quiz", {"n": 2})
+
+    assert store.prune_finished() == 0
+    assert store.prune_finished(max_age=-1) == 1
+    assert store.get(done) is None and store.get(queued)["status"] == "queued"
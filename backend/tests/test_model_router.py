@@ -0,0 +1,60 @@
+import pytest
+
+from models import model_router
+from models.model_router import choose_route, fallback_route, resolve
+
+# Real model names for their context/output limits; prices and latencies fixed here
+ROUTES = {
+    "gpt-3.5-turbo": {"latency": 1.0, "reasoning": 0, "price": [0.1, 0.1]},         # 16k context, 4k output
+    "gpt-4.1-nano-2025-04-14": {"latency": 1.0, "reasoning": 0, "price": [1.0, 1.0]},  # 1M context, 32k output
+    "o4-mini": {"latency": 1.0, "reasoning": 0, "price": [10.0, 10.0]},               # 200k context, 100k output
+}
+
+
+@pytest.fixture
+def routes(monkeypatch, char_tokens):
+    monkeypatch.setattr(model_router, "_routes", {model: dict(entry) for model, entry in ROUTES.items()})
+    return model_router._routes
+
+
+def test_cheapest_model_that_fits_wins(routes):
+    route = choose_route("x" * 100, expected_output_tokens=1_000)
+
+    assert route["model"] == "gpt-3.5-turbo"
+    assert route["input_tokens"] == 100
+    assert route["max_tokens"] == 1_300  # expected answer plus OUTPUT_MARGIN
+
+
+def test_prompt_too_long_for_the_cheapest_context_moves_up(routes):
+    assert choose_route("x" * 20_000, expected_output_tokens=1_000)["model"] == "gpt-4.1-nano-2025-04-14"
+
+
+def test_answer_must_fit_the_output_limit_and_safety_cap(routes):
+    assert choose_route("x", expected_output_tokens=4_000)["model"] == "gpt-4.1-nano-2025-04-14"
+    assert choose_route("x", expected_output_tokens=36_000)["model"] == "o4-mini"
+    # o4-mini allows 100k output tokens, but max_tokens is clamped to OUTPUT_SAFETY_CAP
+    with pytest.raises(ValueError):
+        choose_route("x", expected_output_tokens=40_000)
+
+
+def test_fastest_model_within_cost_tolerance_wins(routes):
+    routes["gpt-3.5-turbo"]["latency"] = 5.0
+    routes["gpt-4.1-nano-2025-04-14"]["price"] = [0.11, 0.11]
+
+    assert choose_route("x" * 100, expected_output_tokens=1_000)["model"] == "gpt-4.1-nano-2025-04-14"
+
+
+def test_fallback_doubles_the_answer_on_an_untried_model(routes):
+    route = choose_route("x" * 100, expected_output_tokens=1_000)
+
+    fallback = fallback_route("x" * 100, route, tried={route["model"]})
+
+    assert fallback["model"] == "gpt-4.1-nano-2025-04-14"
+    assert fallback["expected_output_tokens"] == 2_000
+    assert fallback_route("x" * 100, route, tried=set(ROUTES)) is None
+
+
+def test_pinned_model_reserves_the_expected_answer(routes):
+    model, input_tokens, max_tokens, route = resolve("x" * 100, "gpt-3.5-turbo", expected_output_tokens=1_000)
+
+    assert (model, input_tokens, max_tokens, route) == ("gpt-3.5-turbo", 100, 1_300, None)
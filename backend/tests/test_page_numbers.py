@@ -0,0 +1,28 @@
+from services.page_numbers import fit_visible_to_internal
+
+
+def test_offsets_follow_the_page_number_sequence():
+    # Two unnumbered cover pages, then pages numbered from 1; page 5 also shows a year
+    candidates = [set(), set()] + [{n} for n in range(1, 21)]
+    candidates[6].add(1998)
+
+    mapping = fit_visible_to_internal(candidates)
+
+    assert mapping[1] == 2 and mapping[20] == 21
+    assert 1998 not in mapping
+
+
+def test_missing_numbers_inherit_the_previous_offset():
+    candidates = [{n} for n in range(1, 21)]
+    candidates[10] = set()
+
+    assert fit_visible_to_internal(candidates)[11] == 10
+
+
+def test_body_numbering_wins_over_arabic_front_matter():
+    # Front matter numbered 1-6, then the body restarts at 1 and runs to 40
+    candidates = [{n} for n in range(1, 7)] + [{n} for n in range(1, 41)]
+
+    mapping = fit_visible_to_internal(candidates)
+
+    assert mapping[1] == 6 and mapping[6] == 11 and mapping[40] == 45
@@ -0,0 +1,35 @@
+import json
+from services.quiz_schema import JsonItemStreamParser, iter_json_items, normalize_quiz_item, quiz_items_to_markdown
+
+ITEMS = [
+    {"question": "Which gas do plants take in? {hint: \"air\"}", "type": "mcq", "options": ["CO2", "O2"], "answer": "CO2"},
+    {"question": "The sun is a star.", "type": "true_false", "options": ["True", "False"], "answer": "True"},
+    {"question": "Name the green pigment [in leaves].", "type": "short_answer", "options": [], "answer": "Chlorophyll"},
+]
+
+
+def test_items_are_returned_as_soon_as_each_object_closes():
+    text = json.dumps({"questions": ITEMS})
+    first_end = text.index(json.dumps(ITEMS[0])) + len(json.dumps(ITEMS[0]))
+    parser = JsonItemStreamParser()
+
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == ITEMS[:1]
+    assert [item for i in range(first_end, len(text), 5) for item in parser.feed(text[i:i + 5])] == ITEMS[1:]
+
+
+def test_bare_array_and_one_character_chunks():
+    assert list(iter_json_items(json.dumps(ITEMS))) == ITEMS
+
+
+def test_malformed_item_is_skipped_not_the_whole_quiz():
+    text = '{"questions": [{"question": "ok?", "answer": "yes"}, {"question": bad}, {"question": "next?", "answer": "no"}]}'
+
+    assert [item["question"] for item in iter_json_items([text])] == ["ok?", "next?"]
+
+
+def test_normalized_items_render_with_an_answer_key():
+    item = normalize_quiz_item({"question": " Pick one ", "options": ["A) red", "blue"], "answer": "red"})
+
+    assert item["type"] == "mcq"
+    assert quiz_items_to_markdown([item]) == "## Questions\n\n1. Pick one\nA) red\nB) blue\n\n## Answer Key\n\n1. red"
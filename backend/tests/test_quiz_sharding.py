@@ -0,0 +1,59 @@
+import hashlib
+from services.quiz_sharding import allocate_questions, merge_quiz_shards, parse_quiz_output
+
+
+def shard_output(topic, count):
+    # Distinct stems, so none of them are dropped as near-duplicates
+    stems = [hashlib.sha256(f"{topic}{i}".encode()).hexdigest() for i in range(1, count + 1)]
+    questions = "\n".join(f"{i}. {stem} {topic} ?" for i, stem in enumerate(stems, start=1))
+    answers = "\n".join(f"{i}. {topic} answer {i}" for i in range(1, count + 1))
+    return f"## Questions\n{questions}\n\n## Answer Key\n{answers}"
+
+
+def merged_questions(merged):
+    questions, answers = parse_quiz_output(merged)
+    return [body for _, body in questions], answers
+
+
+def test_allocate_questions_is_proportional_and_exact():
+    assert allocate_questions([1, 1, 2], 8) == [2, 2, 4]
+    assert sum(allocate_questions([3, 5, 7, 11], 200)) == 200
+
+
+def test_parse_quiz_output_pairs_questions_with_answer_key():
+    questions, answers = parse_quiz_output("## Questions\n1. Q one?\nA) yes\nB) no\n2. Q two?\n\n## Answer Key\n1. A\n2. B")
+    assert questions == [(1, "Q one?\nA) yes\nB) no"), (2, "Q two?")]
+    assert answers == {1: "A", 2: "B"}
+
+
+def test_merge_keeps_every_shard_at_its_quota_despite_oversampling():
+    topics = [f"topic{i}" for i in range(14)]
+    quotas = allocate_questions([1] * 14, 200)
+    outputs = [shard_output(topic, round(quota * 1.15) + 1) for topic, quota in zip(topics, quotas)]
+
+    questions, answers = merged_questions(merge_quiz_shards(outputs, quotas))
+
+    assert len(questions) == 200
+    for topic, quota in zip(topics, quotas):
+        assert sum(f" {topic} " in body for body in questions) == quota
+    assert len(answers) == 200
+
+
+def test_merge_backfills_short_shards_from_surplus():
+    outputs = [shard_output("alpha", 8), "", shard_output("gamma", 8)]
+
+    questions, _ = merged_questions(merge_quiz_shards(outputs, [5, 5, 5]))
+
+    assert len(questions) == 15
+    assert sum(" alpha " in body for body in questions) == 8
+    assert sum(" gamma " in body for body in questions) == 7
+
+
+def test_merge_drops_near_duplicates_across_shards():
+    first = "## Questions\n1. What is photosynthesis?\n\n## Answer Key\n1. Making food"
+    second = "## Questions\n1. What is photosynthesis ?\n2. Where does respiration happen?\n\n## Answer Key\n1. x\n2. Mitochondria"
+
+    questions, answers = merged_questions(merge_quiz_shards([first, second], [1, 1]))
+
+    assert questions == ["What is photosynthesis?", "Where does respiration happen?"]
+    assert answers == {1: "Making food", 2: "Mitochondria"}
@@ -0,0 +1,60 @@
+import pytest
+
+from models.rate_limiter import ModelRateLimiter, RateLimiter, TokenBucket, parse_duration, retry_after_seconds
+
+
+@pytest.mark.parametrize("value, seconds", [("20ms", 0.02), ("1s", 1.0), ("6m0s", 360.0), ("1h2m", 3720.0), ("1.5", 1.5)])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == pytest.approx(seconds)
+
+
+def test_parse_duration_rejects_missing_or_unknown_values():
+    assert parse_duration(None) is None
+    assert parse_duration("soon") is None
+
+
+def test_retry_after_prefers_milliseconds():
+    assert retry_after_seconds({"retry-after-ms": "250", "retry-after": "3"}) == pytest.approx(0.25)
+    assert retry_after_seconds({"retry-after": "3"}) == 3.0
+    assert retry_after_seconds(None) is None
+
+
+def test_bucket_goes_into_debt_and_paces_in_arrival_order():
+    bucket = TokenBucket(per_minute=60)  # one per second
+    now = bucket.updated
+
+    assert bucket.reserve(60, now) == 0.0
+    assert bucket.reserve(30, now) == pytest.approx(30.0)
+    assert bucket.reserve(30, now) == pytest.approx(60.0)
+    # Paid back at the refill rate
+    assert bucket.reserve(0, now + 60) == pytest.approx(0.0)
+
+
+def test_oversized_reservation_is_clamped_to_the_capacity():
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+
+    assert bucket.reserve(600, now) == 0.0
+    assert bucket.reserve(1, now) == pytest.approx(1.0)
+
+
+def test_headers_resize_the_buckets_and_block_when_exhausted():
+    limiter = ModelRateLimiter(rpm=1_000, tpm=1_000_000)
+
+    limiter.update_from_headers({
+        "x-ratelimit-limit-tokens": "6000",
+        "x-ratelimit-remaining-tokens": "0",
+        "x-ratelimit-reset-tokens": "30s",
+    })
+
+    assert limiter.tokens.capacity == 6_000
+    assert limiter.reserve(1) == pytest.approx(30.0, abs=0.5)
+
+
+def test_report_rate_limited_blocks_the_model_for_retry_after():
+    limiter = RateLimiter(limits={"test-model": {"rpm": 1_000, "tpm": 1_000_000}})
+
+    assert limiter.report_rate_limited("test-model", {"retry-after": "5"}) == 5.0
+    assert limiter.for_model("test-model").reserve(1) == pytest.approx(5.0, abs=0.5)
+    assert limiter.report_rate_limited("test-model") == 2.0  # no headers: default wait
+    assert limiter.for_model("other-model").reserve(1) == 0.0
@@ -0,0 +1,61 @@
+from models import response_cache
+from models.response_cache import ResponseCache, make_cache_key
+
+
+def test_key_ignores_whitespace_noise_and_unset_params():
+    key = make_cache_key("gpt-4o", "Question:\r\n\n\n\nAnswer   \n", temperature=None)
+
+    assert key == make_cache_key("gpt-4o", "Question:\n\nAnswer")
+    assert key != make_cache_key("gpt-4o", "Question:\n\nAnswer", temperature=0.2)
+    assert key != make_cache_key("o4-mini", "Question:\n\nAnswer")
+
+
+def test_values_survive_a_restart_through_the_disk_tier(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    ResponseCache(path).set("k", "value", model="gpt-4o")
+
+    cache = ResponseCache(path)
+    assert cache.get("k") == "value"
+    assert cache.get("k") == "value"
+    assert cache.get("missing") is None
+    assert cache.stats["disk_hits"] == 1
+    assert cache.stats["memory_hits"] == 1
+    assert cache.stats["misses"] == 1
+
+
+def test_expired_entries_are_misses(tmp_path, monkeypatch):
+    clock = [1_000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: clock[0])
+    cache = ResponseCache(tmp_path / "cache.sqlite3", ttl_seconds=60)
+    cache.set("k", "value")
+
+    clock[0] += 61
+    assert cache.get("k") is None
+    assert ResponseCache(tmp_path / "cache.sqlite3", ttl_seconds=60).get("k") is None
+
+
+def test_memory_tier_is_bounded(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite3", max_memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+
+    assert list(cache._memory) == ["b", "c"]
+    assert cache.get("a") == "a"  # still on disk
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = [1_000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: clock[0])
+    cache = ResponseCache(tmp_path / "cache.sqlite3", max_memory_entries=0, max_disk_bytes=20)
+    for key in ("a", "b"):
+        clock[0] += 1
+        cache.set(key, "x" * 10)
+    clock[0] += 1
+    cache.get("a")
+
+    clock[0] += 1
+    cache.set("c", "x" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == "x" * 10
+    assert cache.stats["evictions"] == 1
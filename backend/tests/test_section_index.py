@@ -0,0 +1,39 @@
+from services.section_index import SectionIndex, focus_material, tokenize
+
+SECTIONS = [
+    "Photosynthesis: plants use sunlight, water and carbon dioxide to make glucose in the leaves.",
+    "Respiration releases energy from glucose in the mitochondria of every living cell.",
+    "The water cycle moves water through evaporation, condensation and rain.",
+    "Chlorophyll in leaves absorbs sunlight for photosynthesis; the leaves look green because of it.",
+]
+
+
+def test_tokenize_drops_stopwords_and_stems():
+    assert tokenize("The cells are reacting with studies") == ["cell", "react", "study"]
+
+
+def test_search_ranks_sections_by_bm25(char_tokens):
+    index = SectionIndex(SECTIONS)
+
+    ranked = [i for _, i in index.search("photosynthesis in leaves")]
+
+    assert set(ranked[:2]) == {0, 3}
+    assert 2 not in ranked
+
+
+def test_select_respects_the_budget_and_keeps_document_order(char_tokens):
+    index = SectionIndex(SECTIONS)
+
+    chosen, used = index.select("glucose sunlight leaves", token_budget=len(SECTIONS[0]) + len(SECTIONS[1]))
+
+    assert chosen == sorted(chosen)
+    assert used <= len(SECTIONS[0]) + len(SECTIONS[1])
+    assert used == sum(len(SECTIONS[i]) for i in chosen)
+
+
+def test_focus_material_returns_full_text_when_it_fits_or_nothing_matches(char_tokens):
+    text = "\n\n".join(SECTIONS)
+
+    assert focus_material(text, "photosynthesis", token_budget=10_000)[0] == text
+    assert focus_material(text, "volcanoes", token_budget=50)[0] == text
+    assert focus_material(text, None, token_budget=50)[0] == text
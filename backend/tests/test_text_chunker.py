@@ -0,0 +1,25 @@
+from models.token_budget import count_tokens
+from services.text_chunker import chunk_text, split_into_sections
+
+
+def test_sections_split_at_headings():
+    text = "Intro line\n# Cells\nCells are units.\nCHAPTER 2 Tissues\nTissues are groups."
+
+    assert split_into_sections(text) == [("", "Intro line"), ("Cells", "Cells are units."), ("CHAPTER 2 Tissues", "Tissues are groups.")]
+
+
+def test_small_sections_are_merged_forward(char_tokens):
+    text = "# A\nshort\n# B\n" + "long body line\n" * 40
+
+    chunks = chunk_text(text, max_tokens=2_000, min_tokens=50)
+
+    assert len(chunks) == 1 and chunks[0].startswith("A\nshort")
+
+
+def test_every_chunk_fits_the_budget_even_for_a_single_huge_line(char_tokens):
+    text = "# Table\n" + "cell | " * 2_000 + "\n\n" + "\n".join(f"line {i} of prose" for i in range(300))
+
+    chunks = chunk_text(text, max_tokens=500, min_tokens=10)
+
+    assert all(count_tokens(chunk, "gpt-oss-120b") <= 500 for chunk in chunks)
+    assert "".join(chunks).count("cell |") == 2_000
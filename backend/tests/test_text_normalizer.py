@@ -0,0 +1,40 @@
+from services.text_normalizer import find_repeated_lines, join_wrapped_lines, line_signature, normalize_pages, word_counts
+
+
+def test_hyphen_break_is_dropped_only_for_words_the_document_spells_joined():
+    text = "A well-\nknown fact: photo-\nsynthesis feeds self-\nesteem.\nPhotosynthesis needs light."
+
+    assert join_wrapped_lines(text) == "A well-known fact: photosynthesis feeds self-esteem.\nPhotosynthesis needs light."
+
+
+def test_hyphen_break_keeps_the_hyphen_when_the_compound_is_more_common():
+    vocabulary_text = "a well-known result, another well-known result and wellknown once"
+    assert join_wrapped_lines("It is well-\nknown.", word_counts(vocabulary_text)) == "It is well-known."
+
+
+def test_wrapped_lines_join_only_mid_sentence():
+    text = "Plants make their own food using sunlight and water taken up by\nthe roots. COVID-\n19 spread fast."
+
+    assert join_wrapped_lines(text) == "Plants make their own food using sunlight and water taken up by the roots. COVID-19 spread fast."
+
+
+def test_table_rows_and_headings_are_not_joined():
+    text = "Table 2: Rates of photosynthesis measured under different lights\nLight | Rate\nred | 12\nLife Processes in Plants\nliving things need energy."
+
+    assert join_wrapped_lines(text).split("\n") == text.split("\n")
+
+
+def test_signature_wildcards_only_edge_page_numbers():
+    assert line_signature("Biology Textbook · Chapter 2 · 41") == line_signature("Biology Textbook · Chapter 2 · 42")
+    assert line_signature("Exercise 1") != line_signature("Exercise 12 Revision")
+    assert line_signature("3 Marks") == "#marks"
+
+
+def test_repeated_short_numbered_lines_are_kept(char_tokens):
+    pages = [f"Biology Textbook · Chapter 2\nExercise {i}\nbody text {i} about cells and tissues\n3 marks\n{i}" for i in range(1, 8)]
+
+    assert find_repeated_lines(pages) == {line_signature("Biology Textbook · Chapter 2")}
+    text, stats = normalize_pages(pages)
+    assert "Biology Textbook" not in text
+    assert text.count("3 marks") == 7 and "Exercise 7" in text
+    assert stats["pages"] == 7 and stats["tokens_after"] < stats["tokens_before"]
@@ -0,0 +1,39 @@
+from models.token_budget import AUTO_MODEL, OUTPUT_SAFETY_CAP, model_limits, plan_budget, truncate_to_tokens
+from services.prompting import compose_prompt
+
+
+def test_truncate_to_tokens_backs_off_to_a_full_line(char_tokens):
+    assert truncate_to_tokens("short", 10, "gpt-4o") == "short"
+    assert truncate_to_tokens("line one\nline two", 12, "gpt-4o", on_newline=True) == "line one"
+
+
+def test_plan_budget_reserves_output_and_truncates_material(char_tokens):
+    context, _ = model_limits("gpt-3.5-turbo")
+    material = "\n".join("x" * 99 for _ in range(200))
+
+    plan = plan_budget("gpt-3.5-turbo", "instructions", material, reserve_output=2_000)
+
+    assert plan["truncated"]
+    assert plan["material"].endswith("x") and material.startswith(plan["material"])
+    assert plan["instruction_tokens"] + plan["material_tokens"] + 2_000 <= context
+    assert plan["output_tokens"] == 2_000
+
+
+def test_plan_budget_output_is_what_the_prompt_leaves_free(char_tokens):
+    plan = plan_budget("gpt-4o", "p" * 120_000)
+
+    assert not plan["truncated"]
+    assert plan["output_tokens"] == 128_000 - 120_000
+    assert plan_budget("o4-mini", "short prompt")["output_tokens"] == OUTPUT_SAFETY_CAP
+
+
+def test_compose_prompt_only_cuts_material_that_overflows(char_tokens):
+    assert "all of it" in compose_prompt("all of it", "Summarize.", "gpt-3.5-turbo")
+
+    prompt = compose_prompt("line\n" * 20_000, "Summarize.", "gpt-3.5-turbo")
+    assert len(prompt) < model_limits("gpt-3.5-turbo")[0]
+    assert prompt.rstrip().endswith("Summarize.")
+
+
+def test_auto_model_uses_the_largest_window():
+    assert model_limits(AUTO_MODEL)[0] == max(model_limits(m)[0] for m in ("o4-mini", "gpt-4.1-nano-2025-04-14"))